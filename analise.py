@@ -1,29 +1,59 @@
 import os
-import requests
+import argparse
+import asyncio
+import tempfile
 import pandas as pd
 import time
-import mysql.connector
-from mysql.connector import Error
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from sqlalchemy.exc import DBAPIError
 import json
 
-print("DB_USER:", os.getenv("DB_USER"))
-print("DB_PASSWORD:", os.getenv("DB_PASSWORD"))
-print("DB_HOST:", os.getenv("DB_HOST"))
-print("DB_PORT:", os.getenv("DB_PORT"))
-print("DB_NAME:", os.getenv("DB_NAME"))
+import crawl_queue
+import db
+import ddragon
+import match_archive
+import match_flatten
+import match_schema
+from riot_client import RiotClient
+
+# Concorrência de cada estágio do pipeline de coleta
+PUUID_CONCURRENCY = int(os.getenv("PUUID_CONCURRENCY", "5"))
+MATCH_LIST_CONCURRENCY = int(os.getenv("MATCH_LIST_CONCURRENCY", "10"))
+MATCH_FETCH_CONCURRENCY = int(os.getenv("MATCH_FETCH_CONCURRENCY", "20"))
+
+# Riot IDs que não resolveram esperam PUUID_RETRY_HOURS antes da próxima
+# tentativa, dobrando a cada falha até PUUID_RETRY_MAX_DAYS. PUUIDs conhecidos
+# são reverificados (PUUID -> Riot ID) a cada PUUID_VERIFY_DAYS.
+PUUID_RETRY_HOURS = int(os.getenv("PUUID_RETRY_HOURS", "24"))
+PUUID_RETRY_MAX_DAYS = int(os.getenv("PUUID_RETRY_MAX_DAYS", "30"))
+PUUID_VERIFY_DAYS = int(os.getenv("PUUID_VERIFY_DAYS", "7"))
+
+# Quantidade de linhas acumuladas antes de gravar no banco, e intervalo máximo
+# entre gravações (segundos), para que partidas concluídas não segurem o lease
+FLUSH_SIZE = 100
+FLUSH_INTERVAL = 30
+
+# Espera entre consultas quando a fila só tem itens com outros processos
+QUEUE_POLL_INTERVAL = 1
+
+# Escrita em match_details: "executemany" (padrão) ou "infile" para cargas grandes
+WRITE_MODE = os.getenv("MATCH_DETAILS_WRITE_MODE", "executemany")
+WRITE_CHUNK_SIZE = int(os.getenv("MATCH_DETAILS_CHUNK_SIZE", "500"))
+
+# Tamanho máximo de página aceito pelo endpoint de IDs de partidas
+MATCH_PAGE_SIZE = 100
+
+# Marca o fim de uma fila entre estágios
+STOP = object()
 
 def connect_to_db(retries=5, delay=5):
     for attempt in range(retries):
         try:
-            connection = mysql.connector.connect(
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT"),
-                database=os.getenv("DB_NAME")
-            )
-            return connection
-        except Error as e:
+            # Conexão do engine compartilhado (db.py); close() a devolve ao pool
+            return db.raw_connection()
+        except DBAPIError as e:
             if attempt < retries - 1:
                 print(f"Connection failed. Retrying in {delay} seconds...")
                 time.sleep(delay)
@@ -31,344 +61,237 @@ def connect_to_db(retries=5, delay=5):
                 print(f"Failed to connect to the database after {retries} attempts. Please check the database server and connection settings.")
                 raise e
 
-def get_puuid(game_name, tag_line, api_key):
-    url = f"https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}?api_key={api_key}"
-    while True:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()['puuid']
-        elif response.status_code == 429:
-            print("Rate limit exceeded. Waiting for 2 minutes...")
-            time.sleep(120)
-        else:
-            print(f"Erro ao obter PUUID para {game_name}#{tag_line}: {response.status_code}")
-            return None
+async def get_puuid(client, game_name, tag_line):
+    puuid = await client.get_puuid(game_name, tag_line)
+    if not puuid:
+        print(f"Erro ao obter PUUID para {game_name}#{tag_line}")
+    return puuid
 
-def update_puuid_in_db(connection, player_name, puuid):
+def create_puuid_resolution_table(connection):
+    # riot_id é o nick#tag_line da última resolução ou verificação do jogador
     cursor = connection.cursor()
-    update_query = """
-    UPDATE players SET puuid = %s WHERE player_name = %s;
-    """
-    cursor.execute(update_query, (puuid, player_name))
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS puuid_resolution (
+        player_name VARCHAR(100) PRIMARY KEY,
+        riot_id VARCHAR(100) NOT NULL,
+        failures INT NOT NULL DEFAULT 0,
+        retry_after DATETIME NULL,
+        verified_at DATETIME NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    );
+    """)
     connection.commit()
     cursor.close()
 
-def extract_game_version(version):
-    return '.'.join(version.split('.')[:2])
-
-def correct_game_version(version):
-    return version.replace(',', '.')
-
-def convert_timestamp(timestamp):
-    if timestamp is None:
-        return None
-    return time.strftime('%H:%M:%S', time.gmtime(timestamp))
-
-def get_match_details(puuid, player_name, api_key, existing_match_ids, champion_translation):
-    url = f"https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?type=ranked&start=0&count=100&api_key={api_key}"
-    while True:
-        response = requests.get(url)
-        if response.status_code == 200:
-            break
-        elif response.status_code == 429:
-            print("Rate limit exceeded. Waiting for 2 minutes...")
-            time.sleep(120)
-        else:
-            print(f"Erro ao obter partidas para {player_name}: {response.status_code}")
-            return []
-
-    match_ids = response.json()
-    match_details = []
-
-    version_url = "https://ddragon.leagueoflegends.com/api/versions.json"
-    versions = requests.get(version_url).json()
-    latest_version = versions[0]
-
-    item_url = f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/data/pt_BR/item.json"
-    items = requests.get(item_url).json()["data"]
-
-    summoner_url = f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/data/pt_BR/summoner.json"
-    summoners = requests.get(summoner_url).json()["data"]
+def get_puuid_resolution(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT player_name, riot_id, failures, retry_after, verified_at FROM puuid_resolution;")
+    resolution = {
+        player_name: {'riot_id': riot_id, 'failures': failures, 'retry_after': retry_after, 'verified_at': verified_at}
+        for player_name, riot_id, failures, retry_after, verified_at in cursor.fetchall()
+    }
+    cursor.close()
+    return resolution
 
-    item_translation = {int(key): value["name"] for key, value in items.items()}
-    summoner_translation = {int(value["key"]): value["name"] for key, value in summoners.items()}
+def save_roster_resolution(connection, puuids, renames, resolution):
+    # Uma transação para o elenco inteiro:
+    # puuids = [(puuid, player_name)], renames = [(nick, tag_line, player_name)],
+    # resolution = [(player_name, riot_id, failures, retry_after, verified_at)]
+    cursor = connection.cursor()
+    if puuids:
+        cursor.executemany("UPDATE players SET puuid = %s WHERE player_name = %s;", puuids)
+    if renames:
+        cursor.executemany("UPDATE players SET nick = %s, tag_line = %s WHERE player_name = %s;", renames)
+    if resolution:
+        cursor.executemany("""
+        INSERT INTO puuid_resolution (player_name, riot_id, failures, retry_after, verified_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            riot_id = VALUES(riot_id),
+            failures = VALUES(failures),
+            retry_after = VALUES(retry_after),
+            verified_at = COALESCE(VALUES(verified_at), verified_at);
+        """, resolution)
+    connection.commit()
+    cursor.close()
 
-    for match_id in match_ids:
-        if match_id in existing_match_ids:
-            continue
+def retry_delay(failures):
+    return min(timedelta(hours=PUUID_RETRY_HOURS * 2 ** (failures - 1)), timedelta(days=PUUID_RETRY_MAX_DAYS))
 
-        url = f"https://americas.api.riotgames.com/lol/match/v5/matches/{match_id}?api_key={api_key}"
+async def get_match_ids(client, puuid, player_name, start_time=None):
+    # Sem cursor, só a página mais recente. Com cursor, pagina a partir do
+    # startTime (segundos) até esgotar as partidas novas. None se alguma página
+    # falhou: uma lista parcial faria o cursor pular as partidas não listadas.
+    if start_time is None:
+        match_ids = await client.get_match_ids(puuid, type='ranked', start=0, count=MATCH_PAGE_SIZE)
+        if match_ids is None:
+            return None
+    else:
+        match_ids = []
+        start = 0
         while True:
-            response = requests.get(url)
-            if response.status_code == 200:
+            page = await client.get_match_ids(puuid, type='ranked', startTime=start_time, start=start, count=MATCH_PAGE_SIZE)
+            if page is None:
+                return None
+            match_ids.extend(page)
+            if len(page) < MATCH_PAGE_SIZE:
                 break
-            elif response.status_code == 429:
-                print("Rate limit exceeded. Waiting for 2 minutes...")
-                time.sleep(120)
+            start += MATCH_PAGE_SIZE
+    if not match_ids:
+        print(f"Nenhuma partida encontrada para {player_name}")
+    return match_ids
+
+def extract_match_details(match_id, match_data, roster, translations):
+    # roster: {puuid: player_name} de todos os jogadores acompanhados.
+    # Uma única passada pelos participantes gera as linhas de todos eles.
+    return match_flatten.extract_rows(match_id, match_data, roster, translations)
+
+def format_infile_value(value):
+    if value is None or value != value:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+class MatchDetailsWriter:
+    # Grava linhas de match_details em lote. O comando é montado uma vez por
+    # conjunto de colunas e enviado com executemany em blocos de chunk_size
+    # (o conector transforma cada bloco em um único INSERT de várias linhas).
+    # O modo "infile" grava um arquivo temporário e usa LOAD DATA LOCAL INFILE,
+    # mais rápido para cargas grandes.
+    def __init__(self, connection, chunk_size=WRITE_CHUNK_SIZE, mode=WRITE_MODE):
+        if mode not in ('executemany', 'infile'):
+            raise ValueError(f"Modo de escrita desconhecido: {mode}")
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.statements = {}
+
+    def _statement(self, columns):
+        if columns not in self.statements:
+            unknown = [col for col in columns if col not in match_schema.MATCH_DETAILS_TYPES]
+            if unknown:
+                raise ValueError(f"Colunas fora do modelo de match_details: {unknown}")
+            column_list = ', '.join(columns)
+            updates = ', '.join(f'{col}=VALUES({col})' for col in columns)
+            if self.mode == 'infile':
+                # Carrega numa tabela temporária e mescla com ON DUPLICATE KEY
+                # UPDATE: REPLACE apagaria a linha e geraria um novo ingest_id
+                statement = (f"""
+                LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE match_details_load
+                CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                ({column_list});
+                """, f"""
+                INSERT INTO match_details ({column_list})
+                SELECT {column_list} FROM match_details_load
+                ON DUPLICATE KEY UPDATE {updates};
+                """)
             else:
-                print(f"Erro ao obter detalhes da partida {match_id} para {player_name}: {response.status_code}")
-                continue
-
-        match_data = response.json()
-        info = match_data['info']
-
-        bans = info['teams'][1].get('bans', []) if len(info['teams']) > 1 else []
-
-        for participant in info['participants']:
-            if participant['puuid'] == puuid:
-                match_detail = {
-                    'match_id': match_id,
-                    'player_name': player_name,
-                    'game_version': correct_game_version(extract_game_version(info.get('gameVersion'))),
-                    'game_datetime': pd.to_datetime(info['gameCreation'], unit='ms'),
-                    'duration': time.strftime('%H:%M:%S', time.gmtime(info['gameDuration'])),
-                    'win': True if participant.get('win') else False,
-                    'champion': participant['championName'],
-                    'level': participant['champLevel'],
-                    'kills': participant['kills'],
-                    'deaths': participant['deaths'],
-                    'assists': participant['assists'],
-                    'damage_dealt': participant['totalDamageDealtToChampions'],
-                    'damage_taken': participant['totalDamageTaken'],
-                    'vision_score': participant['visionScore'],
-                    'cs': participant['totalMinionsKilled'],
-                    'gold_earned': participant['goldEarned'],
-                    'summoner1': summoner_translation.get(participant['summoner1Id'], participant['summoner1Id']),
-                    'summoner2': summoner_translation.get(participant['summoner2Id'], participant['summoner2Id']),
-                    'item0': item_translation.get(participant['item0'], participant['item0']),
-                    'item1': item_translation.get(participant['item1'], participant['item1']),
-                    'item2': item_translation.get(participant['item2'], participant['item2']),
-                    'item3': item_translation.get(participant['item3'], participant['item3']),
-                    'item4': item_translation.get(participant['item4'], participant['item4']),
-                    'item5': item_translation.get(participant['item5'], participant['item5']),
-                    'item6': item_translation.get(participant['item6'], participant['item6']),
-                    'ban1': champion_translation.get(bans[0].get('championId')) if len(bans) > 0 else None,
-                    'ban2': champion_translation.get(bans[1].get('championId')) if len(bans) > 1 else None,
-                    'ban3': champion_translation.get(bans[2].get('championId')) if len(bans) > 2 else None,
-                    'ban4': champion_translation.get(bans[3].get('championId')) if len(bans) > 3 else None,
-                    'ban5': champion_translation.get(bans[4].get('championId')) if len(bans) > 4 else None,
-                    'dragons': info['teams'][0]['objectives']['dragon']['kills'] if len(info['teams']) > 0 else None,
-                    'towers': info['teams'][0]['objectives']['tower']['kills'] if len(info['teams']) > 0 else None,
-                    'inhibitors': info['teams'][0]['objectives']['inhibitor']['kills'] if len(info['teams']) > 0 else None,
-                    'rift_heralds': info['teams'][0]['objectives']['riftHerald']['kills'] if len(info['teams']) > 0 else None,
-                    'vilemaws': info['teams'][0]['objectives'].get('vilemaw', {}).get('kills') if len(info['teams']) > 0 else None,
-                    'barons': info['teams'][0]['objectives']['baron']['kills'] if len(info['teams']) > 0 else None,
-                    'champExperience': participant['champExperience'],
-                    'champLevel': participant['champLevel'],
-                    'individualPosition': participant['individualPosition'],
-                    'teamPosition': participant['teamPosition'],
-                    'role': participant['role'],
-                    'lane': participant['lane'],
-                    'baronpowerplay': participant['challenges'].get('baronBuffGoldAdvantageOverThreshold'),
-                    'bounty': participant['challenges'].get('bountyGold'),
-                    'buffsStolen': participant['challenges'].get('buffsStolen'),
-                    'stackitemsup': participant['challenges'].get('completeSupportQuestInTime'),
-                    'pinks': participant['challenges'].get('controlWardsPlaced'),
-                    'damagePerMinute': participant['challenges'].get('damagePerMinute'),
-                    'percentualdedanorecebido': participant['challenges'].get('damageTakenOnTeamPercentage'),
-                    'passinhos': participant['challenges'].get('dodgeSkillShotsSmallWindow'),
-                    'lanediff': participant['challenges'].get('earlyLaningPhaseGoldExpAdvantage'),
-                    'curaescudo': participant['challenges'].get('effectiveHealAndShielding'),
-                    'cc': participant['challenges'].get('enemyChampionImmobilizations'),
-                    'jungleroubada': participant['challenges'].get('enemyJungleMonsterKills'),
-                    'objetivosroubados': participant['challenges'].get('epicMonsterSteals'),
-                    'objetivosroubadossemsmite': participant['challenges'].get('epicMonsterStolenWithoutSmite'),
-                    'firstbrick': participant['challenges'].get('firstTurretKilled'),
-                    'tempofirstbrick': convert_timestamp(participant['challenges'].get('firstTurretKilledTime')),
-                    'sucessoemganks': participant['challenges'].get('getTakedownsInAllLanesEarlyJungleAsLaner'),
-                    'goldPerMinute': participant['challenges'].get('goldPerMinute'),
-                    'doublebuff': participant['challenges'].get('initialBuffCount'),
-                    'primeiroaronga': participant['challenges'].get('initialCrabCount'),
-                    'jungleCsBefore10Minutes': participant.get('jungleCsBefore10Minutes'),
-                    'kda': participant.get('kda'),
-                    'killParticipation': participant.get('killParticipation'),
-                    'dives': participant.get('killsNearEnemyTurret'),
-                    'ganksearly': participant.get('killsOnOtherLanesEarlyJungleAsLaner'),
-                    'sobrevivenciadive': participant.get('killsUnderOwnTurret'),
-                    'SkillShotsEarlyGame': participant.get('landSkillShotsEarlyGame'),
-                    'laneMinionsFirst10Minutes': participant.get('laneMinionsFirst10Minutes'),
-                    'laningPhaseGoldExpAdvantage': participant.get('laningPhaseGoldExpAdvantage'),
-                    'maxCsAdvantageOnLaneOpponent': participant.get('maxCsAdvantageOnLaneOpponent'),
-                    'maxKillDeficit': participant.get('maxKillDeficit'),
-                    'maxLevelLeadLaneOpponent': participant.get('maxLevelLeadLaneOpponent'),
-                    'moreEnemyJungleThanOpponent': participant.get('moreEnemyJungleThanOpponent'),
-                    'multikills': participant.get('multikills'),
-                    'multikillsAfterAggressiveFlash': participant.get('multikillsAfterAggressiveFlash'),
-                    'outnumberedKills': participant.get('outnumberedKills'),
-                    'pickKillWithAlly': participant.get('pickKillWithAlly'),
-                    'playedChampSelectPosition': participant.get('playedChampSelectPosition'),
-                    'quickCleanse': participant.get('quickCleanse'),
-                    'quickFirstTurret': participant.get('quickFirstTurret'),
-                    'quickSoloKills': participant.get('quickSoloKills'),
-                    'saveAllyFromDeath': participant.get('saveAllyFromDeath'),
-                    'scuttleCrabKills': participant.get('scuttleCrabKills'),
-                    'skillshotsDodged': participant.get('skillshotsDodged'),
-                    'skillshotsHit': participant.get('skillshotsHit'),
-                    'soloKills': participant.get('soloKills'),
-                    'soloTurretsLategame': participant.get('soloTurretsLategame'),
-                    'stealthWardsPlaced': participant.get('stealthWardsPlaced'),
-                    'takedownOnFirstTurret': participant.get('takedownOnFirstTurret'),
-                    'takedowns': participant.get('takedowns'),
-                    'takedownsAfterGainingLevelAdvantage': participant.get('takedownsAfterGainingLevelAdvantage'),
-                    'takedownsBeforeJungleMinionSpawn': participant.get('takedownsBeforeJungleMinionSpawn'),
-                    'takedownsFirstXMinutes': participant.get('takedownsFirstXMinutes'),
-                    'teamDamagePercentage': participant.get('teamDamagePercentage'),
-                    'turretPlatesTaken': participant.get('turretPlatesTaken'),
-                    'turretTakedowns': participant.get('turretTakedowns'),
-                    'visionScoreAdvantageLaneOpponent': participant.get('visionScoreAdvantageLaneOpponent'),
-                    'visionScorePerMinute': participant.get('visionScorePerMinute'),
-                    'wardTakedowns': participant.get('wardTakedowns'),
-                    'wardTakedownsBefore20M': participant.get('wardTakedownsBefore20M'),
-                    'wardsGuarded': participant.get('wardsGuarded'),
-                    'damageDealtToBuildings': participant.get('damageDealtToBuildings'),
-                    'damageDealtToObjectives': participant.get('damageDealtToObjectives'),
-                    'damageDealtToTurrets': participant.get('damageDealtToTurrets'),
-                    'damageSelfMitigated': participant.get('damageSelfMitigated'),
-                    'detectorWardsPlaced': participant.get('detectorWardsPlaced'),
-                    'doubleKills': participant.get('doubleKills'),
-                    'firstBloodAssist': participant.get('firstBloodAssist'),
-                    'firstBloodKill': participant.get('firstBloodKill'),
-                    'firstTowerAssist': participant.get('firstTowerAssist'),
-                    'firstTowerKill': participant.get('firstTowerKill'),
-                    'gameEndedInEarlySurrender': participant.get('gameEndedInEarlySurrender'),
-                    'gameEndedInSurrender': participant.get('gameEndedInSurrender'),
-                    'goldEarned': participant.get('goldEarned'),
-                    'goldSpent': participant.get('goldSpent'),
-                    'inhibitorKills': participant.get('inhibitorKills'),
-                    'killingSprees': participant.get('killingSprees'),
-                    'largestCriticalStrike': participant.get('largestCriticalStrike'),
-                    'largestKillingSpree': participant.get('largestKillingSpree'),
-                    'largestMultiKill': participant.get('largestMultiKill'),
-                    'longestTimeSpentLiving': participant.get('longestTimeSpentLiving'),
-                    'neutralMinionsKilled': participant.get('neutralMinionsKilled'),
-                    'objectivesStolen': participant.get('objectivesStolen'),
-                    'objectivesStolenAssists': participant.get('objectivesStolenAssists'),
-                    'participantId': participant.get('participantId'),
-                    'pentaKills': participant.get('pentaKills'),
-                    'quadraKills': participant.get('quadraKills'),
-                    'role': participant.get('role'),
-                    'sightWardsBoughtInGame': participant.get('sightWardsBoughtInGame'),
-                    'teamEarlySurrendered': participant.get('teamEarlySurrendered'),
-                    'teamPosition': participant.get('teamPosition'),
-                    'timeCCingOthers': participant.get('timeCCingOthers'),
-                    'timePlayed': participant.get('timePlayed'),
-                    'totalDamageDealtToChampions': participant.get('totalDamageDealtToChampions'),
-                    'totalDamageShieldedOnTeammates': participant.get('totalDamageShieldedOnTeammates'),
-                    'totalDamageTaken': participant.get('totalDamageTaken'),
-                    'totalHeal': participant.get('totalHeal'),
-                    'totalHealsOnTeammates': participant.get('totalHealsOnTeammates'),
-                    'totalMinionsKilled': participant.get('totalMinionsKilled'),
-                    'totalTimeCCDealt': participant.get('totalTimeCCDealt'),
-                    'totalTimeSpentDead': participant.get('totalTimeSpentDead'),
-                    'tripleKills': participant.get('tripleKills'),
-                    'turretKills': participant.get('turretKills'),
-                    'turretsLost': participant.get('turretsLost'),
-                    'unrealKills': participant.get('unrealKills'),
-                    'visionWardsBoughtInGame': participant.get('visionWardsBoughtInGame'),
-                    'wardsKilled': participant.get('wardsKilled'),
-                    'wardsPlaced': participant.get('wardsPlaced'),
-                }
-
-                match_details.append(match_detail)
-                break
-
-        time.sleep(1.2)
-
-    return match_details
-
-def get_champion_translation():
-    version_url = "https://ddragon.leagueoflegends.com/api/versions.json"
-    versions = requests.get(version_url).json()
-    latest_version = versions[0]
-
-    champion_url = f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/data/pt_BR/champion.json"
-    champions = requests.get(champion_url).json()["data"]
-
-    return {int(value["key"]): value["name"] for key, value in champions.items()}
-
-def add_missing_columns(connection, details):
-    if not details:
-        print("Nenhum detalhe de partida para processar.")
-        return
-
+                placeholders = ', '.join(['%s'] * len(columns))
+                statement = f"INSERT INTO match_details ({column_list}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates};"
+            self.statements[columns] = statement
+        return self.statements[columns]
+
+    def write(self, match_details):
+        if not match_details:
+            print("Nenhum detalhe de partida para salvar.")
+            return
+
+        groups = {}
+        for detail in match_details:
+            groups.setdefault(tuple(detail.keys()), []).append(tuple(detail.values()))
+        self._write_groups(groups)
+
+    def write_columns(self, columns):
+        # Mesmo que write, para o formato colunar de match_flatten.extract_columns
+        rows = list(zip(*columns.values()))
+        if not rows:
+            print("Nenhum detalhe de partida para salvar.")
+            return
+        self._write_groups({tuple(columns): rows})
+
+    def _write_groups(self, groups):
+        cursor = self.connection.cursor()
+        try:
+            for columns, rows in groups.items():
+                statement = self._statement(columns)
+                if self.mode == 'infile':
+                    self._load_infile(cursor, statement, rows)
+                else:
+                    for start in range(0, len(rows), self.chunk_size):
+                        cursor.executemany(statement, rows[start:start + self.chunk_size])
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _load_infile(self, cursor, statement, rows):
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as f:
+            for row in rows:
+                f.write('\t'.join(format_infile_value(value) for value in row))
+                f.write('\n')
+        load, merge = statement
+        try:
+            cursor.execute("CREATE TEMPORARY TABLE IF NOT EXISTS match_details_load LIKE match_details;")
+            cursor.execute("DELETE FROM match_details_load;")
+            cursor.execute(load, (f.name,))
+            cursor.execute(merge)
+        finally:
+            os.remove(f.name)
+
+def get_existing_match_players(connection):
+    # Pares (match_id, player_name) já gravados. Uma partida gravada para um
+    # jogador do elenco ainda falta para outro que entrou depois no elenco.
     cursor = connection.cursor()
-    cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name='match_details';")
-    existing_columns = {row[0] for row in cursor.fetchall()}
-
-    for key in details[0].keys():
-        if key not in existing_columns:
-            alter_table_query = f"ALTER TABLE match_details ADD COLUMN {key} VARCHAR(50);"
-            cursor.execute(alter_table_query)
-            connection.commit()
-
+    cursor.execute("SELECT match_id, player_name FROM match_details;")
+    existing = cursor.fetchall()
     cursor.close()
+    return set(existing)
 
-def save_progress_to_db(connection, match_details):
-    if not match_details:
-        print("Nenhum detalhe de partida para salvar.")
-        return
-
+def create_match_cursors_table(connection):
     cursor = connection.cursor()
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS match_details (
-        match_id VARCHAR(50) PRIMARY KEY,
-        player_name VARCHAR(50),
-        game_version VARCHAR(10),
-        game_datetime TIMESTAMP,
-        duration VARCHAR(8),
-        win BOOLEAN,
-        champion VARCHAR(50),
-        level INTEGER,
-        kills INTEGER,
-        deaths INTEGER,
-        assists INTEGER,
-        damage_dealt INTEGER,
-        damage_taken INTEGER,
-        vision_score INTEGER,
-        cs INTEGER,
-        gold_earned INTEGER,
-        summoner1 VARCHAR(50),
-        summoner2 VARCHAR(50),
-        item0 VARCHAR(50),
-        item1 VARCHAR(50),
-        item2 VARCHAR(50),
-        item3 VARCHAR(50),
-        item4 VARCHAR(50),
-        item5 VARCHAR(50),
-        item6 VARCHAR(50),
-        ban1 VARCHAR(50),
-        ban2 VARCHAR(50),
-        ban3 VARCHAR(50),
-        ban4 VARCHAR(50),
-        ban5 VARCHAR(50),
-        dragons INTEGER,
-        towers INTEGER,
-        inhibitors INTEGER,
-        rift_heralds INTEGER,
-        vilemaws INTEGER,
-        barons INTEGER
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS match_cursors (
+        puuid VARCHAR(78) PRIMARY KEY,
+        last_game_creation BIGINT NOT NULL,
+        last_match_id VARCHAR(50) NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
     );
-    """
-    cursor.execute(create_table_query)
+    """)
     connection.commit()
+    cursor.close()
 
-    add_missing_columns(connection, match_details)
-
-    for detail in match_details:
-        placeholders = ', '.join(['%s'] * len(detail))
-        columns = ', '.join(detail.keys())
-        insert_query = f"INSERT INTO match_details ({columns}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {', '.join([f'{col}=VALUES({col})' for col in detail.keys()])};"
-        cursor.execute(insert_query, list(detail.values()))
+def get_match_cursors(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT puuid, last_game_creation, last_match_id FROM match_cursors;")
+    cursors = {puuid: (creation, match_id) for puuid, creation, match_id in cursor.fetchall()}
+    cursor.close()
+    return cursors
 
-    connection.commit()
+def get_last_game_times(connection):
+    # Ponto de partida para jogadores que ainda não têm cursor, em segundos
+    cursor = connection.cursor()
+    cursor.execute("SELECT player_name, UNIX_TIMESTAMP(MAX(game_datetime)) FROM match_details GROUP BY player_name;")
+    last_games = {player_name: int(ts) for player_name, ts in cursor.fetchall() if ts is not None}
     cursor.close()
+    return last_games
 
-def get_existing_match_ids(connection):
+def save_match_cursors(connection, cursors):
+    if not cursors:
+        return
     cursor = connection.cursor()
-    cursor.execute("SELECT match_id FROM match_details;")
-    existing_ids = cursor.fetchall()
+    cursor.executemany("""
+    INSERT INTO match_cursors (puuid, last_game_creation, last_match_id) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        last_game_creation = GREATEST(last_game_creation, VALUES(last_game_creation)),
+        last_match_id = IF(VALUES(last_game_creation) >= last_game_creation, VALUES(last_match_id), last_match_id);
+    """, [(puuid, creation, match_id) for puuid, (creation, match_id) in cursors.items()])
+    connection.commit()
     cursor.close()
-    return {id[0] for id in existing_ids}
 
 def get_players_from_db(connection):
     cursor = connection.cursor()
@@ -377,103 +300,325 @@ def get_players_from_db(connection):
     cursor.close()
     return pd.DataFrame(players, columns=['player_name', 'nick', 'tag_line', 'team_name', 'puuid'])
 
-# Verificar variáveis de ambiente
-required_env_vars = ["DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME", "RIOT_API_KEY"]
-for var in required_env_vars:
-    if not os.getenv(var):
-        raise EnvironmentError(f"A variável de ambiente {var} não está definida")
-
-# Conectar ao banco de dados MySQL
-connection = connect_to_db()
-
-# Criar a tabela se não existir
-cursor = connection.cursor()
-create_table_query = """
-CREATE TABLE IF NOT EXISTS match_details (
-    match_id VARCHAR(50) PRIMARY KEY,
-    player_name VARCHAR(50),
-    game_version VARCHAR(10),
-    game_datetime TIMESTAMP,
-    duration VARCHAR(8),
-    win BOOLEAN,
-    champion VARCHAR(50),
-    level INTEGER,
-    kills INTEGER,
-    deaths INTEGER,
-    assists INTEGER,
-    damage_dealt INTEGER,
-    damage_taken INTEGER,
-    vision_score INTEGER,
-    cs INTEGER,
-    gold_earned INTEGER,
-    summoner1 VARCHAR(50),
-    summoner2 VARCHAR(50),
-    item0 VARCHAR(50),
-    item1 VARCHAR(50),
-    item2 VARCHAR(50),
-    item3 VARCHAR(50),
-    item4 VARCHAR(50),
-    item5 VARCHAR(50),
-    item6 VARCHAR(50),
-    ban1 VARCHAR(50),
-    ban2 VARCHAR(50),
-    ban3 VARCHAR(50),
-    ban4 VARCHAR(50),
-    ban5 VARCHAR(50),
-    dragons INTEGER,
-    towers INTEGER,
-    inhibitors INTEGER,
-    rift_heralds INTEGER,
-    vilemaws INTEGER,
-    barons INTEGER,
-    is_ranked BOOLEAN
-);
-"""
-cursor.execute(create_table_query)
-connection.commit()
-cursor.close()
-
-team_match_details = {}
-
-players_df = get_players_from_db(connection)
-api_key = os.getenv('RIOT_API_KEY')  # Usando a variável de ambiente para a chave da API
-
-champion_translation = get_champion_translation()
-
-for idx, player in players_df.iterrows():
-    player_name = player['player_name']
-    game_name = player['nick']
-    tag_line = player['tag_line']
-    team_name = player['team_name']
-    print(f"Processando jogador {player_name} ({game_name}) do time {team_name}")
-
-    if team_name not in team_match_details:
-        team_match_details[team_name] = []
-
-    puuid = player['puuid']
-    if pd.isna(puuid) or not puuid:
-        puuid = get_puuid(game_name, tag_line, api_key)
-        if puuid:
-            players_df.at[idx, 'puuid'] = puuid
-            update_puuid_in_db(connection, player_name, puuid)
-    else:
-        puuid = player['puuid']
-
-    if not puuid:
-        print(f"PUUID não encontrado para o jogador {player_name}, pulando.")
-        continue
-
-    existing_match_ids = get_existing_match_ids(connection)
-    match_details = get_match_details(puuid, player_name, api_key, existing_match_ids, champion_translation)
-    team_match_details[team_name].extend(match_details)
-
-    if len(team_match_details[team_name]) >= 100:
-        save_progress_to_db(connection, team_match_details[team_name])
-        team_match_details[team_name] = []
-
-for team_name, match_details in team_match_details.items():
-    save_progress_to_db(connection, match_details)
+async def run_workers(handler, inbox, concurrency):
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is STOP:
+                return
+            try:
+                await handler(item)
+            except Exception as e:
+                print(f"Erro ao processar {item}: {e}")
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def resolve_roster(connection, players_df, api_key):
+    # Etapa própria, antes da coleta: resolve em paralelo os PUUIDs que faltam
+    # (ou cujo Riot ID foi trocado no elenco) e reverifica os PUUIDs conhecidos
+    # quando a última verificação passou de PUUID_VERIFY_DAYS, para acompanhar
+    # trocas de nome. Riot IDs que não resolvem ficam num cache negativo com
+    # backoff. Tudo é gravado numa única transação no fim.
+    resolution = get_puuid_resolution(connection)
+    now = datetime.now()
+    work = []
+    backed_off = 0
+    for idx, player in players_df.iterrows():
+        riot_id = f"{player['nick']}#{player['tag_line']}"
+        cached = resolution.get(player['player_name'])
+        same_riot_id = cached is not None and cached['riot_id'] == riot_id
+        has_puuid = not pd.isna(player['puuid']) and bool(player['puuid'])
+        if same_riot_id and cached['failures']:
+            if cached['retry_after'] is not None and cached['retry_after'] > now:
+                backed_off += 1
+            else:
+                work.append(('resolve', idx, player, cached))
+        elif has_puuid and (cached is None or same_riot_id):
+            if cached is None or cached['verified_at'] is None or now - cached['verified_at'] >= timedelta(days=PUUID_VERIFY_DAYS):
+                work.append(('verify', idx, player, cached))
+        else:
+            work.append(('resolve', idx, player, cached))
+    if backed_off:
+        print(f"{backed_off} Riot IDs sem PUUID aguardando nova tentativa")
+    if not work:
+        return players_df
+    print(f"Elenco: {sum(item[0] == 'resolve' for item in work)} PUUIDs a resolver, "
+          f"{sum(item[0] == 'verify' for item in work)} a reverificar")
+
+    puuids = []
+    renames = []
+    rows = []
+    inbox = asyncio.Queue()
+    for item in work:
+        inbox.put_nowait(item)
+    for _ in range(PUUID_CONCURRENCY):
+        inbox.put_nowait(STOP)
+
+    async with RiotClient(api_key) as client:
+        async def resolve(item):
+            action, idx, player, cached = item
+            player_name = player['player_name']
+            riot_id = f"{player['nick']}#{player['tag_line']}"
+            if action == 'resolve':
+                puuid = await get_puuid(client, player['nick'], player['tag_line'])
+                if puuid:
+                    players_df.at[idx, 'puuid'] = puuid
+                    puuids.append((puuid, player_name))
+                    rows.append((player_name, riot_id, 0, None, now))
+                else:
+                    failures = cached['failures'] + 1 if cached is not None and cached['riot_id'] == riot_id else 1
+                    rows.append((player_name, riot_id, failures, now + retry_delay(failures), None))
+                return
+
+            account = await client.get_account_by_puuid(player['puuid'])
+            if not account:
+                print(f"Erro ao verificar o Riot ID de {player_name}")
+                return
+            current = f"{account['gameName']}#{account['tagLine']}"
+            if current != riot_id:
+                print(f"{player_name} mudou de Riot ID: {riot_id} -> {current}")
+                players_df.at[idx, 'nick'] = account['gameName']
+                players_df.at[idx, 'tag_line'] = account['tagLine']
+                renames.append((account['gameName'], account['tagLine'], player_name))
+            rows.append((player_name, current, 0, None, now))
+
+        await run_workers(resolve, inbox, PUUID_CONCURRENCY)
+
+    save_roster_resolution(connection, puuids, renames, rows)
+    return players_df
+
+def seed_crawl_queue(connection, queue, players_df):
+    # Uma execução interrompida deixa itens abertos na fila; nesse caso a coleta
+    # continua de onde parou. Senão a fila é refeita com o elenco e o ponto de
+    # partida de cada PUUID (cursor, ou a última partida gravada do jogador).
+    reclaimed = queue.reclaim_dead_leases()
+    if reclaimed:
+        print(f"{reclaimed} itens de processos encerrados voltaram para a fila")
+    if queue.has_open_work():
+        print(f"Retomando a coleta anterior: {queue.summary()}")
+        return
 
-print("Coleta de dados concluída e salva no banco de dados")
+    match_cursors = get_match_cursors(connection)
+    last_game_times = get_last_game_times(connection)
+    players = []
+    for _, player in players_df.iterrows():
+        puuid = player['puuid']
+        if pd.isna(puuid) or not puuid:
+            print(f"PUUID não encontrado para o jogador {player['player_name']}, pulando.")
+            continue
+        cursor = match_cursors.get(puuid)
+        if cursor is not None:
+            players.append((puuid, player['player_name'], cursor[0] // 1000, cursor[0], cursor[1]))
+        else:
+            players.append((puuid, player['player_name'], last_game_times.get(player['player_name']), None, None))
+    queue.seed(players)
+    print(f"Fila de coleta criada com {len(players)} jogadores")
+
+async def crawl(connection, writer, archive, queue, players_df, api_key, translations):
+    # Dois estágios que consomem a fila durável: jogador -> IDs de partidas e
+    # partida -> detalhes. Os IDs são deduplicados na fila, então cada partida é
+    # baixada uma vez e gera as linhas de todos os jogadores acompanhados que
+    # estavam nela. Vários processos podem rodar esta função sobre a mesma fila.
+    #
+    # Uma partida só é marcada como concluída na fila depois que as linhas foram
+    # gravadas no banco, e o cursor de um PUUID só avança quando todas as
+    # partidas listadas para ele estão concluídas.
+    roster = {
+        row['puuid']: row['player_name']
+        for _, row in players_df.iterrows()
+        if not pd.isna(row['puuid']) and row['puuid']
+    }
+    existing_match_players = get_existing_match_players(connection)
+    pending_rows = []
+    completed = []
+    last_flush = time.monotonic()
+
+    def flush():
+        nonlocal last_flush
+        archive.flush()
+        writer.write(pending_rows)
+        queue.complete_matches(completed)
+        ready = queue.ready_cursors()
+        save_match_cursors(connection, {puuid: cursor for puuid, cursor in ready.items() if cursor})
+        queue.mark_players_done(ready)
+        pending_rows.clear()
+        completed.clear()
+        last_flush = time.monotonic()
+
+    async with RiotClient(api_key) as client:
+        async def list_matches():
+            while True:
+                item = queue.lease_player()
+                if item is None:
+                    # Jogadores com outro processo ainda podem voltar para a fila
+                    if not queue.open_players():
+                        return
+                    await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+                puuid, player_name, start_time = item
+                print(f"Processando jogador {player_name}")
+                try:
+                    match_ids = await get_match_ids(client, puuid, player_name, start_time)
+                except Exception as e:
+                    print(f"Erro ao listar partidas de {player_name}: {e}")
+                    queue.fail_player(puuid)
+                    continue
+                if match_ids is None:
+                    # O jogador volta para a fila sem partidas listadas, então o cursor não avança
+                    print(f"Erro ao listar partidas de {player_name}")
+                    queue.fail_player(puuid)
+                    continue
+                queue.list_player(puuid, [match_id for match_id in match_ids if (match_id, player_name) not in existing_match_players])
+
+        async def fetch_matches():
+            while True:
+                match_id = queue.lease_match()
+                if match_id is None:
+                    if completed:
+                        flush()
+                    if not queue.open_players() and not queue.open_matches():
+                        return
+                    await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+                try:
+                    # Partidas já arquivadas não gastam cota da API
+                    match_data = archive.get(match_id)
+                    if match_data is None:
+                        match_data = await client.get_match(match_id)
+                        if match_data is not None:
+                            archive.put(match_id, match_data)
+                    if match_data is None:
+                        print(f"Erro ao obter detalhes da partida {match_id}")
+                        queue.fail_match(match_id)
+                        continue
+                    pending_rows.extend(extract_match_details(match_id, match_data, roster, translations))
+                    completed.append((match_id, match_data['info']['gameCreation']))
+                except Exception as e:
+                    print(f"Erro ao processar a partida {match_id}: {e}")
+                    queue.fail_match(match_id)
+                    continue
+
+                if len(pending_rows) >= FLUSH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    flush()
+
+        await asyncio.gather(
+            *(list_matches() for _ in range(MATCH_LIST_CONCURRENCY)),
+            *(fetch_matches() for _ in range(MATCH_FETCH_CONCURRENCY)),
+        )
+
+    flush()
+
+def crawl_from_queue(connection, players_df, translations, api_key):
+    writer = MatchDetailsWriter(connection)
+    with match_archive.MatchArchive() as archive, crawl_queue.CrawlQueue() as queue:
+        asyncio.run(crawl(connection, writer, archive, queue, players_df, api_key, translations))
+        print(f"Fila de coleta: {queue.summary()}")
+
+def _crawl_process():
+    # Processo extra da coleta: conexão, elenco e traduções próprios, mesma fila
+    db.reset_after_fork()
+    connection = connect_to_db()
+    try:
+        crawl_from_queue(connection, get_players_from_db(connection), ddragon.load_translations(), os.getenv('RIOT_API_KEY'))
+    finally:
+        connection.close()
+
+# Estado de cada processo do reprocessamento, preenchido pelo initializer
+_reprocess_state = {}
+
+def _init_reprocess_worker(archive_path, roster, translations):
+    _reprocess_state['archive'] = match_archive.MatchArchive(archive_path, readonly=True)
+    _reprocess_state['roster'] = roster
+    _reprocess_state['translations'] = translations
+
+def _reprocess_segment(segment):
+    archive = _reprocess_state['archive']
+    return match_flatten.extract_columns(archive.iter_segment(segment), _reprocess_state['roster'], _reprocess_state['translations'])
+
+def reprocess(writer, players_df, translations, archive_path=match_archive.ARCHIVE_DIR, workers=None):
+    # Reexecuta o achatamento sobre o arquivo local, um segmento por tarefa,
+    # sem nenhuma chamada de rede. Útil depois de adicionar colunas ao modelo.
+    roster = {
+        row['puuid']: row['player_name']
+        for _, row in players_df.iterrows()
+        if not pd.isna(row['puuid']) and row['puuid']
+    }
+    with match_archive.MatchArchive(archive_path, readonly=True) as archive:
+        segments = archive.segments()
+    print(f"Reprocessando {len(segments)} segmentos do arquivo de partidas...")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_reprocess_worker, initargs=(archive_path, roster, translations)) as pool:
+        for segment, columns in zip(segments, pool.map(_reprocess_segment, segments)):
+            writer.write_columns(columns)
+            print(f"Segmento {segment}: {len(columns['match_id'])} linhas")
+
+def run(connection, mode='crawl', workers=None):
+    # roster só resolve PUUIDs; crawl resolve e coleta (em `workers` processos);
+    # matches só coleta, com os PUUIDs já resolvidos no banco; worker só se junta
+    # a uma fila de coleta já criada; reprocess reextrai do arquivo local
+
+    # Criar ou migrar a tabela match_details conforme o modelo declarado
+    match_schema.migrate_match_details(connection)
+    create_match_cursors_table(connection)
+    create_puuid_resolution_table(connection)
+    match_schema.create_rewrites_table(connection)
+
+    players_df = get_players_from_db(connection)
+    api_key = os.getenv('RIOT_API_KEY')  # Usando a variável de ambiente para a chave da API
+
+    translations = ddragon.load_translations()
+
+    if mode == 'reprocess':
+        reprocess(MatchDetailsWriter(connection), players_df, translations, workers=workers)
+        # As linhas regravadas mantêm o ingest_id: a nova geração faz as
+        # estatísticas e o export Parquet refazerem tudo na próxima execução
+        match_schema.record_rewrite(connection)
+        print("Reprocessamento concluído e salvo no banco de dados")
+        return
 
-connection.close()
+    if mode in ('roster', 'crawl'):
+        asyncio.run(resolve_roster(connection, players_df, api_key))
+    if mode in ('crawl', 'matches'):
+        with crawl_queue.CrawlQueue() as queue:
+            seed_crawl_queue(connection, queue, players_df)
+    if mode in ('crawl', 'matches', 'worker'):
+        # Os processos extras dividem a mesma fila; cada um respeita os limites
+        # da API sozinho e os 429 fazem o resto
+        extra = (workers or 1) - 1 if mode != 'worker' else 0
+        with ProcessPoolExecutor(max_workers=extra) if extra else nullcontext() as pool:
+            futures = [pool.submit(_crawl_process) for _ in range(extra)]
+            crawl_from_queue(connection, players_df, translations, api_key)
+            for future in futures:
+                future.result()
+        print("Coleta de dados concluída e salva no banco de dados")
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleta de partidas dos jogadores acompanhados")
+    parser.add_argument('mode', nargs='?', default='crawl', choices=['crawl', 'roster', 'matches', 'worker', 'reprocess'],
+                        help="crawl resolve o elenco e coleta da API; roster só resolve os PUUIDs do elenco; matches só coleta, com os PUUIDs já resolvidos; worker ajuda uma coleta em andamento; reprocess reextrai do arquivo local de partidas")
+    parser.add_argument('--workers', type=int, default=None, help="processos usados na coleta e no reprocessamento")
+    args = parser.parse_args()
+
+    print("DB_USER:", os.getenv("DB_USER"))
+    print("DB_PASSWORD:", os.getenv("DB_PASSWORD"))
+    print("DB_HOST:", os.getenv("DB_HOST"))
+    print("DB_PORT:", os.getenv("DB_PORT"))
+    print("DB_NAME:", os.getenv("DB_NAME"))
+
+    # Verificar variáveis de ambiente
+    required_env_vars = ["DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"]
+    if args.mode != 'reprocess':
+        required_env_vars.append("RIOT_API_KEY")
+    for var in required_env_vars:
+        if not os.getenv(var):
+            raise EnvironmentError(f"A variável de ambiente {var} não está definida")
+
+    # Conectar ao banco de dados MySQL
+    connection = connect_to_db()
+    try:
+        run(connection, args.mode, workers=args.workers)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,91 @@
+import argparse
 import os
 import pandas as pd
-import json
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
-def connect_db():
-    db_url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(db_url)
-    Session = sessionmaker(bind=engine)
+import db
+import match_export
+import match_schema
+import position_benchmarks
+import rolling_windows
+
+STATISTICS_COLUMNS = ['player_name', 'champion', 'games_played', 'wins', 'win_rate']
+STATISTICS_CHUNK_SIZE = 1000
+LOAD_CHUNK_SIZE = int(os.getenv('STATISTICS_LOAD_CHUNK_SIZE', '50000'))
+
+MATCH_DETAILS_QUERY = """
+SELECT player_name, champion, win, `teamPosition` FROM match_details
+WHERE ingest_id > :since AND ingest_id <= :until;
+"""
+
+UPSERT_STATISTICS = text("""
+INSERT INTO player_statistics (player_name, champion, games_played, wins, win_rate)
+VALUES (:player_name, :champion, :games_played, :wins, :win_rate)
+ON DUPLICATE KEY UPDATE
+    games_played = VALUES(games_played),
+    wins = VALUES(wins),
+    win_rate = VALUES(win_rate);
+""")
+
+# Soma partidas e vitórias novas aos contadores e recalcula o win_rate só das
+# chaves afetadas (o MySQL aplica as atribuições em ordem, então win_rate já vê
+# os contadores somados)
+UPSERT_STATISTICS_DELTA = text("""
+INSERT INTO player_statistics (player_name, champion, games_played, wins, win_rate)
+VALUES (:player_name, :champion, :games_played, :wins, :win_rate)
+ON DUPLICATE KEY UPDATE
+    games_played = games_played + VALUES(games_played),
+    wins = wins + VALUES(wins),
+    win_rate = wins / games_played;
+""")
+
+def connect_db(engine=None):
+    # Sessão sobre o engine compartilhado do projeto (db.py), o mesmo banco
+    # MySQL em que a coleta grava match_details
+    Session = sessionmaker(bind=engine or db.get_engine())
     session = Session()
     return session
 
-def get_match_details(session):
-    query = "SELECT * FROM match_details;"
-    df = pd.read_sql(query, session.bind)
-    return df
+def get_match_details(session, since, until, chunksize=LOAD_CHUNK_SIZE, store=None):
+    # Só as colunas usadas nas estatísticas, lidas em blocos por um cursor no
+    # servidor: a memória fica limitada ao tamanho do bloco, não ao da tabela.
+    # since/until delimitam a faixa de ingest_id a processar. Com store, lê do
+    # export Parquet em vez do banco.
+    if store is not None:
+        return store.scan(['player_name', 'champion', 'win', 'teamPosition'], since, until, chunksize=chunksize)
+    # stream_results vai no comando: a conexão da sessão já foi aberta pelas
+    # consultas anteriores e ignoraria opções passadas a session.connection()
+    query = text(MATCH_DETAILS_QUERY).execution_options(stream_results=True)
+    return pd.read_sql(
+        query, session.connection(),
+        params={'since': since, 'until': until}, chunksize=chunksize,
+    )
 
-def calculate_statistics(df):
+def count_games(df):
+    # Partidas e vitórias por (player_name, champion) de um bloco
     if 'teamPosition' not in df.columns:
         raise KeyError("A coluna 'teamPosition' não está presente no DataFrame.")
-    results = []
-    for player, data in df.groupby('player_name'):
-        player_stats = {
-            'player_name': player,
-            'champions_played': data['champion'].value_counts().to_dict(),
-            'champion_wins': data[data['win'] == True]['champion'].value_counts().to_dict()
-        }
-        win_rates = {champ: player_stats['champion_wins'].get(champ, 0) / count for champ, count in player_stats['champions_played'].items()}
-        player_stats['win_rate'] = win_rates
-        results.append(player_stats)
-    return results
+    return (
+        df.assign(wins=(df['win'] == True).astype('int64'))
+        .groupby(['player_name', 'champion'], sort=False)['wins']
+        .agg(games_played='size', wins='sum')
+    )
+
+def calculate_statistics(chunks):
+    # Soma os contadores de cada bloco num agregado corrente e calcula o
+    # win_rate uma vez no fim
+    totals = None
+    for chunk in chunks:
+        counts = count_games(chunk)
+        totals = counts if totals is None else totals.add(counts, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(columns=STATISTICS_COLUMNS)
+    stats = totals.astype('int64').reset_index()
+    stats['win_rate'] = stats['wins'] / stats['games_played']
+    return stats
 
 def create_statistics_tables(session):
-    session.execute(text("DROP TABLE IF EXISTS player_statistics;"))
     session.execute(text("""
     CREATE TABLE IF NOT EXISTS player_statistics (
         player_name VARCHAR(50),
@@ -43,36 +96,165 @@ def create_statistics_tables(session):
         PRIMARY KEY (player_name, champion)
     );
     """))
+    session.execute(text("""
+    CREATE TABLE IF NOT EXISTS statistics_watermarks (
+        table_name VARCHAR(64) PRIMARY KEY,
+        last_ingest_id BIGINT NOT NULL,
+        rewrite_generation BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """))
+    session.execute(text(match_schema.CREATE_REWRITES_SQL))
+    session.commit()
 
 def clear_statistics_tables(session):
     session.execute(text("DELETE FROM player_statistics;"))
 
-def save_statistics_to_db(session, player_stats):
-    for stats in player_stats:
-        for champion, games_played in stats['champions_played'].items():
-            wins = stats['champion_wins'].get(champion, 0)
-            win_rate = stats['win_rate'].get(champion, 0)
-            session.execute(text("""
-            INSERT INTO player_statistics (player_name, champion, games_played, wins, win_rate)
-            VALUES (:player_name, :champion, :games_played, :wins, :win_rate)
-            ON CONFLICT (player_name, champion) DO UPDATE
-            SET games_played = EXCLUDED.games_played,
-                wins = EXCLUDED.wins,
-                win_rate = EXCLUDED.win_rate;
-            """), {
-                'player_name': stats['player_name'], 'champion': champion, 
-                'games_played': games_played, 'wins': wins, 'win_rate': win_rate
-            })
+def get_watermark(session, table_name='player_statistics', generation=0):
+    # Uma marca gravada antes da última regravação de match_details não vale:
+    # as linhas regravadas mantêm o ingest_id e o incremental não as veria
+    row = session.execute(text(
+        "SELECT last_ingest_id, rewrite_generation FROM statistics_watermarks WHERE table_name = :table_name;"
+    ), {'table_name': table_name}).fetchone()
+    if row is None or row[1] < generation:
+        return None
+    return row[0]
+
+def set_watermark(session, ingest_id, table_name='player_statistics', generation=0):
+    session.execute(text("""
+    INSERT INTO statistics_watermarks (table_name, last_ingest_id, rewrite_generation)
+    VALUES (:table_name, :ingest_id, :generation)
+    ON DUPLICATE KEY UPDATE last_ingest_id = VALUES(last_ingest_id),
+        rewrite_generation = VALUES(rewrite_generation), updated_at = CURRENT_TIMESTAMP;
+    """), {'table_name': table_name, 'ingest_id': ingest_id, 'generation': generation})
+
+def get_rewrite_generation(session, store=None):
+    # Geração de match_details lida agora (ou a que o export Parquet reflete)
+    if store is not None:
+        return store.rewrite_generation()
+    return session.execute(text(match_schema.REWRITE_GENERATION_SQL)).scalar()
+
+def get_ingest_ceiling(session, store=None):
+    # Maior ingest_id visível agora; linhas gravadas durante o job ficam para a próxima execução
+    if store is not None:
+        return store.last_ingest_id()
+    return session.execute(text("SELECT COALESCE(MAX(ingest_id), 0) FROM match_details;")).scalar()
+
+def save_statistics_to_db(session, stats, statement=UPSERT_STATISTICS):
+    # executemany em lotes direto das colunas do DataFrame
+    for start in range(0, len(stats), STATISTICS_CHUNK_SIZE):
+        chunk = stats.iloc[start:start + STATISTICS_CHUNK_SIZE]
+        session.execute(statement, chunk[STATISTICS_COLUMNS].to_dict('records'))
+
+def refresh_statistics(session, full=False, store=None):
+    # Incremental: aplica só as linhas com ingest_id acima da marca d'água como
+    # deltas. Completo (ou sem marca d'água): recalcula tudo. Nos dois casos a
+    # escrita e a nova marca d'água são confirmadas numa única transação, então
+    # quem lê player_statistics vê o estado anterior até o commit.
+    generation = get_rewrite_generation(session, store)
+    watermark = None if full else get_watermark(session, generation=generation)
+    ceiling = get_ingest_ceiling(session, store)
+    if watermark is not None and watermark >= ceiling:
+        print("Nenhuma partida nova para as estatísticas.")
+        return
+
+    since = watermark if watermark is not None else 0
+    stats = calculate_statistics(get_match_details(session, since, ceiling, store=store))
+    try:
+        if watermark is None:
+            clear_statistics_tables(session)
+            save_statistics_to_db(session, stats, UPSERT_STATISTICS)
+        else:
+            save_statistics_to_db(session, stats, UPSERT_STATISTICS_DELTA)
+        set_watermark(session, ceiling, generation=generation)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    mode = "completa" if watermark is None else "incremental"
+    print(f"Atualização {mode}: {len(stats)} pares jogador/campeão até ingest_id {ceiling}.")
+
+def refresh_position_benchmarks(session, full=False, store=None):
+    # As parciais por (patch, posição) só são recalculadas para os patches que
+    # receberam partidas desde a última execução; o resto vem do cache
+    generation = get_rewrite_generation(session, store)
+    watermark = None if full else get_watermark(session, 'position_stat_sums', generation)
+    ceiling = get_ingest_ceiling(session, store)
+    if watermark is not None and watermark >= ceiling:
+        print("Nenhuma partida nova para as referências por posição.")
+        return
+
+    if store is not None:
+        patches = store.changed_patches(watermark or 0, ceiling)
+    elif watermark is None:
+        patches = [row[0] or '' for row in session.execute(text("SELECT DISTINCT game_version FROM match_details;"))]
+    else:
+        patches = position_benchmarks.get_changed_patches(session, watermark, ceiling)
+    sums = position_benchmarks.calculate_partial_sums(position_benchmarks.get_match_details(session, patches, store=store))
+    try:
+        if watermark is None:
+            session.execute(text("DELETE FROM position_stat_sums;"))
+        if patches:
+            position_benchmarks.save_partial_sums(session, patches, sums)
+        rows = position_benchmarks.calculate_benchmarks(position_benchmarks.load_partial_sums(session))
+        position_benchmarks.save_benchmarks(session, rows)
+        set_watermark(session, ceiling, 'position_stat_sums', generation)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    print(f"Referências por posição: {len(patches)} patches recalculados, {len(rows)} linhas abaixo da posição.")
+
+def refresh_rolling_windows(session, full=False, store=None):
+    # Os baldes diários recebem só as partidas novas; as janelas são remontadas
+    # a partir deles a cada execução (o "últimos N dias" muda com a data)
+    generation = get_rewrite_generation(session, store)
+    watermark = None if full else get_watermark(session, 'stat_buckets', generation)
+    ceiling = get_ingest_ceiling(session, store)
+    since = watermark if watermark is not None else 0
+    deltas = rolling_windows.calculate_bucket_deltas(rolling_windows.get_match_details(session, since, ceiling, store=store))
+    try:
+        if watermark is None:
+            session.execute(text("DELETE FROM stat_buckets;"))
+        rolling_windows.save_bucket_deltas(session, deltas)
+        windows = rolling_windows.calculate_windows(rolling_windows.load_buckets(session))
+        rolling_windows.save_windows(session, windows)
+        set_watermark(session, ceiling, 'stat_buckets', generation)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    print(f"Janelas: {len(deltas)} baldes atualizados, {len(windows)} linhas por janela.")
+
+def create_tables(session):
+    create_statistics_tables(session)
+    position_benchmarks.create_tables(session)
+    rolling_windows.create_tables(session)
+
+def open_store(session):
+    # Atualiza o export Parquet e devolve o store para as leituras
+    store = match_export.MatchExport()
+    match_export.export_match_details(session, store)
     session.commit()
+    return store
 
 def main():
+    parser = argparse.ArgumentParser(description="Estatísticas por jogador e campeão")
+    parser.add_argument('--full', action='store_true',
+                        help="recalcula tudo a partir de match_details em vez de aplicar só as partidas novas")
+    parser.add_argument('--source', choices=['db', 'parquet'], default=os.getenv('STATISTICS_SOURCE', 'db'),
+                        help="parquet atualiza o export de match_details e lê as partidas dele")
+    args = parser.parse_args()
+
     session = connect_db()
-    create_statistics_tables(session)
-    clear_statistics_tables(session)
-    match_details = get_match_details(session)
-    player_stats = calculate_statistics(match_details)
-    save_statistics_to_db(session, player_stats)
-    session.close()
+    try:
+        create_tables(session)
+        store = open_store(session) if args.source == 'parquet' else None
+        refresh_statistics(session, full=args.full, store=store)
+        refresh_position_benchmarks(session, full=args.full, store=store)
+        refresh_rolling_windows(session, full=args.full, store=store)
+    finally:
+        session.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import migrations
+
+# Testes que precisam de um MySQL de verdade usam a fixture mysql_connection.
+# Eles só rodam com TEST_DB_NAME definido (um banco descartável: as tabelas
+# usadas são apagadas); host, porta, usuário e senha vêm das mesmas variáveis
+# DB_* do projeto.
+
+
+@pytest.fixture
+def mysql_connection():
+    database = os.getenv("TEST_DB_NAME")
+    if not database:
+        pytest.skip("TEST_DB_NAME não definido: testes com MySQL desativados")
+    pymysql = pytest.importorskip("pymysql")
+    connection = pymysql.connect(
+        host=os.getenv("DB_HOST", "127.0.0.1"),
+        port=int(os.getenv("DB_PORT", "3306")),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=database,
+        charset="utf8mb4",
+    )
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def drop_tables(connection, *tables):
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {', '.join(tables)};")
+    connection.commit()
+    migrations.ensure_versions_table(connection)
+    cursor.execute(
+        f"DELETE FROM schema_versions WHERE table_name IN ({', '.join(['%s'] * len(tables))});", tables
+    )
+    connection.commit()
+    cursor.close()
@@ -0,0 +1,230 @@
+import os
+import socket
+import sqlite3
+import time
+
+# Fila de trabalho durável da coleta. Guarda, num SQLite local, os PUUIDs a
+# listar e os IDs de partidas a baixar, cada um com seu estado:
+#
+#   pending -> leased -> listed/done    (ou de volta a pending após falha)
+#                     -> failed         (depois de MAX_ATTEMPTS tentativas)
+#
+# Um item "leased" pertence a um processo até lease_expires; se o processo
+# morre, o item volta a ser elegível. Vários processos (analise.py crawl
+# --workers N, ou analise.py worker) consomem a mesma fila, e uma execução
+# interrompida continua exatamente de onde parou.
+QUEUE_PATH = os.getenv(
+    "CRAWL_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "crawl_queue.sqlite"),
+)
+LEASE_SECONDS = int(os.getenv("CRAWL_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "3"))
+
+
+class CrawlQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL;")
+        self.db.execute("PRAGMA synchronous=NORMAL;")
+        self.db.executescript("""
+        CREATE TABLE IF NOT EXISTS players (
+            puuid TEXT PRIMARY KEY,
+            player_name TEXT NOT NULL,
+            start_time INTEGER,
+            cursor_creation INTEGER,
+            cursor_match_id TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL
+        );
+        CREATE TABLE IF NOT EXISTS matches (
+            match_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            game_creation INTEGER,
+            lease_owner TEXT,
+            lease_expires REAL
+        );
+        CREATE TABLE IF NOT EXISTS match_players (
+            match_id TEXT NOT NULL,
+            puuid TEXT NOT NULL,
+            PRIMARY KEY (match_id, puuid)
+        );
+        CREATE INDEX IF NOT EXISTS idx_players_state ON players (state);
+        CREATE INDEX IF NOT EXISTS idx_matches_state ON matches (state);
+        CREATE INDEX IF NOT EXISTS idx_match_players_puuid ON match_players (puuid);
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE reserva a escrita já na leitura, então dois processos
+        # não pegam o mesmo item
+        self.db.execute("BEGIN IMMEDIATE;")
+
+    def _count(self, table, states):
+        placeholders = ', '.join('?' * len(states))
+        return self.db.execute(f"SELECT COUNT(*) FROM {table} WHERE state IN ({placeholders});", states).fetchone()[0]
+
+    def has_open_work(self):
+        return self._count('players', ('pending', 'leased', 'listed')) + self._count('matches', ('pending', 'leased')) > 0
+
+    def open_players(self):
+        return self._count('players', ('pending', 'leased'))
+
+    def open_matches(self):
+        return self._count('matches', ('pending', 'leased'))
+
+    def seed(self, players):
+        # Nova execução: players = [(puuid, player_name, start_time, cursor_creation, cursor_match_id)]
+        self._transaction()
+        try:
+            self.db.execute("DELETE FROM match_players;")
+            self.db.execute("DELETE FROM matches;")
+            self.db.execute("DELETE FROM players;")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO players (puuid, player_name, start_time, cursor_creation, cursor_match_id) VALUES (?, ?, ?, ?, ?);",
+                players,
+            )
+            self.db.execute("COMMIT;")
+        except BaseException:
+            self.db.execute("ROLLBACK;")
+            raise
+
+    def reclaim_dead_leases(self):
+        # Devolve à fila itens de processos desta máquina que já não existem
+        host = socket.gethostname()
+        reclaimed = 0
+        for table in ('players', 'matches'):
+            owners = [row[0] for row in self.db.execute(f"SELECT DISTINCT lease_owner FROM {table} WHERE state = 'leased';")]
+            for owner in owners:
+                owner_host, _, pid = (owner or '').rpartition(':')
+                if owner_host != host or not pid.isdigit() or _process_alive(int(pid)):
+                    continue
+                reclaimed += self.db.execute(
+                    f"UPDATE {table} SET state = 'pending', lease_owner = NULL, lease_expires = NULL WHERE state = 'leased' AND lease_owner = ?;",
+                    (owner,),
+                ).rowcount
+        return reclaimed
+
+    def _lease(self, table, key, columns):
+        now = time.time()
+        self._transaction()
+        try:
+            row = self.db.execute(f"""
+                SELECT {key}, {columns} FROM {table}
+                WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)
+                LIMIT 1;
+            """, (now,)).fetchone()
+            if row is not None:
+                self.db.execute(
+                    f"UPDATE {table} SET state = 'leased', lease_owner = ?, lease_expires = ? WHERE {key} = ?;",
+                    (self.owner, now + LEASE_SECONDS, row[0]),
+                )
+            self.db.execute("COMMIT;")
+        except BaseException:
+            self.db.execute("ROLLBACK;")
+            raise
+        return row
+
+    def _fail(self, table, key, value):
+        self.db.execute(f"""
+            UPDATE {table}
+            SET attempts = attempts + 1, lease_owner = NULL, lease_expires = NULL,
+                state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+            WHERE {key} = ?;
+        """, (MAX_ATTEMPTS, value))
+
+    def lease_player(self):
+        # (puuid, player_name, start_time) ou None
+        return self._lease('players', 'puuid', 'player_name, start_time')
+
+    def list_player(self, puuid, match_ids):
+        # Registra as partidas listadas e marca o jogador como listado, atomicamente
+        self._transaction()
+        try:
+            self.db.executemany("INSERT OR IGNORE INTO matches (match_id) VALUES (?);", [(m,) for m in match_ids])
+            self.db.executemany("INSERT OR IGNORE INTO match_players (match_id, puuid) VALUES (?, ?);", [(m, puuid) for m in match_ids])
+            self.db.execute("UPDATE players SET state = 'listed', lease_owner = NULL, lease_expires = NULL WHERE puuid = ?;", (puuid,))
+            self.db.execute("COMMIT;")
+        except BaseException:
+            self.db.execute("ROLLBACK;")
+            raise
+
+    def fail_player(self, puuid):
+        self._fail('players', 'puuid', puuid)
+
+    def lease_match(self):
+        row = self._lease('matches', 'match_id', 'attempts')
+        return row[0] if row else None
+
+    def fail_match(self, match_id):
+        self._fail('matches', 'match_id', match_id)
+
+    def complete_matches(self, completed):
+        # completed = [(match_id, game_creation)], chamado depois que as linhas foram gravadas
+        self.db.executemany(
+            "UPDATE matches SET state = 'done', game_creation = ?, lease_owner = NULL, lease_expires = NULL WHERE match_id = ?;",
+            [(creation, match_id) for match_id, creation in completed],
+        )
+
+    def ready_cursors(self):
+        # Jogadores listados cujas partidas terminaram todas: {puuid: (gameCreation, match_id)}
+        # com a partida mais nova. Se alguma falhou de vez, o cursor não avança.
+        self.db.execute("""
+            UPDATE players SET state = 'failed'
+            WHERE state = 'listed' AND EXISTS (
+                SELECT 1 FROM match_players mp JOIN matches m ON m.match_id = mp.match_id
+                WHERE mp.puuid = players.puuid AND m.state = 'failed'
+            );
+        """)
+        rows = self.db.execute("""
+            SELECT p.puuid, p.cursor_creation, p.cursor_match_id,
+                   (SELECT m.game_creation || ' ' || m.match_id FROM match_players mp
+                    JOIN matches m ON m.match_id = mp.match_id
+                    WHERE mp.puuid = p.puuid ORDER BY m.game_creation DESC LIMIT 1)
+            FROM players p
+            WHERE p.state = 'listed' AND NOT EXISTS (
+                SELECT 1 FROM match_players mp JOIN matches m ON m.match_id = mp.match_id
+                WHERE mp.puuid = p.puuid AND m.state != 'done'
+            );
+        """).fetchall()
+        cursors = {}
+        for puuid, cursor_creation, cursor_match_id, newest in rows:
+            best = (cursor_creation, cursor_match_id) if cursor_creation is not None else None
+            if newest:
+                creation, match_id = newest.split(' ', 1)
+                if best is None or int(creation) > best[0]:
+                    best = (int(creation), match_id)
+            cursors[puuid] = best
+        return cursors
+
+    def mark_players_done(self, puuids):
+        self.db.executemany("UPDATE players SET state = 'done' WHERE puuid = ?;", [(puuid,) for puuid in puuids])
+
+    def summary(self):
+        return {
+            table: dict(self.db.execute(f"SELECT state, COUNT(*) FROM {table} GROUP BY state;").fetchall())
+            for table in ('players', 'matches')
+        }
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,58 +1,330 @@
 import pandas as pd
 import aiohttp
 import asyncio
-from io import BytesIO
-from flask import Flask, jsonify
-from functools import lru_cache
-import requests
+import gzip
+import hashlib
+import io
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from flask import Flask, Response, abort, jsonify, request
+
+import ddragon
+import site_artifacts
 
 app = Flask(__name__)
 
-# Função assíncrona para baixar CSVs do GitHub
-async def download_csv_from_github(session, url):
-    async with session.get(url) as response:
-        if response.status == 200:
-            return BytesIO(await response.read())
-        else:
+# Configuração da API de leitura
+SOURCE_DIR = os.getenv('DADOS_SOURCE_DIR', site_artifacts.BASE_DIR)
+CACHE_SIZE = int(os.getenv('DADOS_CACHE_SIZE', '1024'))
+CACHE_TTL = float(os.getenv('DADOS_CACHE_TTL', '300'))
+RELOAD_TOKEN = os.getenv('DADOS_RELOAD_TOKEN')
+GZIP_MIN_SIZE = 512
+
+# Conversão CSV -> JSON em fluxo: os bytes chegam pelo aiohttp e vão para uma
+# fila lida por uma thread que roda o parser C do pandas em blocos, gravando
+# os registros conforme são lidos. A memória fica limitada à fila e ao bloco.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+CSV_CHUNK_ROWS = 10000
+
+# Tipos explícitos das colunas publicadas; colunas ausentes no arquivo são ignoradas
+CSV_DTYPES = {
+    'player_name': 'object',
+    'champion': 'object',
+    'games_played': 'Int64',
+    'wins': 'Int64',
+    'win_rate': 'float64',
+    'position': 'object',
+    'stat': 'object',
+    'player_avg': 'float64',
+    'position_avg': 'float64',
+    'percentile': 'float64',
+    'z_score': 'float64',
+}
+
+class ChunkReader(io.RawIOBase):
+    # Arquivo somente leitura alimentado por outra thread: feed(bytes) acrescenta
+    # dados, feed(None) marca o fim e feed(exceção) faz a leitura falhar
+    def __init__(self, max_chunks=32):
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.buffer = b''
+        self.finished = False
+        self.aborted = False
+
+    def readable(self):
+        return True
+
+    def feed(self, data):
+        while not self.aborted:
+            try:
+                self.chunks.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def abort(self):
+        # O leitor terminou (ou falhou): libera quem estiver esperando para alimentar
+        self.aborted = True
+
+    def readinto(self, target):
+        while not self.buffer:
+            if self.finished:
+                return 0
+            data = self.chunks.get()
+            if data is None:
+                self.finished = True
+                return 0
+            if isinstance(data, Exception):
+                raise data
+            self.buffer = data
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+def convert_stream(reader, json_filename):
+    try:
+        csv_to_json(io.BufferedReader(reader), json_filename)
+    finally:
+        reader.abort()
+
+async def convert_csv_url(session, csv_url, json_filename):
+    reader = ChunkReader()
+    conversion = asyncio.create_task(asyncio.to_thread(convert_stream, reader, json_filename))
+    try:
+        async with session.get(csv_url) as response:
             response.raise_for_status()
+            async for data in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(reader.feed, data)
+        await asyncio.to_thread(reader.feed, None)
+    except Exception as e:
+        # Falha no download: a conversão aborta sem substituir o JSON anterior
+        await asyncio.to_thread(reader.feed, IOError(f"Download interrompido: {e}"))
+        await asyncio.gather(conversion, return_exceptions=True)
+        raise
+    await conversion
 
 async def process_csv_urls(csv_urls):
+    # Todos os arquivos em paralelo: o parse de um sobrepõe o download do outro
     async with aiohttp.ClientSession() as session:
-        tasks = []
-        for csv_url, json_filename in csv_urls:
-            task = asyncio.create_task(download_csv_from_github(session, csv_url))
-            tasks.append((task, json_filename))
-
-        for task, json_filename in tasks:
-            try:
-                csv_file = await task
-                csv_to_json(csv_file, json_filename)
-            except Exception as e:
-                print(f"Erro ao processar {json_filename}: {e}")
+        results = await asyncio.gather(
+            *(convert_csv_url(session, csv_url, json_filename) for csv_url, json_filename in csv_urls),
+            return_exceptions=True,
+        )
+        for (_, json_filename), result in zip(csv_urls, results):
+            if isinstance(result, Exception):
+                print(f"Erro ao processar {json_filename}: {result}")
 
 def csv_to_json(csv_file, json_file):
-    df = pd.read_csv(csv_file, engine='python')
-    df.to_json(json_file, orient='records', indent=4)
-    print(f"Arquivo JSON salvo em {json_file}")
+    # Grava num arquivo temporário e só substitui o JSON final no fim
+    temp_file = json_file + '.tmp'
+    rows = 0
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as out:
+            out.write('[')
+            for chunk in pd.read_csv(csv_file, engine='c', dtype=CSV_DTYPES, chunksize=CSV_CHUNK_ROWS):
+                records = chunk.to_json(orient='records', force_ascii=False)[1:-1]
+                if records:
+                    if rows:
+                        out.write(',')
+                    out.write(records)
+                rows += len(chunk)
+            out.write(']')
+        os.replace(temp_file, json_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    print(f"Arquivo JSON salvo em {json_file} ({rows} linhas)")
 
-# Cache para armazenar resultados de operações frequentes
-@lru_cache(maxsize=128)
+# Itens do patch atual, vindos do cache versionado do Data Dragon
 def fetch_items():
-    ITEMS_URL = 'https://ddragon.leagueoflegends.com/cdn/14.11.1/data/pt_BR/item.json'
-    response = requests.get(ITEMS_URL)
-    if response.status == 200:
-        return response.json()
-    else:
-        response.raise_for_status()
+    return ddragon.load_translations()['items']
 
 # Rota de exemplo para verificação de funcionamento
 @app.route('/items/example', methods=['GET'])
 def get_example_items():
-    items_data = fetch_items()
-    items = items_data['data']
-    example_items = {item_id: items[item_id]['name'] for item_id in list(items.keys())[:10]}
+    items = fetch_items()
+    example_items = {item_id: items[item_id] for item_id in list(items.keys())[:10]}
     return jsonify(example_items)
 
+# Índices em memória das tabelas publicadas. Um recarregamento monta índices
+# novos e troca a referência de uma vez, sem bloquear quem está lendo.
+class DataStore:
+    def __init__(self, source_dir=SOURCE_DIR):
+        self.source_dir = source_dir
+        self.version = None
+        self.players = {}
+        self.champions = {}
+        self.lock = threading.Lock()
+
+    def ensure_loaded(self):
+        # Carga na primeira requisição: servidores WSGI importam dados:app sem
+        # passar pelo __main__
+        if self.version is None:
+            with self.lock:
+                if self.version is None:
+                    self.load()
+
+    def load(self):
+        tables = site_artifacts.load_tables(self.source_dir)
+        players = {}
+        for name, df in tables.items():
+            by, ascending = site_artifacts.TABLES[name]['sort']
+            df = df.sort_values(['player_name'] + by, ascending=[True] + ascending, kind='stable')
+            df = df.astype(object).where(df.notna(), None)
+            for player_name, rows in df.groupby('player_name', sort=False):
+                players.setdefault(player_name, {})[name] = rows.drop(columns='player_name').to_dict('records')
+
+        stats = tables['player_statistics'].sort_values('games_played', ascending=False, kind='stable')
+        stats = stats.astype(object).where(stats.notna(), None)
+        champions = {
+            champion: rows.drop(columns='champion').to_dict('records')
+            for champion, rows in stats.groupby('champion', sort=True)
+        }
+
+        digest = hashlib.sha1()
+        for name in sorted(tables):
+            digest.update(pd.util.hash_pandas_object(tables[name], index=False).values.tobytes())
+        self.players, self.champions, self.version = players, champions, digest.hexdigest()[:12]
+        print(f"Dados carregados: {len(players)} jogadores, {len(champions)} campeões (versão {self.version})")
+
+
+# Cache de respostas prontas (corpo serializado, comprimido e ETag), com TTL e
+# descarte do menos usado. A versão dos dados faz parte da chave, então um
+# recarregamento invalida tudo sem precisar limpar o cache.
+class ResponseCache:
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+store = DataStore()
+response_cache = ResponseCache()
+
+
+def reload_data():
+    # Chamado quando o job noturno publica dados novos
+    store.load()
+    response_cache.clear()
+
+
+def render(payload):
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+    return body, compressed, hashlib.sha1(body).hexdigest()[:16]
+
+
+def cached_json(build):
+    # Serve o JSON de build(**kwargs) a partir do cache, com ETag/304 e gzip
+    def view(**kwargs):
+        store.ensure_loaded()
+        key = (build.__name__, store.version, tuple(sorted(kwargs.items())))
+        rendered = response_cache.get(key)
+        if rendered is None:
+            payload = build(**kwargs)
+            if payload is None:
+                abort(404)
+            rendered = render(payload)
+            response_cache.put(key, rendered)
+        body, compressed, etag = rendered
+
+        # ETag fraca: o corpo gzip e o sem compressão são a mesma representação
+        # para revalidação, mas não são os mesmos bytes
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif compressed is not None and 'gzip' in request.accept_encodings:
+            response = Response(compressed, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag, weak=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={int(CACHE_TTL)}'
+        return response
+    view.__name__ = build.__name__
+    return view
+
+
+@app.route('/api/players', methods=['GET'])
+@cached_json
+def list_players():
+    return sorted(store.players)
+
+
+@app.route('/api/players/<player_name>', methods=['GET'])
+@cached_json
+def get_player(player_name):
+    return store.players.get(player_name)
+
+
+@app.route('/api/players/<player_name>/statistics', methods=['GET'])
+@cached_json
+def get_player_statistics(player_name):
+    player = store.players.get(player_name)
+    return player.get('player_statistics', []) if player is not None else None
+
+
+@app.route('/api/players/<player_name>/benchmarks', methods=['GET'])
+@cached_json
+def get_player_benchmarks(player_name):
+    player = store.players.get(player_name)
+    return player.get('underperforming_positions', []) if player is not None else None
+
+
+@app.route('/api/champions', methods=['GET'])
+@cached_json
+def list_champions():
+    return list(store.champions)
+
+
+@app.route('/api/champions/<champion>', methods=['GET'])
+@cached_json
+def get_champion(champion):
+    return store.champions.get(champion)
+
+
+# Gancho de recarga: POST com o cabeçalho X-Reload-Token, ou SIGHUP no processo
+@app.route('/admin/reload', methods=['POST'])
+def reload_endpoint():
+    if not RELOAD_TOKEN or request.headers.get('X-Reload-Token') != RELOAD_TOKEN:
+        abort(403)
+    reload_data()
+    return jsonify({'version': store.version})
+
+
+def install_reload_signal():
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_data())
+
 if __name__ == "__main__":
     # URLs dos arquivos CSV no GitHub
     csv_urls = [
@@ -63,5 +335,7 @@ if __name__ == "__main__":
     # Processamento assíncrono dos arquivos CSV
     asyncio.run(process_csv_urls(csv_urls))
     
-    # Executar o servidor Flask
-    app.run(debug=True)
+    # Carregar os índices e executar o servidor Flask
+    reload_data()
+    install_reload_signal()
+    app.run(threaded=True)
@@ -0,0 +1,65 @@
+import os
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+# Um único engine SQLAlchemy para o banco MySQL do projeto, com pool. As
+# estatísticas usam sessões sobre ele; a coleta e a ladder pegam conexões DBAPI
+# cruas do mesmo pool (raw_connection). O driver é o PyMySQL porque suporta
+# cursores no servidor: stream_results lê match_details em blocos sem trazer o
+# resultado inteiro para a memória. O pool é configurado só aqui, pelo
+# ambiente, para valer qualquer que seja o módulo que cria o engine primeiro.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+_engine = None
+_lock = threading.Lock()
+
+
+def database_url():
+    port = os.getenv("DB_PORT")
+    return URL.create(
+        "mysql+pymysql",
+        username=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=int(port) if port else None,
+        database=os.getenv("DB_NAME"),
+        query={"charset": "utf8mb4"},
+    )
+
+
+def get_engine():
+    # Criado na primeira chamada e compartilhado pelo processo
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(
+                database_url(),
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_SIZE,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+                # LOAD DATA LOCAL INFILE do MatchDetailsWriter no modo "infile"
+                connect_args={'local_infile': os.getenv("MATCH_DETAILS_WRITE_MODE") == 'infile'},
+            )
+    return _engine
+
+
+def raw_connection():
+    # Conexão DBAPI do pool; close() a devolve ao pool
+    return get_engine().raw_connection()
+
+
+def reset_after_fork():
+    # Processos filhos não podem reaproveitar os sockets do pool do pai
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+def dispose():
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
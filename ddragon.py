@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+
+import requests
+
+DDRAGON_URL = "https://ddragon.leagueoflegends.com"
+DEFAULT_LOCALE = "pt_BR"
+CACHE_DIR = os.getenv(
+    "DDRAGON_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ddragon"),
+)
+
+# Traduções já carregadas neste processo, por idioma
+_loaded = {}
+
+
+def version_key(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in version.split('.'))
+
+
+def get_latest_version(timeout=10):
+    try:
+        response = requests.get(f"{DDRAGON_URL}/api/versions.json", timeout=timeout)
+        response.raise_for_status()
+        return response.json()[0]
+    except (requests.RequestException, ValueError, IndexError) as e:
+        print(f"Não foi possível consultar versions.json: {e}")
+        return None
+
+
+def cache_path(version, locale):
+    return os.path.join(CACHE_DIR, f"{version}_{locale}.json.gz")
+
+
+def cached_versions(locale):
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    suffix = f"_{locale}.json.gz"
+    versions = [name[:-len(suffix)] for name in os.listdir(CACHE_DIR) if name.endswith(suffix)]
+    return sorted(versions, key=version_key, reverse=True)
+
+
+def download_translations(version, locale):
+    def fetch(name):
+        response = requests.get(f"{DDRAGON_URL}/cdn/{version}/data/{locale}/{name}.json", timeout=30)
+        response.raise_for_status()
+        return response.json()["data"]
+
+    items = fetch("item")
+    summoners = fetch("summoner")
+    champions = fetch("champion")
+    return {
+        'version': version,
+        'locale': locale,
+        'items': {int(key): value["name"] for key, value in items.items()},
+        'summoners': {int(value["key"]): value["name"] for value in summoners.values()},
+        'champions': {int(value["key"]): value["name"] for value in champions.values()},
+    }
+
+
+def save_translations(translations):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(translations['version'], translations['locale'])
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(translations, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_translations(version, locale):
+    with gzip.open(cache_path(version, locale), 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    # JSON só guarda chaves string; os IDs da API são inteiros
+    for name in ('items', 'summoners', 'champions'):
+        data[name] = {int(key): value for key, value in data[name].items()}
+    return data
+
+
+def load_translations(locale=DEFAULT_LOCALE):
+    # Mapas de itens, feitiços e campeões do patch mais recente, carregados uma
+    # vez por processo. O CDN só é consultado quando versions.json anuncia um
+    # patch que ainda não está no cache local; sem rede, usa o último em cache.
+    if locale in _loaded:
+        return _loaded[locale]
+
+    latest = get_latest_version()
+    cached = cached_versions(locale)
+
+    if latest and latest not in cached:
+        print(f"Baixando Data Dragon {latest} ({locale})...")
+        try:
+            translations = download_translations(latest, locale)
+            save_translations(translations)
+            _loaded[locale] = translations
+            return translations
+        except requests.RequestException as e:
+            print(f"Falha ao baixar Data Dragon {latest}: {e}")
+
+    version = latest if latest in cached else (cached[0] if cached else None)
+    if version is None:
+        raise RuntimeError(f"Data Dragon indisponível e sem cache local para {locale}")
+    _loaded[locale] = read_translations(version, locale)
+    return _loaded[locale]
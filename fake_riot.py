@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+from riot_client import parse_rate_limits
+
+# Servidor local que imita os endpoints da Riot usados por analise.py e
+# leaguev4.py, inclusive os cabeçalhos e respostas 429 de limite de taxa.
+# Serve de fixture para testar o RiotClient sem gastar a cota da chave real:
+#
+#     async with FakeRiotServer(accounts={...}, matches={...}) as server:
+#         async with RiotClient('fake-key', base_url=server.url) as client:
+#             ...
+
+
+class SlidingWindow:
+    def __init__(self, limits):
+        self.limits = parse_rate_limits(limits)
+        self.stamps = deque()
+
+    def hit(self, now):
+        longest = max(seconds for _, seconds in self.limits)
+        while self.stamps and now - self.stamps[0] >= longest:
+            self.stamps.popleft()
+        for limit, seconds in self.limits:
+            recent = [stamp for stamp in self.stamps if now - stamp < seconds]
+            if len(recent) >= limit:
+                return max(1, int(seconds - (now - recent[0])) + 1)
+        self.stamps.append(now)
+        return 0
+
+    def header(self):
+        return ','.join(f"{limit}:{seconds}" for limit, seconds in self.limits)
+
+
+class FakeRiotServer:
+    def __init__(self, accounts=None, matches=None, league_entries=None, apex_leagues=None,
+                 app_limits="20:1,100:120", method_limits=None, api_key='fake-key',
+                 host='127.0.0.1', port=0):
+        # accounts: {(gameName, tagLine): puuid}
+        # matches: {match_id: payload match-v5}
+        # league_entries: {(queue, tier, division): [entradas]}
+        # apex_leagues: {(tier, queue): payload league-v4}
+        self.accounts = accounts or {}
+        self.matches = matches or {}
+        self.league_entries = league_entries or {}
+        self.apex_leagues = apex_leagues or {}
+        self.app_limits = app_limits
+        self.method_limits = method_limits or {}
+        self.api_key = api_key
+        self.host = host
+        self.port = port
+        self.app_windows = {}
+        self.method_windows = {}
+        self.requests = []
+        self.status_counts = defaultdict(int)
+        self.runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{host}/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}', self.by_riot_id)
+        app.router.add_get('/{host}/riot/account/v1/accounts/by-puuid/{puuid}', self.by_puuid)
+        app.router.add_get('/{host}/lol/match/v5/matches/by-puuid/{puuid}/ids', self.match_ids)
+        app.router.add_get('/{host}/lol/match/v5/matches/{match_id}', self.match)
+        app.router.add_get('/{host}/lol/league/v4/entries/{queue}/{tier}/{division}', self.entries)
+        app.router.add_get('/{host}/lol/league/v4/{league}/by-queue/{queue}', self.apex)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def _respond(self, request, method, payload):
+        host = request.match_info['host']
+        self.requests.append((host, method, request.path_qs))
+        if request.headers.get('X-Riot-Token') != self.api_key:
+            return self._finish(web.json_response({'status': {'status_code': 401}}, status=401))
+
+        now = time.monotonic()
+        app_window = self.app_windows.setdefault(host, SlidingWindow(self.app_limits))
+        method_limits = self.method_limits.get(method, "2000:10")
+        method_window = self.method_windows.setdefault((host, method), SlidingWindow(method_limits))
+        headers = {
+            'X-App-Rate-Limit': app_window.header(),
+            'X-Method-Rate-Limit': method_window.header(),
+        }
+
+        retry_after = app_window.hit(now)
+        limit_type = 'application'
+        if not retry_after:
+            retry_after = method_window.hit(now)
+            limit_type = 'method'
+        if retry_after:
+            headers['Retry-After'] = str(retry_after)
+            headers['X-Rate-Limit-Type'] = limit_type
+            return self._finish(web.json_response({'status': {'status_code': 429}}, status=429, headers=headers))
+
+        if payload is None:
+            return self._finish(web.json_response({'status': {'status_code': 404}}, status=404, headers=headers))
+        return self._finish(web.json_response(payload, headers=headers))
+
+    def _finish(self, response):
+        self.status_counts[response.status] += 1
+        return response
+
+    async def by_riot_id(self, request):
+        game_name = request.match_info['game_name']
+        tag_line = request.match_info['tag_line']
+        puuid = self.accounts.get((game_name, tag_line))
+        payload = {'puuid': puuid, 'gameName': game_name, 'tagLine': tag_line} if puuid else None
+        return self._respond(request, 'account-v1.getByRiotId', payload)
+
+    async def by_puuid(self, request):
+        puuid = request.match_info['puuid']
+        payload = None
+        for (game_name, tag_line), known in self.accounts.items():
+            if known == puuid:
+                payload = {'puuid': puuid, 'gameName': game_name, 'tagLine': tag_line}
+        return self._respond(request, 'account-v1.getByPuuid', payload)
+
+    async def match_ids(self, request):
+        puuid = request.match_info['puuid']
+        start = int(request.query.get('start', 0))
+        count = int(request.query.get('count', 20))
+        start_time = request.query.get('startTime')
+        games = [
+            (match['info']['gameCreation'], match_id)
+            for match_id, match in self.matches.items()
+            if puuid in match['metadata']['participants']
+            and (start_time is None or match['info']['gameCreation'] // 1000 >= int(start_time))
+        ]
+        games.sort(reverse=True)
+        payload = [match_id for _, match_id in games[start:start + count]]
+        return self._respond(request, 'match-v5.getMatchIdsByPUUID', payload)
+
+    async def match(self, request):
+        payload = self.matches.get(request.match_info['match_id'])
+        return self._respond(request, 'match-v5.getMatch', payload)
+
+    async def entries(self, request):
+        key = (request.match_info['queue'], request.match_info['tier'], request.match_info['division'])
+        page = int(request.query.get('page', 1))
+        entries = self.league_entries.get(key, [])
+        payload = entries[(page - 1) * 205:page * 205]
+        return self._respond(request, 'league-v4.getLeagueEntries', payload)
+
+    async def apex(self, request):
+        tier = request.match_info['league'].replace('leagues', '')
+        payload = self.apex_leagues.get((tier.upper(), request.match_info['queue']))
+        return self._respond(request, f'league-v4.get{tier.capitalize()}League', payload)
+
+
+async def serve_forever(port=8089):
+    async with FakeRiotServer(port=port) as server:
+        print(f"Servidor Riot falso em {server.url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve_forever())
@@ -0,0 +1,214 @@
+import logging
+
+from pymysql.cursors import DictCursor, SSDictCursor
+
+import migrations
+
+# Histórico da ladder só com o que mudou. Cada execução do leaguev4 grava, por
+# invocador, uma linha com os campos que mudaram desde o último estado
+# conhecido (os demais ficam NULL). A coluna changed diz, bit a bit na ordem de
+# FIELDS, quais campos mudaram, então um campo que passou a NULL (tier
+# desconhecido, apex sem divisão) não é confundido com um campo inalterado.
+# Tier, divisão e flags são codificados em inteiros pequenos. ladder_state
+# guarda o último estado completo de cada invocador para que a comparação seja
+# feita no banco, em conjunto.
+
+TIERS = ["IRON", "BRONZE", "SILVER", "GOLD", "PLATINUM", "EMERALD", "DIAMOND", "MASTER", "GRANDMASTER", "CHALLENGER"]
+DIVISIONS = ["IV", "III", "II", "I"]
+FLAGS = ["veteran", "inactive", "freshBlood", "hotStreak"]
+
+# Campos comparados entre execuções
+FIELDS = ["tier", "division", "leaguePoints", "wins", "losses", "flags"]
+
+# Incrementar sempre que a estrutura de ladder_history mudar
+HISTORY_VERSION = 2
+
+# Expressões que codificam as colunas de ladder_players_staging
+ENCODED = {
+    'tier': "NULLIF(FIELD(s.tier, {}), 0)".format(', '.join(f"'{tier}'" for tier in TIERS)),
+    'division': "NULLIF(FIELD(s.`rank`, {}), 0)".format(', '.join(f"'{division}'" for division in DIVISIONS)),
+    'leaguePoints': "s.leaguePoints",
+    'wins': "s.wins",
+    'losses': "s.losses",
+    'flags': " + ".join(f"(COALESCE(s.{flag}, 0) << {bit})" for bit, flag in enumerate(FLAGS)),
+}
+
+
+def create_tables(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ladder_history (
+            summonerId VARCHAR(80) NOT NULL,
+            ts DATETIME NOT NULL,
+            tier TINYINT UNSIGNED NULL,
+            division TINYINT UNSIGNED NULL,
+            leaguePoints SMALLINT UNSIGNED NULL,
+            wins MEDIUMINT UNSIGNED NULL,
+            losses MEDIUMINT UNSIGNED NULL,
+            flags TINYINT UNSIGNED NULL,
+            changed TINYINT UNSIGNED NOT NULL DEFAULT 0,
+            removed BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (summonerId, ts),
+            KEY idx_ladder_history_ts (ts)
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ladder_state (
+            summonerId VARCHAR(80) PRIMARY KEY,
+            tier TINYINT UNSIGNED NULL,
+            division TINYINT UNSIGNED NULL,
+            leaguePoints SMALLINT UNSIGNED NULL,
+            wins MEDIUMINT UNSIGNED NULL,
+            losses MEDIUMINT UNSIGNED NULL,
+            flags TINYINT UNSIGNED NULL,
+            removed BOOLEAN NOT NULL DEFAULT FALSE
+        );
+    """)
+    conn.commit()
+    cursor.close()
+    migrate_history_table(conn)
+
+
+def migrate_history_table(conn):
+    # A versão 1 não tinha a coluna changed; as linhas antigas ficam com 0 e são
+    # lidas com a regra antiga (NULL = inalterado)
+    if migrations.get_schema_version(conn, 'ladder_history') == HISTORY_VERSION:
+        return
+    if 'changed' not in migrations.get_table_columns(conn, 'ladder_history'):
+        cursor = conn.cursor()
+        cursor.execute("ALTER TABLE ladder_history ADD COLUMN changed TINYINT UNSIGNED NOT NULL DEFAULT 0 AFTER flags;")
+        conn.commit()
+        cursor.close()
+    migrations.set_schema_version(conn, 'ladder_history', HISTORY_VERSION)
+
+
+def record_snapshot(conn, ts, complete=True):
+    # Compara ladder_players_staging com ladder_state e grava os deltas em uma transação.
+    # Invocadores ausentes só são marcados como removidos se a ladder veio inteira.
+    encoded = ', '.join(f"{ENCODED[field]} AS {field}" for field in FIELDS)
+    changed = ' OR '.join(f"NOT (st.{field} <=> n.{field})" for field in FIELDS)
+    conditions = [f"st.summonerId IS NULL OR st.removed OR NOT (st.{field} <=> n.{field})" for field in FIELDS]
+    deltas = ', '.join(f"CASE WHEN {condition} THEN n.{field} END" for field, condition in zip(FIELDS, conditions))
+    changed_bits = ' + '.join(f"(CASE WHEN {condition} THEN {1 << bit} ELSE 0 END)" for bit, condition in enumerate(conditions))
+    columns = ', '.join(FIELDS)
+    updates = ', '.join(f"{field} = VALUES({field})" for field in FIELDS)
+
+    cursor = conn.cursor()
+    try:
+        conn.begin()
+        cursor.execute(f"""
+            INSERT INTO ladder_history (summonerId, ts, {columns}, changed, removed)
+            SELECT n.summonerId, %s, {deltas}, {changed_bits}, FALSE
+            FROM (SELECT s.summonerId, {encoded} FROM ladder_players_staging s) n
+            LEFT JOIN ladder_state st ON st.summonerId = n.summonerId
+            WHERE st.summonerId IS NULL OR st.removed OR {changed};
+        """, (ts,))
+        logging.info(f"Histórico da ladder: {cursor.rowcount} invocadores com mudanças.")
+
+        if complete:
+            cursor.execute("""
+                INSERT INTO ladder_history (summonerId, ts, removed)
+                SELECT st.summonerId, %s, TRUE
+                FROM ladder_state st
+                LEFT JOIN ladder_players_staging s ON s.summonerId = st.summonerId
+                WHERE s.summonerId IS NULL AND NOT st.removed;
+            """, (ts,))
+            logging.info(f"Histórico da ladder: {cursor.rowcount} invocadores saíram.")
+            cursor.execute("""
+                UPDATE ladder_state st
+                LEFT JOIN ladder_players_staging s ON s.summonerId = st.summonerId
+                SET st.removed = TRUE
+                WHERE s.summonerId IS NULL;
+            """)
+
+        cursor.execute(f"""
+            INSERT INTO ladder_state (summonerId, {columns}, removed)
+            SELECT s.summonerId, {', '.join(ENCODED[field] for field in FIELDS)}, FALSE
+            FROM ladder_players_staging s
+            ON DUPLICATE KEY UPDATE {updates}, removed = FALSE;
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def decode(state):
+    decoded = {
+        'tier': TIERS[state['tier'] - 1] if state.get('tier') else None,
+        'rank': DIVISIONS[state['division'] - 1] if state.get('division') else None,
+        'leaguePoints': state.get('leaguePoints'),
+        'wins': state.get('wins'),
+        'losses': state.get('losses'),
+    }
+    flags = state.get('flags')
+    for bit, flag in enumerate(FLAGS):
+        decoded[flag] = bool(flags >> bit & 1) if flags is not None else None
+    return decoded
+
+
+def _apply(state, row):
+    # Aplica um delta ao estado: só os campos marcados em changed, inclusive os
+    # que mudaram para NULL. Linhas da versão 1 (changed = 0) usam NULL como
+    # "inalterado".
+    if row['removed']:
+        return {'removed': True}
+    state = {field: value for field, value in state.items() if field != 'removed'}
+    changed = row.get('changed')
+    if changed:
+        fields = [field for bit, field in enumerate(FIELDS) if changed >> bit & 1]
+    else:
+        fields = [field for field in FIELDS if row[field] is not None]
+    for field in fields:
+        state[field] = row[field]
+    return state
+
+
+def get_lp_curve(conn, summoner_id, since=None, until=None):
+    # [(ts, tier, rank, leaguePoints)] reconstruído a partir dos deltas
+    cursor = conn.cursor(DictCursor)
+    cursor.execute(f"""
+        SELECT ts, {', '.join(FIELDS)}, changed, removed FROM ladder_history
+        WHERE summonerId = %s AND (%s IS NULL OR ts <= %s)
+        ORDER BY ts;
+    """, (summoner_id, until, until))
+    rows = cursor.fetchall()
+    cursor.close()
+
+    curve = []
+    state = {}
+    for row in rows:
+        state = _apply(state, row)
+        if state.get('removed') or (since is not None and row['ts'] < since):
+            continue
+        decoded = decode(state)
+        curve.append((row['ts'], decoded['tier'], decoded['rank'], decoded['leaguePoints']))
+    return curve
+
+
+def get_ladder_as_of(conn, as_of):
+    # Ladder completa como estava em as_of: {summonerId: campos decodificados}.
+    # Lê o histórico em streaming, ordenado pela chave primária.
+    cursor = conn.cursor(SSDictCursor)
+    cursor.execute(f"""
+        SELECT summonerId, ts, {', '.join(FIELDS)}, changed, removed FROM ladder_history
+        WHERE ts <= %s
+        ORDER BY summonerId, ts;
+    """, (as_of,))
+
+    ladder = {}
+    current_id = None
+    state = {}
+    for row in cursor:
+        if row['summonerId'] != current_id:
+            if current_id is not None and not state.get('removed'):
+                ladder[current_id] = decode(state)
+            current_id = row['summonerId']
+            state = {}
+        state = _apply(state, row)
+    if current_id is not None and not state.get('removed'):
+        ladder[current_id] = decode(state)
+    cursor.close()
+    return ladder
@@ -1,191 +1,250 @@
-import requests
-import mysql.connector
+import asyncio
 import json
 import os
-import time
 import logging
+from datetime import datetime, timezone
+
+import db
+import ladder_history
+import migrations
+from riot_client import RiotClient
 
 # Configurar o logging
 logging.basicConfig(filename='league_script.log', level=logging.DEBUG, 
                     format='%(asctime)s %(levelname)s %(message)s')
 
 # Configurar variáveis de ambiente
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
 RIOT_API_KEY = os.getenv('RIOT_API_KEY')
 
-# Conectar ao banco de dados
+# Filas e divisões percorridas na ladder
+QUEUES = ["RANKED_SOLO_5x5"]
+APEX_TIERS = ["CHALLENGER", "GRANDMASTER", "MASTER"]
+TIERS = ["DIAMOND", "EMERALD", "PLATINUM", "GOLD", "SILVER", "BRONZE", "IRON"]
+DIVISIONS = ["I", "II", "III", "IV"]
+
+# Conectar ao banco de dados (conexão do engine compartilhado em db.py)
 def connect_db():
     logging.info("Conectando ao banco de dados...")
-    return mysql.connector.connect(
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT,
-        database=DB_NAME
-    )
+    return db.raw_connection()
 
-# Verificar se a tabela 'players' existe
-def check_table_exists(conn):
-    logging.info("Verificando se a tabela 'players' existe...")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*)
-        FROM information_schema.tables 
-        WHERE table_schema = %s AND table_name = 'players';
-    """, (DB_NAME,))
-    exists = cursor.fetchone()[0] == 1
-    cursor.close()
-    return exists
+# Modelo versionado da tabela 'ladder_players'. Campos da API fora do modelo
+# (como miniSeries) vão para a coluna JSON extra, então uma mudança na resposta
+# da Riot não altera a estrutura da tabela a cada execução. A tabela 'players'
+# é o elenco acompanhado pelo analise.py e não é tocada aqui.
+PLAYERS_TABLE = 'ladder_players'
+STAGING_TABLE = 'ladder_players_staging'
 
-# Criar a tabela 'players' se não existir
-def create_table(conn):
-    logging.info("Criando a tabela 'players'...")
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS players (
-            summonerId VARCHAR(255) PRIMARY KEY,
-            leaguePoints INT,
-            rank VARCHAR(10),
-            wins INT,
-            losses INT,
-            veteran BOOLEAN,
-            inactive BOOLEAN,
-            freshBlood BOOLEAN,
-            hotStreak BOOLEAN
+# Incrementar sempre que PLAYERS_COLUMNS mudar
+PLAYERS_VERSION = 1
+
+PLAYERS_COLUMNS = [
+    ('summonerId', 'VARCHAR(80) NOT NULL'),
+    ('puuid', 'VARCHAR(78)'),
+    ('leagueId', 'VARCHAR(64)'),
+    ('queueType', 'VARCHAR(32)'),
+    ('tier', 'VARCHAR(16)'),
+    ('rank', 'VARCHAR(4)'),
+    ('leaguePoints', 'INT'),
+    ('wins', 'INT'),
+    ('losses', 'INT'),
+    ('veteran', 'BOOLEAN'),
+    ('inactive', 'BOOLEAN'),
+    ('freshBlood', 'BOOLEAN'),
+    ('hotStreak', 'BOOLEAN'),
+    ('extra', 'JSON'),
+]
+
+PLAYERS_TYPES = dict(PLAYERS_COLUMNS)
+
+# Colunas sincronizadas entre a staging e a tabela da ladder
+SYNC_COLUMNS = [name for name, _ in PLAYERS_COLUMNS]
+
+def players_table_sql(table):
+    columns = ',\n            '.join(f"`{name}` {sql_type}" for name, sql_type in PLAYERS_COLUMNS)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {columns},
+            PRIMARY KEY (summonerId)
         );
-    """)
-    conn.commit()
-    cursor.close()
-    logging.info("Tabela 'players' criada com sucesso.")
+    """
 
-# Imprimir estrutura da tabela
-def print_table_structure(conn):
-    logging.info("Imprimindo estrutura da tabela 'players'...")
+# Criar ou migrar a tabela da ladder. Se a versão gravada já é a do modelo,
+# custa uma consulta indexada; senão cria a tabela, adiciona as colunas que
+# faltam e ajusta os tipos. Colunas fora do modelo são deixadas como estão.
+def migrate_players_table(conn):
+    if migrations.get_schema_version(conn, PLAYERS_TABLE) == PLAYERS_VERSION:
+        return
+
+    logging.info(f"Migrando '{PLAYERS_TABLE}' para a versão {PLAYERS_VERSION} do esquema...")
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = %s AND table_name = 'players';
-    """, (DB_NAME,))
-    columns = cursor.fetchall()
+    cursor.execute(players_table_sql(PLAYERS_TABLE))
+    conn.commit()
+
+    existing = migrations.get_table_columns(conn, PLAYERS_TABLE)
+    changes = [f"ADD COLUMN `{name}` {PLAYERS_TYPES[name]}" for name, _ in PLAYERS_COLUMNS if name not in existing]
+    changes += [
+        f"MODIFY COLUMN `{name}` {PLAYERS_TYPES[name]}"
+        for name, column_type in existing.items()
+        if name in PLAYERS_TYPES and column_type.startswith('varchar')
+        and column_type != PLAYERS_TYPES[name].split()[0].lower()
+    ]
+    if changes:
+        cursor.execute(f"ALTER TABLE {PLAYERS_TABLE} {', '.join(changes)};")
+        conn.commit()
     cursor.close()
-    logging.info("Estrutura da tabela 'players':")
-    for column in columns:
-        logging.info(f"{column[0]}: {column[1]}")
-
-# Atualizar estrutura da tabela
-def update_table_structure(conn, api_response):
-    logging.info("Atualizando estrutura da tabela 'players'...")
-    existing_columns = set()
+
+    migrations.set_schema_version(conn, PLAYERS_TABLE, PLAYERS_VERSION)
+    logging.info(f"'{PLAYERS_TABLE}' migrada: {len(changes)} alterações de coluna.")
+
+# Converter uma entrada da API numa linha do modelo. Entradas novas podem vir
+# sem summonerId; nesse caso o puuid é usado como chave.
+def entry_to_row(entry):
+    row = {name: entry.get(name) for name in SYNC_COLUMNS if name != 'extra'}
+    row['summonerId'] = entry.get('summonerId') or entry.get('puuid')
+    extra = {key: value for key, value in entry.items() if key not in PLAYERS_TYPES}
+    row['extra'] = json.dumps(extra, separators=(',', ':')) if extra else None
+    return row
+
+# Recriar a tabela de staging que recebe o snapshot da ladder
+def prepare_staging_table(conn):
+    logging.info(f"Preparando a tabela '{STAGING_TABLE}'...")
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT column_name FROM information_schema.columns 
-        WHERE table_schema = %s AND table_name = 'players';
-    """, (DB_NAME,))
-    existing_columns = set(row[0] for row in cursor.fetchall())
-    
-    api_columns = set(api_response[0].keys())
-    
-    # Adicionar novas colunas
-    for column in api_columns - existing_columns:
-        cursor.execute(f"ALTER TABLE players ADD COLUMN {column} VARCHAR(255);")
-        logging.info(f"Coluna '{column}' adicionada.")
-    
-    # Remover colunas que não existem mais na API
-    for column in existing_columns - api_columns:
-        if column != "summonerId":  # Não remover a coluna chave primária
-            cursor.execute(f"ALTER TABLE players DROP COLUMN {column};")
-            logging.info(f"Coluna '{column}' removida.")
-    
+    cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE};")
+    cursor.execute(players_table_sql(STAGING_TABLE))
     conn.commit()
     cursor.close()
-    logging.info("Estrutura da tabela 'players' atualizada.")
 
-# Atualizar dados dos jogadores
-def update_players_data(conn, api_response):
-    logging.info("Atualizando dados dos jogadores...")
+# Gravar uma página de jogadores na staging, em lote
+def stage_players_page(conn, entries):
+    columns = ', '.join(f"`{column}`" for column in SYNC_COLUMNS)
+    values = ', '.join(f"%({column})s" for column in SYNC_COLUMNS)
+    updates = ', '.join(f"`{column}` = VALUES(`{column}`)" for column in SYNC_COLUMNS[1:])
     cursor = conn.cursor()
-    
-    # Obter todos os summonerIds existentes
-    cursor.execute("SELECT summonerId FROM players;")
-    existing_ids = set(row[0] for row in cursor.fetchall())
-    
-    api_ids = set(player['summonerId'] for player in api_response)
-    
-    # Inserir ou atualizar registros
-    for player in api_response:
-        if player['summonerId'] in existing_ids:
-            cursor.execute("""
-                UPDATE players SET
-                leaguePoints = %(leaguePoints)s,
-                rank = %(rank)s,
-                wins = %(wins)s,
-                losses = %(losses)s,
-                veteran = %(veteran)s,
-                inactive = %(inactive)s,
-                freshBlood = %(freshBlood)s,
-                hotStreak = %(hotStreak)s
-                WHERE summonerId = %(summonerId)s;
-            """, player)
-            logging.info(f"Jogador {player['summonerId']} atualizado.")
-        else:
-            cursor.execute("""
-                INSERT INTO players (summonerId, leaguePoints, rank, wins, losses, veteran, inactive, freshBlood, hotStreak)
-                VALUES (%(summonerId)s, %(leaguePoints)s, %(rank)s, %(wins)s, %(losses)s, %(veteran)s, %(inactive)s, %(freshBlood)s, %(hotStreak)s);
-            """, player)
-            logging.info(f"Jogador {player['summonerId']} inserido.")
-    
-    # Remover registros que não estão mais na API
-    for summonerId in existing_ids - api_ids:
-        cursor.execute("DELETE FROM players WHERE summonerId = %s;", (summonerId,))
-        logging.info(f"Jogador {summonerId} removido.")
-    
+    cursor.executemany(
+        f"INSERT INTO {STAGING_TABLE} ({columns}) VALUES ({values}) ON DUPLICATE KEY UPDATE {updates};",
+        [entry_to_row(entry) for entry in entries],
+    )
     conn.commit()
     cursor.close()
-    logging.info("Dados dos jogadores atualizados.")
 
-# Função para obter dados da API com controle de taxa de requisições
-def get_league_data(url):
-    logging.info(f"Fazendo requisição para {url}")
-    response = requests.get(url)
-    response.raise_for_status()
-    time.sleep(1)  # Aguardar 1 segundo entre as requisições
-    return response.json()['entries']
+# Aplicar o snapshot da staging na tabela da ladder com comandos em conjunto, numa
+# única transação: upsert de todos e remoção de quem não está mais na ladder
+def apply_staged_snapshot(conn, remove_departed=True):
+    logging.info(f"Aplicando snapshot da ladder em '{PLAYERS_TABLE}'...")
+    columns = ', '.join(f"`{column}`" for column in SYNC_COLUMNS)
+    updates = ', '.join(f"`{column}` = VALUES(`{column}`)" for column in SYNC_COLUMNS[1:])
+    cursor = conn.cursor()
+    try:
+        conn.begin()
+        cursor.execute(f"""
+            INSERT INTO {PLAYERS_TABLE} ({columns})
+            SELECT {columns} FROM {STAGING_TABLE}
+            ON DUPLICATE KEY UPDATE {updates};
+        """)
+        logging.info(f"{cursor.rowcount} linhas inseridas/atualizadas.")
+        if remove_departed:
+            cursor.execute(f"""
+                DELETE p FROM {PLAYERS_TABLE} p
+                LEFT JOIN {STAGING_TABLE} s ON s.summonerId = p.summonerId
+                WHERE s.summonerId IS NULL;
+            """)
+            logging.info(f"{cursor.rowcount} jogadores removidos.")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Percorrer as páginas de uma divisão até a API devolver uma página vazia
+async def crawl_division(client, queue, tier, division, pages):
+    page = 1
+    while True:
+        entries = await client.get_league_entries(queue, tier, division, page=page)
+        if entries is None:
+            logging.error(f"Falha na página {page} de {queue} {tier} {division}")
+            return False
+        if not entries:
+            return True
+        logging.info(f"{queue} {tier} {division}: página {page} com {len(entries)} entradas")
+        await pages.put(entries)
+        page += 1
+
+# Ligas Challenger, Grandmaster e Master vêm inteiras em uma única chamada
+async def crawl_apex_league(client, queue, tier, pages):
+    league = await client.get_apex_league(tier, queue)
+    if league is None:
+        logging.error(f"Falha ao obter liga {tier} da fila {queue}")
+        return False
+    entries = league.get('entries', [])
+    for entry in entries:
+        entry.setdefault('tier', league.get('tier', tier))
+        entry.setdefault('queueType', league.get('queue', queue))
+        entry.setdefault('leagueId', league.get('leagueId'))
+    if entries:
+        await pages.put(entries)
+    return True
+
+# Obter a ladder completa: todas as divisões rodam em paralelo sob o limitador
+# do RiotClient e cada página é entregue à fila assim que chega
+async def crawl_ladder(client, queues, pages):
+    tasks = []
+    for queue in queues:
+        for tier in APEX_TIERS:
+            tasks.append(crawl_apex_league(client, queue, tier, pages))
+        for tier in TIERS:
+            for division in DIVISIONS:
+                tasks.append(crawl_division(client, queue, tier, division, pages))
+    results = await asyncio.gather(*tasks)
+    return all(results)
+
+# Consumir as páginas e gravá-las na staging, sem acumular a ladder em memória;
+# no fim, aplicar o snapshot inteiro de uma vez
+async def sync_ladder(conn):
+    pages = asyncio.Queue(maxsize=32)
+    staged = 0
+
+    async def produce(client):
+        try:
+            return await crawl_ladder(client, QUEUES, pages)
+        finally:
+            await pages.put(None)
+
+    run_ts = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    prepare_staging_table(conn)
+    async with RiotClient(RIOT_API_KEY) as client:
+        crawl = asyncio.create_task(produce(client))
+        try:
+            while (entries := await pages.get()) is not None:
+                await asyncio.to_thread(stage_players_page, conn, entries)
+                staged += len(entries)
+        except BaseException:
+            crawl.cancel()
+            raise
+        complete = await crawl
+
+    logging.info(f"{staged} entradas na staging.")
+    if not staged:
+        logging.warning(f"Nenhuma entrada obtida; '{PLAYERS_TABLE}' não foi alterada.")
+        return
+    # Só remove jogadores ausentes se todas as páginas foram obtidas
+    if not complete:
+        logging.warning("Ladder incompleta; remoção de jogadores ausentes ignorada.")
+    ladder_history.record_snapshot(conn, run_ts, complete=complete)
+    apply_staged_snapshot(conn, remove_departed=complete)
+
+# Migrar as tabelas e sincronizar a ladder numa conexão já aberta
+def run(conn):
+    migrate_players_table(conn)
+    ladder_history.create_tables(conn)
+
+    asyncio.run(sync_ladder(conn))
 
 # Função principal
 def main():
     conn = connect_db()
     try:
-        if not check_table_exists(conn):
-            create_table(conn)
-        print_table_structure(conn)
-
-        all_players = []
-        queues = ["RANKED_SOLO_5x5"]
-        tiers = ["CHALLENGER", "GRANDMASTER", "MASTER"]
-        divisions = ["I", "II", "III", "IV"]
-        
-        # Obter dados dos Challenger, Grandmaster e Master
-        for tier in tiers:
-            for queue in queues:
-                url = f"https://br1.api.riotgames.com/lol/league/v4/{tier.lower()}leagues/by-queue/{queue}?api_key={RIOT_API_KEY}"
-                all_players.extend(get_league_data(url))
-        
-        # Obter dados das outras divisões
-        for queue in queues:
-            for tier in ["DIAMOND", "PLATINUM", "GOLD", "SILVER", "BRONZE", "IRON"]:
-                for division in divisions:
-                    url = f"https://br1.api.riotgames.com/lol/league/v4/entries/{queue}/{tier}/{division}?api_key={RIOT_API_KEY}"
-                    all_players.extend(get_league_data(url))
-        
-        # Atualizar a estrutura da tabela e os dados
-        if all_players:
-            update_table_structure(conn, all_players)
-            update_players_data(conn, all_players)
+        run(conn)
     except Exception as e:
         logging.error(f"Ocorreu um erro: {e}")
     finally:
@@ -0,0 +1,156 @@
+import gzip
+import json
+import os
+import sqlite3
+import struct
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Arquivo local dos payloads brutos de match-v5. Cada partida vira um quadro
+# comprimido (zstd, ou gzip sem o pacote zstandard) acrescentado a um arquivo
+# de segmento; um índice SQLite guarda segmento, offset e tamanho por match_id.
+# Com isso uma coluna nova é só reprocessar o arquivo, sem chamar a Riot.
+ARCHIVE_DIR = os.getenv(
+    "MATCH_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive", "matches"),
+)
+SEGMENT_SIZE = int(os.getenv("MATCH_ARCHIVE_SEGMENT_SIZE", str(64 * 1024 * 1024)))
+
+# Cabeçalho de cada quadro: tamanho do payload comprimido e do match_id
+FRAME_HEADER = struct.Struct('>IH')
+
+
+def _codec():
+    return 'zst' if zstandard is not None else 'gz'
+
+
+def compress(data, codec):
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, codec):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError("O pacote zstandard é necessário para ler segmentos .zst")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class MatchArchive:
+    def __init__(self, path=ARCHIVE_DIR, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        os.makedirs(path, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=60)
+        self.index.execute("PRAGMA journal_mode=WAL;")
+        self.index.execute("""
+        CREATE TABLE IF NOT EXISTS matches (
+            match_id TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            game_creation INTEGER
+        );
+        """)
+        self.index.commit()
+        self.segment = None
+        self.segment_file = None
+        self.segment_count = 0
+        self.readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, match_id):
+        row = self.index.execute("SELECT 1 FROM matches WHERE match_id = ?;", (match_id,)).fetchone()
+        return row is not None
+
+    def _open_segment(self):
+        # Nome único por processo, para que vários coletores possam gravar juntos
+        self.segment_count += 1
+        self.segment = f"seg-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self.segment_count}.{_codec()}"
+        self.segment_file = open(os.path.join(self.path, self.segment), 'ab')
+
+    def put(self, match_id, payload):
+        if self.readonly:
+            raise RuntimeError("Arquivo aberto somente para leitura")
+        if match_id in self:
+            return
+        if self.segment_file is None or self.segment_file.tell() >= SEGMENT_SIZE:
+            self.flush()
+            if self.segment_file is not None:
+                self.segment_file.close()
+            self._open_segment()
+
+        codec = self.segment.rsplit('.', 1)[1]
+        data = compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), codec)
+        key = match_id.encode('utf-8')
+        offset = self.segment_file.tell()
+        self.segment_file.write(FRAME_HEADER.pack(len(data), len(key)) + key + data)
+        creation = payload.get('info', {}).get('gameCreation')
+        # Quadro no disco e índice confirmado na hora: a transação de escrita do
+        # SQLite dura um INSERT, então coletores em outros processos não ficam
+        # esperando o lock do índice até o próximo flush
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        self.index.execute(
+            "INSERT OR IGNORE INTO matches (match_id, segment, offset, length, game_creation) VALUES (?, ?, ?, ?, ?);",
+            (match_id, self.segment, offset, FRAME_HEADER.size + len(key) + len(data), creation),
+        )
+        self.index.commit()
+
+    def flush(self):
+        # Os dados do segmento chegam ao disco antes do índice que aponta para eles
+        if self.segment_file is not None:
+            self.segment_file.flush()
+            os.fsync(self.segment_file.fileno())
+        self.index.commit()
+
+    def _read_frame(self, segment, offset, length):
+        if segment not in self.readers:
+            self.readers[segment] = open(os.path.join(self.path, segment), 'rb')
+        reader = self.readers[segment]
+        reader.seek(offset)
+        frame = reader.read(length)
+        data_length, key_length = FRAME_HEADER.unpack_from(frame)
+        start = FRAME_HEADER.size + key_length
+        data = frame[start:start + data_length]
+        return json.loads(decompress(data, segment.rsplit('.', 1)[1]))
+
+    def get(self, match_id):
+        row = self.index.execute(
+            "SELECT segment, offset, length FROM matches WHERE match_id = ?;", (match_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._read_frame(*row)
+
+    def segments(self):
+        return [row[0] for row in self.index.execute("SELECT DISTINCT segment FROM matches ORDER BY segment;")]
+
+    def iter_segment(self, segment):
+        rows = self.index.execute(
+            "SELECT match_id, offset, length FROM matches WHERE segment = ? ORDER BY offset;", (segment,)
+        ).fetchall()
+        for match_id, offset, length in rows:
+            yield match_id, self._read_frame(segment, offset, length)
+
+    def close(self):
+        if not self.readonly:
+            self.flush()
+        if self.segment_file is not None:
+            self.segment_file.close()
+            self.segment_file = None
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+        self.index.close()
@@ -0,0 +1,205 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+
+import pandas as pd
+from sqlalchemy import text
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+import match_schema
+
+# Cópia colunar de match_details em Parquet, particionada por patch e mês
+# (export/match_details/patch=14.11/month=2024-06/part-*.parquet). As
+# estatísticas leem só as colunas de que precisam daqui, sem carregar o banco.
+# Cada exportação acrescenta as linhas acima do último ingest_id exportado;
+# depois de um reprocessamento (nova geração em match_details_rewrites) o
+# export é refeito do zero.
+EXPORT_DIR = os.getenv(
+    "MATCH_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "export", "match_details"),
+)
+EXPORT_CHUNK_SIZE = int(os.getenv("MATCH_EXPORT_CHUNK_SIZE", "100000"))
+
+# Colunas de texto com poucos valores distintos, gravadas como dicionário
+DICTIONARY_COLUMNS = (
+    ['player_name', 'game_version', 'champion', 'summoner1', 'summoner2']
+    + [f'item{i}' for i in range(7)]
+    + [f'ban{i}' for i in range(1, 6)]
+    + ['individualPosition', 'teamPosition', 'role', 'lane']
+)
+
+PARTITION_COLUMNS = ['patch', 'month']
+STATE_FILE = '_state.json'
+
+
+def arrow_type(name, sql_type):
+    base = sql_type.split('(')[0].split()[0].upper()
+    if base == 'VARCHAR':
+        return pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_COLUMNS else pa.string()
+    return {
+        'SMALLINT': pa.int16(),
+        'INT': pa.int32(),
+        'BIGINT': pa.int64(),
+        'FLOAT': pa.float32(),
+        'DOUBLE': pa.float64(),
+        'BOOLEAN': pa.bool_(),
+        'TIMESTAMP': pa.timestamp('ms'),
+    }[base]
+
+
+def arrow_schema():
+    return pa.schema([(name, arrow_type(name, sql_type)) for name, sql_type in match_schema.MATCH_DETAILS_COLUMNS])
+
+
+def partitioning():
+    # Tipo explícito: sem ele "14.10" seria lido como número
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor='hive')
+
+
+class MatchExport:
+    def __init__(self, path=EXPORT_DIR):
+        if pa is None:
+            raise RuntimeError("O pacote pyarrow é necessário para o export em Parquet")
+        self.path = path
+        self.schema = arrow_schema()
+        os.makedirs(path, exist_ok=True)
+
+    def _state_path(self):
+        return os.path.join(self.path, STATE_FILE)
+
+    def _state(self):
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def last_ingest_id(self):
+        return self._state().get('last_ingest_id', 0)
+
+    def rewrite_generation(self):
+        return self._state().get('rewrite_generation', 0)
+
+    def commit(self, ingest_id, generation=0):
+        # Troca atômica: a marca só avança depois que os arquivos estão gravados
+        temp_path = self._state_path() + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'last_ingest_id': ingest_id, 'rewrite_generation': generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._state_path())
+
+    def clear(self):
+        shutil.rmtree(self.path)
+        os.makedirs(self.path, exist_ok=True)
+
+    def discard_uncommitted(self, since):
+        # Arquivos de uma exportação interrompida a partir da mesma marca
+        for path in glob.glob(os.path.join(self.path, '**', f'part-{since}-*.parquet'), recursive=True):
+            os.remove(path)
+
+    def to_table(self, df):
+        df = df.reindex(columns=self.schema.names)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.cast(self.schema, safe=False)
+        datetimes = df['game_datetime']
+        months = pd.to_datetime(datetimes).dt.strftime('%Y-%m').fillna('unknown')
+        return (
+            table.append_column('patch', pa.array(df['game_version'].fillna('unknown').astype(str)))
+            .append_column('month', pa.array(months.astype(str)))
+        )
+
+    def append(self, df, since, part):
+        ds.write_dataset(
+            self.to_table(df), self.path, format='parquet',
+            partitioning=partitioning(),
+            basename_template=f'part-{since}-{part}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression='zstd', use_dictionary=DICTIONARY_COLUMNS,
+            ),
+        )
+
+    def scan(self, columns, since=None, until=None, patches=None, chunksize=EXPORT_CHUNK_SIZE):
+        # DataFrames em blocos, só com as colunas pedidas. Colunas de dicionário
+        # voltam como texto para que os groupby não virem categóricos.
+        if not glob.glob(os.path.join(self.path, '**', '*.parquet'), recursive=True):
+            return
+        dataset = ds.dataset(self.path, format='parquet', partitioning=partitioning())
+        condition = None
+        if since is not None:
+            condition = ds.field('ingest_id') > since
+        if until is not None:
+            condition = (ds.field('ingest_id') <= until) if condition is None else condition & (ds.field('ingest_id') <= until)
+        if patches is not None:
+            selected = ds.field('patch').isin([patch or 'unknown' for patch in patches])
+            condition = selected if condition is None else condition & selected
+        for batch in dataset.to_batches(columns=list(columns), filter=condition, batch_size=chunksize):
+            arrays = [
+                column.dictionary_decode() if pa.types.is_dictionary(column.type) else column
+                for column in batch.columns
+            ]
+            yield pa.RecordBatch.from_arrays(arrays, names=batch.schema.names).to_pandas()
+
+    def changed_patches(self, since, until):
+        patches = set()
+        for chunk in self.scan(['game_version'], since, until):
+            patches.update(chunk['game_version'].fillna(''))
+        return sorted(patches)
+
+
+def export_match_details(session, store, full=False):
+    # Acrescenta ao store as linhas de match_details com ingest_id acima da
+    # marca gravada, em blocos lidos por um cursor no servidor. Se match_details
+    # foi regravada depois do último export, as linhas antigas são descartadas.
+    generation = session.execute(text(match_schema.REWRITE_GENERATION_SQL)).scalar()
+    if full or store.rewrite_generation() < generation:
+        store.clear()
+    since = store.last_ingest_id()
+    ceiling = session.execute(text("SELECT COALESCE(MAX(ingest_id), 0) FROM match_details;")).scalar()
+    if since >= ceiling:
+        print("Export Parquet já está atualizado.")
+        return 0
+
+    store.discard_uncommitted(since)
+    columns = ', '.join(f'`{name}`' for name, _ in match_schema.MATCH_DETAILS_COLUMNS)
+    query = text(f"""
+    SELECT {columns} FROM match_details
+    WHERE ingest_id > :since AND ingest_id <= :until
+    ORDER BY ingest_id;
+    """).execution_options(stream_results=True)
+    exported = 0
+    chunks = pd.read_sql(query, session.connection(), params={'since': since, 'until': ceiling}, chunksize=EXPORT_CHUNK_SIZE)
+    for part, chunk in enumerate(chunks):
+        store.append(chunk, since, part)
+        exported += len(chunk)
+    store.commit(ceiling, generation)
+    print(f"Export Parquet: {exported} linhas até ingest_id {ceiling}.")
+    return exported
+
+
+def main():
+    from analise_detalhada import connect_db, create_tables
+
+    parser = argparse.ArgumentParser(description="Export de match_details em Parquet")
+    parser.add_argument('--full', action='store_true', help="apaga o export e exporta a tabela inteira")
+    parser.add_argument('--path', default=EXPORT_DIR, help="diretório do export")
+    args = parser.parse_args()
+
+    session = connect_db()
+    try:
+        create_tables(session)
+        export_match_details(session, MatchExport(args.path), full=args.full)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
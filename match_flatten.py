@@ -0,0 +1,271 @@
+import time
+from datetime import datetime, timezone
+
+# Tabela de campos de match_details: (coluna, origem, chave, conversor).
+# Origens:
+#   match       -> atributos da partida (match_id)
+#   player      -> jogador acompanhado (player_name)
+#   info        -> match['info']
+#   participant -> o participante
+#   challenges  -> participant['challenges']
+#   team        -> objetivos do time do participante (info['teams'][i]['objectives'])
+#   ban         -> n-ésimo ban do time do participante
+# Conversores são nomes resolvidos em compile_fields; None copia o valor.
+MATCH_FIELDS = [
+    ('match_id', 'match', 'match_id', None),
+    ('player_name', 'player', 'player_name', None),
+    ('game_version', 'info', 'gameVersion', 'game_version'),
+    ('game_datetime', 'info', 'gameCreation', 'datetime_ms'),
+    ('duration', 'info', 'gameDuration', 'clock'),
+    ('win', 'participant', 'win', 'bool'),
+    ('champion', 'participant', 'championName', None),
+    ('level', 'participant', 'champLevel', None),
+    ('kills', 'participant', 'kills', None),
+    ('deaths', 'participant', 'deaths', None),
+    ('assists', 'participant', 'assists', None),
+    ('damage_dealt', 'participant', 'totalDamageDealtToChampions', None),
+    ('damage_taken', 'participant', 'totalDamageTaken', None),
+    ('vision_score', 'participant', 'visionScore', None),
+    ('cs', 'participant', 'totalMinionsKilled', None),
+    ('gold_earned', 'participant', 'goldEarned', None),
+    ('summoner1', 'participant', 'summoner1Id', 'summoner'),
+    ('summoner2', 'participant', 'summoner2Id', 'summoner'),
+    ('item0', 'participant', 'item0', 'item'),
+    ('item1', 'participant', 'item1', 'item'),
+    ('item2', 'participant', 'item2', 'item'),
+    ('item3', 'participant', 'item3', 'item'),
+    ('item4', 'participant', 'item4', 'item'),
+    ('item5', 'participant', 'item5', 'item'),
+    ('item6', 'participant', 'item6', 'item'),
+    ('ban1', 'ban', 0, 'champion'),
+    ('ban2', 'ban', 1, 'champion'),
+    ('ban3', 'ban', 2, 'champion'),
+    ('ban4', 'ban', 3, 'champion'),
+    ('ban5', 'ban', 4, 'champion'),
+    ('dragons', 'team', 'dragon', None),
+    ('towers', 'team', 'tower', None),
+    ('inhibitors', 'team', 'inhibitor', None),
+    ('rift_heralds', 'team', 'riftHerald', None),
+    ('vilemaws', 'team', 'vilemaw', None),
+    ('barons', 'team', 'baron', None),
+    ('champExperience', 'participant', 'champExperience', None),
+    ('champLevel', 'participant', 'champLevel', None),
+    ('individualPosition', 'participant', 'individualPosition', None),
+    ('teamPosition', 'participant', 'teamPosition', None),
+    ('role', 'participant', 'role', None),
+    ('lane', 'participant', 'lane', None),
+    ('baronpowerplay', 'challenges', 'baronBuffGoldAdvantageOverThreshold', None),
+    ('bounty', 'challenges', 'bountyGold', None),
+    ('buffsStolen', 'challenges', 'buffsStolen', None),
+    ('stackitemsup', 'challenges', 'completeSupportQuestInTime', None),
+    ('pinks', 'challenges', 'controlWardsPlaced', None),
+    ('damagePerMinute', 'challenges', 'damagePerMinute', None),
+    ('percentualdedanorecebido', 'challenges', 'damageTakenOnTeamPercentage', None),
+    ('passinhos', 'challenges', 'dodgeSkillShotsSmallWindow', None),
+    ('lanediff', 'challenges', 'earlyLaningPhaseGoldExpAdvantage', None),
+    ('curaescudo', 'challenges', 'effectiveHealAndShielding', None),
+    ('cc', 'challenges', 'enemyChampionImmobilizations', None),
+    ('jungleroubada', 'challenges', 'enemyJungleMonsterKills', None),
+    ('objetivosroubados', 'challenges', 'epicMonsterSteals', None),
+    ('objetivosroubadossemsmite', 'challenges', 'epicMonsterStolenWithoutSmite', None),
+    ('firstbrick', 'challenges', 'firstTurretKilled', None),
+    ('tempofirstbrick', 'challenges', 'firstTurretKilledTime', 'clock'),
+    ('sucessoemganks', 'challenges', 'getTakedownsInAllLanesEarlyJungleAsLaner', None),
+    ('goldPerMinute', 'challenges', 'goldPerMinute', None),
+    ('doublebuff', 'challenges', 'initialBuffCount', None),
+    ('primeiroaronga', 'challenges', 'initialCrabCount', None),
+    ('jungleCsBefore10Minutes', 'challenges', 'jungleCsBefore10Minutes', None),
+    ('kda', 'challenges', 'kda', None),
+    ('killParticipation', 'challenges', 'killParticipation', None),
+    ('dives', 'challenges', 'killsNearEnemyTurret', None),
+    ('ganksearly', 'challenges', 'killsOnOtherLanesEarlyJungleAsLaner', None),
+    ('sobrevivenciadive', 'challenges', 'killsUnderOwnTurret', None),
+    ('SkillShotsEarlyGame', 'challenges', 'landSkillShotsEarlyGame', None),
+    ('laneMinionsFirst10Minutes', 'challenges', 'laneMinionsFirst10Minutes', None),
+    ('laningPhaseGoldExpAdvantage', 'challenges', 'laningPhaseGoldExpAdvantage', None),
+    ('maxCsAdvantageOnLaneOpponent', 'challenges', 'maxCsAdvantageOnLaneOpponent', None),
+    ('maxKillDeficit', 'challenges', 'maxKillDeficit', None),
+    ('maxLevelLeadLaneOpponent', 'challenges', 'maxLevelLeadLaneOpponent', None),
+    ('moreEnemyJungleThanOpponent', 'challenges', 'moreEnemyJungleThanOpponent', None),
+    ('multikills', 'challenges', 'multikills', None),
+    ('multikillsAfterAggressiveFlash', 'challenges', 'multikillsAfterAggressiveFlash', None),
+    ('outnumberedKills', 'challenges', 'outnumberedKills', None),
+    ('pickKillWithAlly', 'challenges', 'pickKillWithAlly', None),
+    ('playedChampSelectPosition', 'challenges', 'playedChampSelectPosition', None),
+    ('quickCleanse', 'challenges', 'quickCleanse', None),
+    ('quickFirstTurret', 'challenges', 'quickFirstTurret', None),
+    ('quickSoloKills', 'challenges', 'quickSoloKills', None),
+    ('saveAllyFromDeath', 'challenges', 'saveAllyFromDeath', None),
+    ('scuttleCrabKills', 'challenges', 'scuttleCrabKills', None),
+    ('skillshotsDodged', 'challenges', 'skillshotsDodged', None),
+    ('skillshotsHit', 'challenges', 'skillshotsHit', None),
+    ('soloKills', 'challenges', 'soloKills', None),
+    ('soloTurretsLategame', 'challenges', 'soloTurretsLategame', None),
+    ('stealthWardsPlaced', 'challenges', 'stealthWardsPlaced', None),
+    ('takedownOnFirstTurret', 'challenges', 'takedownOnFirstTurret', None),
+    ('takedowns', 'challenges', 'takedowns', None),
+    ('takedownsAfterGainingLevelAdvantage', 'challenges', 'takedownsAfterGainingLevelAdvantage', None),
+    ('takedownsBeforeJungleMinionSpawn', 'challenges', 'takedownsBeforeJungleMinionSpawn', None),
+    ('takedownsFirstXMinutes', 'challenges', 'takedownsFirstXMinutes', None),
+    ('teamDamagePercentage', 'challenges', 'teamDamagePercentage', None),
+    ('turretPlatesTaken', 'challenges', 'turretPlatesTaken', None),
+    ('turretTakedowns', 'challenges', 'turretTakedowns', None),
+    ('visionScoreAdvantageLaneOpponent', 'challenges', 'visionScoreAdvantageLaneOpponent', None),
+    ('visionScorePerMinute', 'challenges', 'visionScorePerMinute', None),
+    ('wardTakedowns', 'challenges', 'wardTakedowns', None),
+    ('wardTakedownsBefore20M', 'challenges', 'wardTakedownsBefore20M', None),
+    ('wardsGuarded', 'challenges', 'wardsGuarded', None),
+    ('damageDealtToBuildings', 'participant', 'damageDealtToBuildings', None),
+    ('damageDealtToObjectives', 'participant', 'damageDealtToObjectives', None),
+    ('damageDealtToTurrets', 'participant', 'damageDealtToTurrets', None),
+    ('damageSelfMitigated', 'participant', 'damageSelfMitigated', None),
+    ('detectorWardsPlaced', 'participant', 'detectorWardsPlaced', None),
+    ('doubleKills', 'participant', 'doubleKills', None),
+    ('firstBloodAssist', 'participant', 'firstBloodAssist', None),
+    ('firstBloodKill', 'participant', 'firstBloodKill', None),
+    ('firstTowerAssist', 'participant', 'firstTowerAssist', None),
+    ('firstTowerKill', 'participant', 'firstTowerKill', None),
+    ('gameEndedInEarlySurrender', 'participant', 'gameEndedInEarlySurrender', None),
+    ('gameEndedInSurrender', 'participant', 'gameEndedInSurrender', None),
+    ('goldEarned', 'participant', 'goldEarned', None),
+    ('goldSpent', 'participant', 'goldSpent', None),
+    ('inhibitorKills', 'participant', 'inhibitorKills', None),
+    ('killingSprees', 'participant', 'killingSprees', None),
+    ('largestCriticalStrike', 'participant', 'largestCriticalStrike', None),
+    ('largestKillingSpree', 'participant', 'largestKillingSpree', None),
+    ('largestMultiKill', 'participant', 'largestMultiKill', None),
+    ('longestTimeSpentLiving', 'participant', 'longestTimeSpentLiving', None),
+    ('neutralMinionsKilled', 'participant', 'neutralMinionsKilled', None),
+    ('objectivesStolen', 'participant', 'objectivesStolen', None),
+    ('objectivesStolenAssists', 'participant', 'objectivesStolenAssists', None),
+    ('participantId', 'participant', 'participantId', None),
+    ('pentaKills', 'participant', 'pentaKills', None),
+    ('quadraKills', 'participant', 'quadraKills', None),
+    ('sightWardsBoughtInGame', 'participant', 'sightWardsBoughtInGame', None),
+    ('teamEarlySurrendered', 'participant', 'teamEarlySurrendered', None),
+    ('timeCCingOthers', 'participant', 'timeCCingOthers', None),
+    ('timePlayed', 'participant', 'timePlayed', None),
+    ('totalDamageDealtToChampions', 'participant', 'totalDamageDealtToChampions', None),
+    ('totalDamageShieldedOnTeammates', 'participant', 'totalDamageShieldedOnTeammates', None),
+    ('totalDamageTaken', 'participant', 'totalDamageTaken', None),
+    ('totalHeal', 'participant', 'totalHeal', None),
+    ('totalHealsOnTeammates', 'participant', 'totalHealsOnTeammates', None),
+    ('totalMinionsKilled', 'participant', 'totalMinionsKilled', None),
+    ('totalTimeCCDealt', 'participant', 'totalTimeCCDealt', None),
+    ('totalTimeSpentDead', 'participant', 'totalTimeSpentDead', None),
+    ('tripleKills', 'participant', 'tripleKills', None),
+    ('turretKills', 'participant', 'turretKills', None),
+    ('turretsLost', 'participant', 'turretsLost', None),
+    ('unrealKills', 'participant', 'unrealKills', None),
+    ('visionWardsBoughtInGame', 'participant', 'visionWardsBoughtInGame', None),
+    ('wardsKilled', 'participant', 'wardsKilled', None),
+    ('wardsPlaced', 'participant', 'wardsPlaced', None),
+]
+
+COLUMNS = tuple(column for column, _, _, _ in MATCH_FIELDS)
+
+# Posição de cada origem na tupla de contexto montada por participante
+SOURCES = {'match': 0, 'player': 1, 'info': 2, 'participant': 3, 'challenges': 4, 'team': 5, 'ban': 6}
+
+
+def extract_game_version(version):
+    return '.'.join(version.split('.')[:2])
+
+
+def correct_game_version(version):
+    return version.replace(',', '.')
+
+
+def convert_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return time.strftime('%H:%M:%S', time.gmtime(timestamp))
+
+
+def _converters(translations):
+    items = translations['items']
+    summoners = translations['summoners']
+    champions = translations['champions']
+    return {
+        'game_version': lambda v: correct_game_version(extract_game_version(v)) if v else None,
+        'datetime_ms': lambda v: datetime.fromtimestamp(v / 1000, timezone.utc).replace(tzinfo=None) if v is not None else None,
+        'clock': convert_timestamp,
+        'bool': bool,
+        'item': lambda v: items.get(v, v),
+        'summoner': lambda v: summoners.get(v, v),
+        'champion': lambda v: champions.get(v) if v is not None else None,
+    }
+
+
+def _getter(source, key, convert):
+    slot = SOURCES[source]
+    if source in ('match', 'player'):
+        return lambda ctx: ctx[slot]
+    if source == 'team':
+        read = lambda ctx: ctx[slot].get(key, {}).get('kills')
+    elif source == 'ban':
+        read = lambda ctx: ctx[slot][key].get('championId') if len(ctx[slot]) > key else None
+    else:
+        read = lambda ctx: ctx[slot].get(key)
+    if convert is None:
+        return read
+    return lambda ctx: convert(read(ctx))
+
+
+# (traduções, leitores) do último conjunto compilado. O dict de traduções fica
+# guardado e é comparado por identidade: o id() de um dict já coletado pode ser
+# reaproveitado por outro patch ou idioma.
+_compiled = (None, None)
+
+
+def compile_fields(translations):
+    # Um leitor por coluna, montado uma vez para cada conjunto de traduções
+    global _compiled
+    compiled_for, fields = _compiled
+    if compiled_for is not translations:
+        converters = _converters(translations)
+        fields = [
+            _getter(source, path, converters[convert] if convert else None)
+            for _, source, path, convert in MATCH_FIELDS
+        ]
+        _compiled = (translations, fields)
+    return fields
+
+
+def _contexts(match_id, match_data, roster):
+    # Um contexto por participante acompanhado; objetivos e bans são do time dele
+    info = match_data['info']
+    teams = {team.get('teamId'): team for team in info.get('teams', [])}
+    for participant in info['participants']:
+        player_name = roster.get(participant['puuid'])
+        if not player_name:
+            continue
+        team = teams.get(participant.get('teamId'), {})
+        yield (
+            match_id,
+            player_name,
+            info,
+            participant,
+            participant.get('challenges') or {},
+            team.get('objectives', {}),
+            team.get('bans', []),
+        )
+
+
+def extract_rows(match_id, match_data, roster, translations):
+    getters = compile_fields(translations)
+    return [
+        dict(zip(COLUMNS, [get(ctx) for get in getters]))
+        for ctx in _contexts(match_id, match_data, roster)
+    ]
+
+
+def extract_columns(matches, roster, translations):
+    # Achata um lote de partidas [(match_id, payload)] em colunas {coluna: [valores]}
+    getters = compile_fields(translations)
+    columns = [[] for _ in COLUMNS]
+    for match_id, match_data in matches:
+        for ctx in _contexts(match_id, match_data, roster):
+            for values, get in zip(columns, getters):
+                values.append(get(ctx))
+    return dict(zip(COLUMNS, columns))
@@ -0,0 +1,275 @@
+import migrations
+
+# Modelo declarativo da tabela match_details: uma entrada por coluna gerada em
+# analise.extract_match_details, com o tipo SQL correspondente. Estatísticas
+# numéricas usam tipos numéricos para que o banco agregue sem conversões.
+MATCH_DETAILS_TABLE = 'match_details'
+MATCH_DETAILS_PRIMARY_KEY = ('match_id', 'player_name')
+
+# Incrementar sempre que MATCH_DETAILS_COLUMNS mudar
+MATCH_DETAILS_VERSION = 2
+
+# Sequência de ingestão: atribuída pelo banco na inserção e mantida quando a
+# linha é regravada. analise_detalhada usa como marca d'água incremental.
+INGEST_ID_COLUMN = 'ingest_id'
+
+# Como o ingest_id é mantido, linhas regravadas em massa (analise.py reprocess)
+# não aparecem para os consumidores incrementais. Cada reprocessamento grava
+# uma geração nova aqui; quem guardou uma geração menor refaz tudo.
+REWRITES_TABLE = 'match_details_rewrites'
+CREATE_REWRITES_SQL = f"""
+CREATE TABLE IF NOT EXISTS {REWRITES_TABLE} (
+    generation BIGINT AUTO_INCREMENT PRIMARY KEY,
+    rewritten_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+REWRITE_GENERATION_SQL = f"SELECT COALESCE(MAX(generation), 0) FROM {REWRITES_TABLE};"
+
+MATCH_DETAILS_COLUMNS = [
+    ('match_id', 'VARCHAR(50) NOT NULL'),
+    ('player_name', 'VARCHAR(50) NOT NULL'),
+    ('game_version', 'VARCHAR(10)'),
+    ('game_datetime', 'TIMESTAMP NULL'),
+    ('duration', 'VARCHAR(8)'),
+    ('win', 'BOOLEAN'),
+    ('champion', 'VARCHAR(50)'),
+    ('level', 'SMALLINT'),
+    ('kills', 'INT'),
+    ('deaths', 'INT'),
+    ('assists', 'INT'),
+    ('damage_dealt', 'INT'),
+    ('damage_taken', 'INT'),
+    ('vision_score', 'INT'),
+    ('cs', 'INT'),
+    ('gold_earned', 'INT'),
+    ('summoner1', 'VARCHAR(50)'),
+    ('summoner2', 'VARCHAR(50)'),
+    ('item0', 'VARCHAR(50)'),
+    ('item1', 'VARCHAR(50)'),
+    ('item2', 'VARCHAR(50)'),
+    ('item3', 'VARCHAR(50)'),
+    ('item4', 'VARCHAR(50)'),
+    ('item5', 'VARCHAR(50)'),
+    ('item6', 'VARCHAR(50)'),
+    ('ban1', 'VARCHAR(50)'),
+    ('ban2', 'VARCHAR(50)'),
+    ('ban3', 'VARCHAR(50)'),
+    ('ban4', 'VARCHAR(50)'),
+    ('ban5', 'VARCHAR(50)'),
+    ('dragons', 'INT'),
+    ('towers', 'INT'),
+    ('inhibitors', 'INT'),
+    ('rift_heralds', 'INT'),
+    ('vilemaws', 'INT'),
+    ('barons', 'INT'),
+    ('champExperience', 'INT'),
+    ('champLevel', 'SMALLINT'),
+    ('individualPosition', 'VARCHAR(16)'),
+    ('teamPosition', 'VARCHAR(16)'),
+    ('role', 'VARCHAR(16)'),
+    ('lane', 'VARCHAR(16)'),
+    ('baronpowerplay', 'INT'),
+    ('bounty', 'FLOAT'),
+    ('buffsStolen', 'INT'),
+    ('stackitemsup', 'INT'),
+    ('pinks', 'INT'),
+    ('damagePerMinute', 'FLOAT'),
+    ('percentualdedanorecebido', 'FLOAT'),
+    ('passinhos', 'INT'),
+    ('lanediff', 'INT'),
+    ('curaescudo', 'FLOAT'),
+    ('cc', 'INT'),
+    ('jungleroubada', 'FLOAT'),
+    ('objetivosroubados', 'INT'),
+    ('objetivosroubadossemsmite', 'INT'),
+    ('firstbrick', 'INT'),
+    ('tempofirstbrick', 'VARCHAR(8)'),
+    ('sucessoemganks', 'INT'),
+    ('goldPerMinute', 'FLOAT'),
+    ('doublebuff', 'INT'),
+    ('primeiroaronga', 'INT'),
+    ('jungleCsBefore10Minutes', 'FLOAT'),
+    ('kda', 'FLOAT'),
+    ('killParticipation', 'FLOAT'),
+    ('dives', 'INT'),
+    ('ganksearly', 'INT'),
+    ('sobrevivenciadive', 'INT'),
+    ('SkillShotsEarlyGame', 'INT'),
+    ('laneMinionsFirst10Minutes', 'INT'),
+    ('laningPhaseGoldExpAdvantage', 'INT'),
+    ('maxCsAdvantageOnLaneOpponent', 'FLOAT'),
+    ('maxKillDeficit', 'INT'),
+    ('maxLevelLeadLaneOpponent', 'INT'),
+    ('moreEnemyJungleThanOpponent', 'FLOAT'),
+    ('multikills', 'INT'),
+    ('multikillsAfterAggressiveFlash', 'INT'),
+    ('outnumberedKills', 'INT'),
+    ('pickKillWithAlly', 'INT'),
+    ('playedChampSelectPosition', 'INT'),
+    ('quickCleanse', 'INT'),
+    ('quickFirstTurret', 'INT'),
+    ('quickSoloKills', 'INT'),
+    ('saveAllyFromDeath', 'INT'),
+    ('scuttleCrabKills', 'INT'),
+    ('skillshotsDodged', 'INT'),
+    ('skillshotsHit', 'INT'),
+    ('soloKills', 'INT'),
+    ('soloTurretsLategame', 'INT'),
+    ('stealthWardsPlaced', 'INT'),
+    ('takedownOnFirstTurret', 'INT'),
+    ('takedowns', 'INT'),
+    ('takedownsAfterGainingLevelAdvantage', 'INT'),
+    ('takedownsBeforeJungleMinionSpawn', 'INT'),
+    ('takedownsFirstXMinutes', 'INT'),
+    ('teamDamagePercentage', 'FLOAT'),
+    ('turretPlatesTaken', 'INT'),
+    ('turretTakedowns', 'INT'),
+    ('visionScoreAdvantageLaneOpponent', 'FLOAT'),
+    ('visionScorePerMinute', 'FLOAT'),
+    ('wardTakedowns', 'INT'),
+    ('wardTakedownsBefore20M', 'INT'),
+    ('wardsGuarded', 'INT'),
+    ('damageDealtToBuildings', 'INT'),
+    ('damageDealtToObjectives', 'INT'),
+    ('damageDealtToTurrets', 'INT'),
+    ('damageSelfMitigated', 'INT'),
+    ('detectorWardsPlaced', 'INT'),
+    ('doubleKills', 'INT'),
+    ('firstBloodAssist', 'BOOLEAN'),
+    ('firstBloodKill', 'BOOLEAN'),
+    ('firstTowerAssist', 'BOOLEAN'),
+    ('firstTowerKill', 'BOOLEAN'),
+    ('gameEndedInEarlySurrender', 'BOOLEAN'),
+    ('gameEndedInSurrender', 'BOOLEAN'),
+    ('goldEarned', 'INT'),
+    ('goldSpent', 'INT'),
+    ('inhibitorKills', 'INT'),
+    ('killingSprees', 'INT'),
+    ('largestCriticalStrike', 'INT'),
+    ('largestKillingSpree', 'INT'),
+    ('largestMultiKill', 'INT'),
+    ('longestTimeSpentLiving', 'INT'),
+    ('neutralMinionsKilled', 'INT'),
+    ('objectivesStolen', 'INT'),
+    ('objectivesStolenAssists', 'INT'),
+    ('participantId', 'SMALLINT'),
+    ('pentaKills', 'INT'),
+    ('quadraKills', 'INT'),
+    ('sightWardsBoughtInGame', 'INT'),
+    ('teamEarlySurrendered', 'BOOLEAN'),
+    ('timeCCingOthers', 'INT'),
+    ('timePlayed', 'INT'),
+    ('totalDamageDealtToChampions', 'INT'),
+    ('totalDamageShieldedOnTeammates', 'INT'),
+    ('totalDamageTaken', 'INT'),
+    ('totalHeal', 'INT'),
+    ('totalHealsOnTeammates', 'INT'),
+    ('totalMinionsKilled', 'INT'),
+    ('totalTimeCCDealt', 'INT'),
+    ('totalTimeSpentDead', 'INT'),
+    ('tripleKills', 'INT'),
+    ('turretKills', 'INT'),
+    ('turretsLost', 'INT'),
+    ('unrealKills', 'INT'),
+    ('visionWardsBoughtInGame', 'INT'),
+    ('wardsKilled', 'INT'),
+    ('wardsPlaced', 'INT'),
+    ('is_ranked', 'BOOLEAN'),
+    ('ingest_id', 'BIGINT NOT NULL AUTO_INCREMENT'),
+]
+
+MATCH_DETAILS_TYPES = dict(MATCH_DETAILS_COLUMNS)
+
+
+def is_numeric(sql_type):
+    return sql_type.split('(')[0].split()[0].upper() in ('INT', 'SMALLINT', 'BIGINT', 'FLOAT', 'DOUBLE', 'BOOLEAN')
+
+
+# Colunas numéricas do modelo (sem booleanos), usadas pelas agregações
+NUMERIC_COLUMNS = [
+    name for name, sql_type in MATCH_DETAILS_COLUMNS
+    if is_numeric(sql_type) and not sql_type.startswith('BOOLEAN') and name != INGEST_ID_COLUMN
+]
+
+
+def create_table_sql():
+    columns = ',\n    '.join(f"{name} {sql_type}" for name, sql_type in MATCH_DETAILS_COLUMNS)
+    primary_key = ', '.join(MATCH_DETAILS_PRIMARY_KEY)
+    return f"""
+CREATE TABLE IF NOT EXISTS {MATCH_DETAILS_TABLE} (
+    {columns},
+    PRIMARY KEY ({primary_key}),
+    KEY idx_{MATCH_DETAILS_TABLE}_{INGEST_ID_COLUMN} ({INGEST_ID_COLUMN})
+);
+"""
+
+
+def clean_varchar_sql(names):
+    # Normaliza valores gravados como texto antes da conversão de tipo:
+    # vazio vira NULL e 'True'/'False' viram 1/0. Uma única varredura da tabela.
+    assignments = ', '.join(
+        f"{name} = CASE {name} WHEN '' THEN NULL WHEN 'True' THEN '1' WHEN 'False' THEN '0' ELSE {name} END"
+        for name in names
+    )
+    return f"UPDATE {MATCH_DETAILS_TABLE} SET {assignments};"
+
+
+def migrate_match_details(connection):
+    # Roda uma vez por execução. Se a versão gravada já é a do modelo, custa uma
+    # consulta indexada; senão cria/completa a tabela, converte colunas VARCHAR
+    # que deveriam ser numéricas e ajusta a chave primária num único ALTER.
+    if migrations.get_schema_version(connection, MATCH_DETAILS_TABLE) == MATCH_DETAILS_VERSION:
+        return
+
+    print(f"Migrando {MATCH_DETAILS_TABLE} para a versão {MATCH_DETAILS_VERSION} do esquema...")
+    cursor = connection.cursor()
+    cursor.execute(create_table_sql())
+    connection.commit()
+
+    existing = migrations.get_table_columns(connection, MATCH_DETAILS_TABLE)
+    to_convert = [
+        name for name, sql_type in MATCH_DETAILS_COLUMNS
+        if name in existing and existing[name].startswith('varchar') and is_numeric(sql_type)
+    ]
+    if to_convert:
+        cursor.execute(clean_varchar_sql(to_convert))
+        connection.commit()
+
+    changes = [f"ADD COLUMN {name} {sql_type}" for name, sql_type in MATCH_DETAILS_COLUMNS if name not in existing]
+    changes += [f"MODIFY COLUMN {name} {MATCH_DETAILS_TYPES[name]}" for name in to_convert]
+    if INGEST_ID_COLUMN not in existing:
+        # AUTO_INCREMENT exige índice; linhas existentes recebem a sequência agora
+        changes.append(f"ADD KEY idx_{MATCH_DETAILS_TABLE}_{INGEST_ID_COLUMN} ({INGEST_ID_COLUMN})")
+
+    primary_key = migrations.get_primary_key(connection, MATCH_DETAILS_TABLE)
+    if primary_key != MATCH_DETAILS_PRIMARY_KEY:
+        # Tabelas antigas usavam só match_id, o que guardava um jogador por partida
+        changes.append(f"MODIFY COLUMN player_name {MATCH_DETAILS_TYPES['player_name']}")
+        if primary_key:
+            changes.append("DROP PRIMARY KEY")
+        changes.append(f"ADD PRIMARY KEY ({', '.join(MATCH_DETAILS_PRIMARY_KEY)})")
+
+    if changes:
+        cursor.execute(f"ALTER TABLE {MATCH_DETAILS_TABLE} {', '.join(changes)};")
+        connection.commit()
+    cursor.close()
+
+    migrations.set_schema_version(connection, MATCH_DETAILS_TABLE, MATCH_DETAILS_VERSION)
+    print(f"{MATCH_DETAILS_TABLE} migrada: {len(to_convert)} colunas convertidas.")
+
+
+def create_rewrites_table(connection):
+    cursor = connection.cursor()
+    cursor.execute(CREATE_REWRITES_SQL)
+    connection.commit()
+    cursor.close()
+
+
+def record_rewrite(connection):
+    # Chamado depois de uma regravação em massa de match_details
+    cursor = connection.cursor()
+    cursor.execute(f"INSERT INTO {REWRITES_TABLE} () VALUES ();")
+    generation = cursor.lastrowid
+    connection.commit()
+    cursor.close()
+    return generation
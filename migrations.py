@@ -0,0 +1,63 @@
+# Controle de versão de esquema por tabela. Cada módulo dono de uma tabela
+# declara a versão do seu modelo e só roda a migração quando a versão gravada
+# no banco é diferente, evitando consultas a information_schema a cada execução.
+
+
+def ensure_versions_table(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_versions (
+        table_name VARCHAR(64) PRIMARY KEY,
+        version INT NOT NULL,
+        migrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    );
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def get_schema_version(connection, table_name):
+    ensure_versions_table(connection)
+    cursor = connection.cursor()
+    cursor.execute("SELECT version FROM schema_versions WHERE table_name = %s;", (table_name,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+
+def set_schema_version(connection, table_name, version):
+    cursor = connection.cursor()
+    cursor.execute("""
+    INSERT INTO schema_versions (table_name, version) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE version = VALUES(version);
+    """, (table_name, version))
+    connection.commit()
+    cursor.close()
+
+
+def get_table_columns(connection, table_name):
+    # {coluna: tipo} como o MySQL reporta em information_schema (ex.: 'varchar(50)')
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT column_name, column_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s;
+    """, (table_name,))
+    columns = {}
+    for name, column_type in cursor.fetchall():
+        if isinstance(column_type, (bytes, bytearray)):
+            column_type = column_type.decode()
+        columns[name] = column_type.lower()
+    cursor.close()
+    return columns
+
+
+def get_primary_key(connection, table_name):
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT column_name FROM information_schema.key_column_usage
+        WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = 'PRIMARY'
+        ORDER BY ordinal_position;
+    """, (table_name,))
+    key = tuple(row[0] for row in cursor.fetchall())
+    cursor.close()
+    return key
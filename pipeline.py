@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+import analise
+import analise_detalhada
+import db
+import leaguev4
+import match_export
+import site_artifacts
+
+# Execução noturna num único processo. Cada estágio declara dependências e uma
+# impressão digital das suas entradas; se ela e o código do estágio não mudaram
+# desde a última execução bem-sucedida, o estágio é pulado. Estágios
+# independentes rodam em paralelo e todos usam o mesmo pool de conexões
+# (tamanho em DB_POOL_SIZE, ver db.py).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.getenv("PIPELINE_STATE", os.path.join(BASE_DIR, ".cache", "pipeline_state.json"))
+
+
+class Stage:
+    def __init__(self, name, run, deps=(), fingerprint=None, modules=()):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.fingerprint = fingerprint
+        self.modules = tuple(modules)
+
+
+class Resources:
+    # Um único engine com pool (db.py), criado sob demanda e compartilhado por
+    # todos os estágios: conexões DBAPI cruas para a coleta (analise, leaguev4)
+    # e sessões SQLAlchemy para as estatísticas
+    def __init__(self, full=False):
+        self.full = full
+
+    @property
+    def engine(self):
+        return db.get_engine()
+
+    @contextmanager
+    def mysql_connection(self):
+        connection = self.engine.raw_connection()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def session(self):
+        session = analise_detalhada.connect_db(self.engine)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def close(self):
+        db.dispose()
+
+
+# Impressões digitais das entradas de cada estágio
+def today(resources):
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def roster_fingerprint(resources):
+    # Inclui a data para que a reverificação periódica dos PUUIDs rode mesmo
+    # com o elenco inalterado; o cache de resolução evita chamadas repetidas
+    with resources.mysql_connection() as connection:
+        players = analise.get_players_from_db(connection)
+    return f"{players.sort_values('player_name').to_json(orient='values')}:{today(resources)}"
+
+
+def ingest_fingerprint(resources):
+    # Um reprocessamento não muda o maior ingest_id, só a geração de regravação
+    with resources.session() as session:
+        ceiling = session.execute(text("SELECT COALESCE(MAX(ingest_id), 0) FROM match_details;")).scalar()
+        generation = analise_detalhada.get_rewrite_generation(session)
+    return f"{ceiling}:{generation}"
+
+
+def windows_fingerprint(resources):
+    # As janelas de "últimos N dias" mudam com a data mesmo sem partidas novas
+    return f"{ingest_fingerprint(resources)}:{today(resources)}"
+
+
+def export_fingerprint(resources):
+    # Novas linhas para o Parquet e o conteúdo das tabelas publicadas no site
+    digest = hashlib.sha256(ingest_fingerprint(resources).encode())
+    with resources.session() as session:
+        tables = ', '.join(site_artifacts.TABLES)
+        for table, checksum in session.execute(text(f"CHECKSUM TABLE {tables};")):
+            digest.update(f"{table}={checksum};".encode())
+    return digest.hexdigest()
+
+
+# Estágios
+def run_ladder(resources):
+    with resources.mysql_connection() as connection:
+        leaguev4.run(connection)
+
+
+def run_roster(resources):
+    with resources.mysql_connection() as connection:
+        analise.run(connection, mode='roster')
+
+
+def run_matches(resources):
+    # O estágio roster já resolveu os PUUIDs
+    with resources.mysql_connection() as connection:
+        analise.run(connection, mode='matches')
+
+
+def run_stats(resources):
+    with resources.session() as session:
+        analise_detalhada.refresh_statistics(session, full=resources.full)
+
+
+def run_benchmarks(resources):
+    with resources.session() as session:
+        analise_detalhada.refresh_position_benchmarks(session, full=resources.full)
+        analise_detalhada.refresh_rolling_windows(session, full=resources.full)
+
+
+def run_export(resources):
+    with resources.session() as session:
+        if match_export.pa is not None:
+            match_export.export_match_details(session, match_export.MatchExport(), full=resources.full)
+        site_artifacts.build_artifacts(site_artifacts.read_tables(session))
+
+
+STAGES = [
+    # A coleta de partidas consulta a API, então roda sempre
+    Stage('ladder', run_ladder, fingerprint=today, modules=['leaguev4', 'ladder_history']),
+    Stage('roster', run_roster, fingerprint=roster_fingerprint, modules=['analise']),
+    Stage('matches', run_matches, deps=['roster'], modules=['analise', 'match_flatten', 'match_schema']),
+    Stage('stats', run_stats, deps=['matches'], fingerprint=ingest_fingerprint, modules=['analise_detalhada']),
+    Stage('benchmarks', run_benchmarks, deps=['matches'], fingerprint=windows_fingerprint,
+          modules=['analise_detalhada', 'position_benchmarks', 'rolling_windows']),
+    Stage('export', run_export, deps=['stats', 'benchmarks'], fingerprint=export_fingerprint,
+          modules=['match_export', 'site_artifacts']),
+]
+
+
+def code_hash(modules):
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(BASE_DIR, f'{module}.py'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    temp_path = STATE_FILE + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, STATE_FILE)
+
+
+def run_stage(stage, resources, state, force):
+    # Devolve 'skipped' ou 'done'; a chave só é gravada depois do sucesso
+    key = None
+    if stage.fingerprint is not None:
+        digest = hashlib.sha256(code_hash(stage.modules).encode())
+        digest.update(stage.fingerprint(resources).encode())
+        key = digest.hexdigest()
+        if not force and state.get(stage.name) == key:
+            print(f"[{stage.name}] entradas inalteradas, pulando")
+            return 'skipped', key
+
+    started = time.monotonic()
+    print(f"[{stage.name}] iniciando")
+    stage.run(resources)
+    print(f"[{stage.name}] concluído em {time.monotonic() - started:.1f}s")
+    return 'done', key
+
+
+def run_pipeline(stages, resources, force=False, jobs=None):
+    state = load_state()
+    state_lock = threading.Lock()
+    selected = {stage.name: stage for stage in stages}
+    pending = set(selected)
+    finished = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs or len(stages)) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                deps = [dep for dep in selected[name].deps if dep in selected]
+                if any(finished.get(dep) == 'failed' for dep in deps):
+                    print(f"[{name}] não executado: dependência falhou")
+                    finished[name] = 'failed'
+                    pending.discard(name)
+                elif all(dep in finished for dep in deps):
+                    running[pool.submit(run_stage, selected[name], resources, state, force)] = name
+                    pending.discard(name)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    status, key = future.result()
+                except Exception as e:
+                    print(f"[{name}] falhou: {e}")
+                    finished[name] = 'failed'
+                    continue
+                finished[name] = status
+                if key is not None:
+                    with state_lock:
+                        state[name] = key
+                        save_state(state)
+    return finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline noturno: ladder, elenco, partidas, estatísticas e export")
+    parser.add_argument('--only', nargs='+', choices=[stage.name for stage in STAGES],
+                        help="executa só estes estágios (dependências fora da lista são consideradas prontas)")
+    parser.add_argument('--force', action='store_true', help="executa mesmo com entradas inalteradas")
+    parser.add_argument('--full', action='store_true', help="recalcula estatísticas e export do zero")
+    parser.add_argument('--jobs', type=int, default=None, help="estágios em paralelo")
+    args = parser.parse_args()
+
+    for var in ["DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME", "RIOT_API_KEY"]:
+        if not os.getenv(var):
+            raise EnvironmentError(f"A variável de ambiente {var} não está definida")
+
+    stages = [stage for stage in STAGES if not args.only or stage.name in args.only]
+    resources = Resources(full=args.full)
+    try:
+        if any(stage.name in ('stats', 'benchmarks', 'export') for stage in stages):
+            with resources.session() as session:
+                analise_detalhada.create_tables(session)
+        finished = run_pipeline(stages, resources, force=args.force or args.full, jobs=args.jobs)
+        print("Resumo: " + ', '.join(f"{name}={status}" for name, status in finished.items()))
+    finally:
+        resources.close()
+
+    if 'failed' in finished.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
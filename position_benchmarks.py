@@ -0,0 +1,193 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+import match_schema
+
+# Referências por posição para todas as estatísticas numéricas de
+# match_details. Cada (patch, posição, jogador) guarda, por estatística, a
+# contagem de valores, a soma e a soma dos quadrados em position_stat_sums.
+# Só os patches que receberam partidas novas são recalculados; médias, desvios,
+# percentis e z-scores saem da soma dessas parciais.
+STATS = match_schema.NUMERIC_COLUMNS
+KEYS = ['patch', 'position', 'player_name']
+
+# Estatísticas em que um valor maior é pior
+LOWER_IS_BETTER = {
+    'deaths', 'damage_taken', 'totalDamageTaken', 'totalTimeSpentDead',
+    'percentualdedanorecebido', 'maxKillDeficit', 'turretsLost',
+}
+
+# Estatísticas publicadas em underperforming_positions
+REPORTED_STATS = os.getenv(
+    'UNDERPERFORMING_STATS',
+    'kills,deaths,assists,damage_dealt,damage_taken,vision_score,cs,gold_earned',
+).split(',')
+
+# Um jogador fica abaixo da posição quando o z-score, já orientado para que
+# negativo seja pior, é menor que -UNDERPERFORMING_Z
+UNDERPERFORMING_Z = float(os.getenv('UNDERPERFORMING_Z', '0'))
+MIN_GAMES = int(os.getenv('UNDERPERFORMING_MIN_GAMES', '1'))
+
+LOAD_CHUNK_SIZE = int(os.getenv('STATISTICS_LOAD_CHUNK_SIZE', '50000'))
+WRITE_CHUNK_SIZE = 500
+
+PARTIAL_COLUMNS = [f"{prefix}_{stat}" for stat in STATS for prefix in ('n', 'sum', 'sq')]
+
+UNDERPERFORMING_COLUMNS = ['player_name', 'position', 'stat', 'player_avg', 'position_avg', 'percentile', 'z_score']
+
+
+def quote(name):
+    return f'`{name}`'
+
+
+def create_tables(session):
+    partials = ',\n        '.join(
+        f"{quote(column)} {'INTEGER' if column.startswith('n_') else 'DOUBLE PRECISION'}"
+        for column in PARTIAL_COLUMNS
+    )
+    session.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS position_stat_sums (
+        patch VARCHAR(10) NOT NULL,
+        position VARCHAR(16) NOT NULL,
+        player_name VARCHAR(50) NOT NULL,
+        games INTEGER NOT NULL,
+        {partials},
+        PRIMARY KEY (patch, position, player_name)
+    );
+    """))
+    session.execute(text("""
+    CREATE TABLE IF NOT EXISTS underperforming_positions (
+        player_name VARCHAR(50),
+        position VARCHAR(16),
+        stat VARCHAR(64),
+        player_avg FLOAT,
+        position_avg FLOAT,
+        percentile FLOAT,
+        z_score FLOAT,
+        PRIMARY KEY (player_name, position, stat)
+    );
+    """))
+    session.commit()
+
+
+def get_changed_patches(session, since, until):
+    rows = session.execute(text("""
+    SELECT DISTINCT game_version FROM match_details
+    WHERE ingest_id > :since AND ingest_id <= :until;
+    """), {'since': since, 'until': until})
+    return [row[0] or '' for row in rows]
+
+
+def get_match_details(session, patches, chunksize=LOAD_CHUNK_SIZE, store=None):
+    # Linhas dos patches a recalcular, em blocos por um cursor no servidor ou
+    # do export Parquet (match_export.MatchExport) quando store é informado
+    if store is not None:
+        chunks = store.scan(['player_name', 'teamPosition', 'game_version'] + STATS, patches=patches, chunksize=chunksize)
+        return (chunk.assign(game_version=chunk['game_version'].fillna('')) for chunk in chunks)
+    columns = ', '.join(quote(stat) for stat in STATS)
+    query = text(f"""
+    SELECT player_name, `teamPosition`, COALESCE(game_version, '') AS game_version, {columns}
+    FROM match_details
+    WHERE COALESCE(game_version, '') IN :patches;
+    """).bindparams(bindparam('patches', expanding=True)).execution_options(stream_results=True)
+    return pd.read_sql(query, session.connection(), params={'patches': list(patches)}, chunksize=chunksize)
+
+
+def partial_sums(df):
+    # Contagem, soma e soma dos quadrados de todas as estatísticas por
+    # (patch, posição, jogador) num único groupby
+    df = df[df['player_name'].notna() & df['teamPosition'].notna() & (df['teamPosition'] != '')]
+    values = df[STATS].apply(pd.to_numeric, errors='coerce').astype('float64')
+    filled = values.fillna(0.0)
+    parts = pd.concat([
+        pd.DataFrame({'patch': df['game_version'], 'position': df['teamPosition'],
+                      'player_name': df['player_name'], 'games': 1}, index=df.index),
+        values.notna().astype('int64').add_prefix('n_'),
+        filled.add_prefix('sum_'),
+        (filled * filled).add_prefix('sq_'),
+    ], axis=1)
+    return parts.groupby(KEYS, sort=False).sum()
+
+
+def calculate_partial_sums(chunks):
+    totals = None
+    for chunk in chunks:
+        sums = partial_sums(chunk)
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(columns=KEYS + ['games'] + PARTIAL_COLUMNS)
+    return totals.reset_index()
+
+
+def save_partial_sums(session, patches, sums):
+    # Substitui as parciais dos patches recalculados; o commit fica com quem chama
+    session.execute(
+        text("DELETE FROM position_stat_sums WHERE patch IN :patches;").bindparams(bindparam('patches', expanding=True)),
+        {'patches': list(patches)},
+    )
+    columns = KEYS + ['games'] + PARTIAL_COLUMNS
+    counts = ['games'] + [column for column in PARTIAL_COLUMNS if column.startswith('n_')]
+    sums = sums.astype({column: 'int64' for column in counts})
+    statement = text(f"""
+    INSERT INTO position_stat_sums ({', '.join(quote(column) for column in columns)})
+    VALUES ({', '.join(f':{column}' for column in columns)});
+    """)
+    for start in range(0, len(sums), WRITE_CHUNK_SIZE):
+        chunk = sums.iloc[start:start + WRITE_CHUNK_SIZE]
+        session.execute(statement, chunk[columns].to_dict('records'))
+
+
+def load_partial_sums(session):
+    columns = ', '.join(quote(column) for column in KEYS + ['games'] + PARTIAL_COLUMNS)
+    return pd.read_sql(text(f"SELECT {columns} FROM position_stat_sums;"), session.connection())
+
+
+def calculate_benchmarks(sums, stats=REPORTED_STATS):
+    # Soma as parciais de todos os patches e compara a média de cada jogador com
+    # a da posição: percentil entre os jogadores da posição e z-score sobre o
+    # desvio por partida. Devolve só as linhas abaixo da referência.
+    if sums.empty:
+        return pd.DataFrame(columns=UNDERPERFORMING_COLUMNS)
+    players = sums.groupby(['position', 'player_name'], sort=False).sum(numeric_only=True)
+    positions = players.groupby(level='position').sum()
+
+    frames = []
+    for stat in stats:
+        n, total, squares = f'n_{stat}', f'sum_{stat}', f'sq_{stat}'
+        pos_n = positions[n].reindex(players.index, level='position')
+        pos_mean = (positions[total] / positions[n]).reindex(players.index, level='position')
+        pos_var = (positions[squares].reindex(players.index, level='position') / pos_n) - pos_mean ** 2
+        pos_std = np.sqrt(pos_var.clip(lower=0))
+
+        player_avg = players[total] / players[n]
+        direction = -1.0 if stat in LOWER_IS_BETTER else 1.0
+        z_score = direction * (player_avg - pos_mean) / pos_std.replace(0, np.nan)
+        percentile = (direction * player_avg).groupby(level='position').rank(pct=True)
+
+        frame = pd.DataFrame({
+            'stat': stat,
+            'player_avg': player_avg,
+            'position_avg': pos_mean,
+            'percentile': percentile,
+            'z_score': z_score,
+        })
+        keep = (players[n] >= MIN_GAMES) & (z_score < -UNDERPERFORMING_Z)
+        frames.append(frame[keep])
+
+    result = pd.concat(frames).reset_index()
+    return result[UNDERPERFORMING_COLUMNS]
+
+
+def save_benchmarks(session, rows):
+    # Substitui underperforming_positions; o commit fica com quem chama
+    session.execute(text("DELETE FROM underperforming_positions;"))
+    statement = text(f"""
+    INSERT INTO underperforming_positions ({', '.join(UNDERPERFORMING_COLUMNS)})
+    VALUES ({', '.join(f':{column}' for column in UNDERPERFORMING_COLUMNS)});
+    """)
+    for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+        chunk = rows.iloc[start:start + WRITE_CHUNK_SIZE]
+        session.execute(statement, chunk.astype(object).where(chunk.notna(), None).to_dict('records'))
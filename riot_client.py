@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from urllib.parse import quote
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Limites usados antes da primeira resposta da Riot (chave de desenvolvimento).
+# Depois da primeira resposta os limites reais vêm dos cabeçalhos X-*-Rate-Limit.
+DEFAULT_APP_LIMITS = "20:1,100:120"
+DEFAULT_METHOD_LIMITS = "20:1"
+
+# Folga de segurança aplicada a cada janela para absorver variação de relógio
+SAFETY_MARGIN = 0.05
+
+
+def parse_rate_limits(header):
+    # "20:1,100:120" -> [(20, 1), (100, 120)]
+    limits = []
+    if not header:
+        return limits
+    for part in header.split(','):
+        count, seconds = part.strip().split(':')
+        limits.append((int(count), int(seconds)))
+    return limits
+
+
+class RateLimiter:
+    # Um balde por janela (limite:segundos). Cada balde guarda os instantes das
+    # requisições dentro da janela e só libera uma nova quando há espaço em todos.
+    def __init__(self, limits):
+        self.windows = []
+        self.blocked_until = 0.0
+        self.update_limits(limits)
+
+    def update_limits(self, limits):
+        if isinstance(limits, str):
+            limits = parse_rate_limits(limits)
+        if not limits:
+            return
+        current = [(limit, seconds) for limit, seconds, _ in self.windows]
+        if current == list(limits):
+            return
+        history = {seconds: stamps for _, seconds, stamps in self.windows}
+        self.windows = [
+            (limit, seconds, history.get(seconds, deque()))
+            for limit, seconds in limits
+        ]
+
+    def block_until(self, timestamp):
+        self.blocked_until = max(self.blocked_until, timestamp)
+
+    def delay(self, now):
+        wait = max(0.0, self.blocked_until - now)
+        for limit, seconds, stamps in self.windows:
+            window = seconds * (1 + SAFETY_MARGIN)
+            while stamps and now - stamps[0] >= window:
+                stamps.popleft()
+            usable = max(1, int(limit * (1 - SAFETY_MARGIN)))
+            if len(stamps) >= usable:
+                wait = max(wait, window - (now - stamps[len(stamps) - usable]))
+        return wait
+
+    def record(self, now):
+        for _, _, stamps in self.windows:
+            stamps.append(now)
+
+
+async def acquire(limiters):
+    # Espera até que todos os baldes (aplicação + método) tenham espaço e
+    # registra a requisição em todos de uma vez. Não há await entre a checagem
+    # e o registro, então o loop de eventos garante a atomicidade.
+    while True:
+        now = time.monotonic()
+        wait = max(limiter.delay(now) for limiter in limiters)
+        if wait <= 0:
+            for limiter in limiters:
+                limiter.record(now)
+            return
+        await asyncio.sleep(wait)
+
+
+class RiotClient:
+    # Cliente assíncrono da API da Riot compartilhado por analise.py e leaguev4.py.
+    # Mantém um balde de aplicação por host de roteamento (americas, br1...) e um
+    # balde por método, ajustados pelos cabeçalhos de cada resposta.
+    def __init__(self, api_key, base_url=None, max_connections=50, max_retries=5, timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = None
+        self.app_limiters = {}
+        self.method_limiters = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'X-Riot-Token': self.api_key},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _url(self, host, path):
+        if self.base_url:
+            return f"{self.base_url}/{host}{path}"
+        return f"https://{host}.api.riotgames.com{path}"
+
+    def _limiters(self, host, method):
+        if host not in self.app_limiters:
+            self.app_limiters[host] = RateLimiter(DEFAULT_APP_LIMITS)
+        key = (host, method)
+        if key not in self.method_limiters:
+            self.method_limiters[key] = RateLimiter(DEFAULT_METHOD_LIMITS)
+        return self.app_limiters[host], self.method_limiters[key]
+
+    def _update_from_headers(self, headers, app_limiter, method_limiter):
+        app_limits = headers.get('X-App-Rate-Limit')
+        if app_limits:
+            app_limiter.update_limits(app_limits)
+        method_limits = headers.get('X-Method-Rate-Limit')
+        if method_limits:
+            method_limiter.update_limits(method_limits)
+
+    async def get(self, host, path, method, params=None):
+        # Retorna o JSON da resposta, ou None para 404 e erros não recuperáveis
+        app_limiter, method_limiter = self._limiters(host, method)
+        url = self._url(host, path)
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            await acquire((app_limiter, method_limiter))
+            try:
+                async with self.session.get(url, params=params) as response:
+                    self._update_from_headers(response.headers, app_limiter, method_limiter)
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status == 404:
+                        return None
+                    if response.status == 429:
+                        retry_after = response.headers.get('Retry-After')
+                        limit_type = response.headers.get('X-Rate-Limit-Type', 'service')
+                        wait = float(retry_after) if retry_after else backoff
+                        blocked = app_limiter if limit_type == 'application' else method_limiter
+                        blocked.block_until(time.monotonic() + wait)
+                        logger.warning(f"Limite de requisições ({limit_type}) em {method}. Aguardando {wait:.1f}s...")
+                        backoff = min(backoff * 2, 60)
+                        continue
+                    if response.status >= 500:
+                        logger.warning(f"Erro {response.status} em {method}, tentativa {attempt + 1}")
+                    else:
+                        logger.error(f"Erro {response.status} em {method}: {url}")
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Falha de conexão em {method}: {e}")
+            await asyncio.sleep(backoff + random.random())
+            backoff = min(backoff * 2, 60)
+        logger.error(f"Desistindo de {method} após {self.max_retries + 1} tentativas: {url}")
+        return None
+
+    # account-v1
+    async def get_account_by_riot_id(self, game_name, tag_line, host='americas'):
+        path = f"/riot/account/v1/accounts/by-riot-id/{quote(game_name)}/{quote(tag_line)}"
+        return await self.get(host, path, 'account-v1.getByRiotId')
+
+    async def get_puuid(self, game_name, tag_line, host='americas'):
+        account = await self.get_account_by_riot_id(game_name, tag_line, host)
+        return account['puuid'] if account else None
+
+    async def get_account_by_puuid(self, puuid, host='americas'):
+        path = f"/riot/account/v1/accounts/by-puuid/{puuid}"
+        return await self.get(host, path, 'account-v1.getByPuuid')
+
+    # match-v5
+    async def get_match_ids(self, puuid, host='americas', **params):
+        path = f"/lol/match/v5/matches/by-puuid/{puuid}/ids"
+        # None indica falha, lista vazia indica que não há mais partidas
+        return await self.get(host, path, 'match-v5.getMatchIdsByPUUID', params=params)
+
+    async def get_match(self, match_id, host='americas'):
+        return await self.get(host, f"/lol/match/v5/matches/{match_id}", 'match-v5.getMatch')
+
+    # league-v4
+    async def get_apex_league(self, tier, queue, host='br1'):
+        path = f"/lol/league/v4/{tier.lower()}leagues/by-queue/{queue}"
+        return await self.get(host, path, f'league-v4.get{tier.capitalize()}League')
+
+    async def get_league_entries(self, queue, tier, division, page=1, host='br1'):
+        path = f"/lol/league/v4/entries/{queue}/{tier}/{division}"
+        # None indica falha, lista vazia indica fim das páginas
+        return await self.get(host, path, 'league-v4.getLeagueEntries', params={'page': page})
@@ -0,0 +1,189 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from sqlalchemy import text
+
+from ddragon import version_key
+
+# Estatísticas por janela (último patch, últimos N dias, últimas N partidas)
+# montadas a partir de baldes diários. stat_buckets guarda somas por
+# (jogador, campeão, patch, dia) e recebe só as partidas novas como deltas;
+# cada janela é a soma de alguns baldes, sem reler match_details.
+BUCKET_KEYS = ['player_name', 'champion', 'patch', 'day']
+BUCKET_STATS = ['kills', 'deaths', 'assists', 'cs', 'gold_earned', 'damage_dealt', 'vision_score']
+COUNTERS = ['games', 'wins'] + BUCKET_STATS
+
+WINDOW_DAYS = [int(days) for days in os.getenv('STATISTICS_WINDOW_DAYS', '7,30').split(',')]
+WINDOW_GAMES = [int(games) for games in os.getenv('STATISTICS_WINDOW_GAMES', '20').split(',')]
+
+WINDOW_KEYS = ['window_type', 'window_value', 'player_name', 'champion']
+WINDOW_COLUMNS = WINDOW_KEYS + ['games', 'wins', 'win_rate'] + [f'avg_{stat}' for stat in BUCKET_STATS]
+
+LOAD_CHUNK_SIZE = int(os.getenv('STATISTICS_LOAD_CHUNK_SIZE', '50000'))
+WRITE_CHUNK_SIZE = 1000
+
+
+def create_tables(session):
+    counters = ',\n        '.join(f"{stat} DOUBLE PRECISION NOT NULL DEFAULT 0" for stat in BUCKET_STATS)
+    averages = ',\n        '.join(f"avg_{stat} FLOAT" for stat in BUCKET_STATS)
+    session.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS stat_buckets (
+        player_name VARCHAR(50) NOT NULL,
+        champion VARCHAR(50) NOT NULL,
+        patch VARCHAR(10) NOT NULL,
+        day DATE NOT NULL,
+        games INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        {counters},
+        PRIMARY KEY (player_name, champion, patch, day),
+        KEY idx_stat_buckets_day (day),
+        KEY idx_stat_buckets_patch (patch)
+    );
+    """))
+    # window_type: 'patch' (window_value = versão ou 'current'), 'days' ou 'games'.
+    # Índices para os filtros do site: por janela e campeão, e por jogador em
+    # todas as janelas
+    session.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS player_statistics_windows (
+        window_type VARCHAR(8) NOT NULL,
+        window_value VARCHAR(10) NOT NULL,
+        player_name VARCHAR(50) NOT NULL,
+        champion VARCHAR(50) NOT NULL,
+        games INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        win_rate FLOAT,
+        {averages},
+        PRIMARY KEY (window_type, window_value, player_name, champion),
+        KEY idx_player_statistics_windows_champion (window_type, window_value, champion, games DESC),
+        KEY idx_player_statistics_windows_player (player_name, window_type, window_value)
+    );
+    """))
+    session.commit()
+
+
+def get_match_details(session, since, until, chunksize=LOAD_CHUNK_SIZE, store=None):
+    if store is not None:
+        chunks = store.scan(
+            ['player_name', 'champion', 'win', 'game_version', 'game_datetime'] + BUCKET_STATS,
+            since, until, chunksize=chunksize,
+        )
+        return (
+            chunk[chunk['game_datetime'].notna()].assign(
+                game_version=lambda df: df['game_version'].fillna(''),
+                day=lambda df: df['game_datetime'].dt.date,
+            )
+            for chunk in chunks
+        )
+    columns = ', '.join(BUCKET_STATS)
+    query = text(f"""
+    SELECT player_name, champion, win, COALESCE(game_version, '') AS game_version,
+           CAST(game_datetime AS DATE) AS day, {columns}
+    FROM match_details
+    WHERE ingest_id > :since AND ingest_id <= :until AND game_datetime IS NOT NULL;
+    """).execution_options(stream_results=True)
+    return pd.read_sql(query, session.connection(), params={'since': since, 'until': until}, chunksize=chunksize)
+
+
+def bucket_sums(df):
+    df = df[df['player_name'].notna() & df['champion'].notna()]
+    values = df[BUCKET_STATS].apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    parts = pd.concat([
+        pd.DataFrame({
+            'player_name': df['player_name'], 'champion': df['champion'],
+            'patch': df['game_version'], 'day': df['day'],
+            'games': 1, 'wins': (df['win'] == True).astype('int64'),
+        }, index=df.index),
+        values,
+    ], axis=1)
+    return parts.groupby(BUCKET_KEYS, sort=False).sum()
+
+
+def calculate_bucket_deltas(chunks):
+    totals = None
+    for chunk in chunks:
+        sums = bucket_sums(chunk)
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(columns=BUCKET_KEYS + COUNTERS)
+    return totals.astype({'games': 'int64', 'wins': 'int64'}).reset_index()
+
+
+def save_bucket_deltas(session, deltas):
+    # Soma os deltas aos baldes existentes; o commit fica com quem chama
+    updates = ', '.join(f"{column} = {column} + VALUES({column})" for column in COUNTERS)
+    statement = text(f"""
+    INSERT INTO stat_buckets ({', '.join(BUCKET_KEYS + COUNTERS)})
+    VALUES ({', '.join(f':{column}' for column in BUCKET_KEYS + COUNTERS)})
+    ON DUPLICATE KEY UPDATE {updates};
+    """)
+    for start in range(0, len(deltas), WRITE_CHUNK_SIZE):
+        chunk = deltas.iloc[start:start + WRITE_CHUNK_SIZE]
+        session.execute(statement, chunk[BUCKET_KEYS + COUNTERS].to_dict('records'))
+
+
+def load_buckets(session):
+    columns = ', '.join(BUCKET_KEYS + COUNTERS)
+    return pd.read_sql(text(f"SELECT {columns} FROM stat_buckets;"), session.connection())
+
+
+def summarize(buckets, window_type, window_value):
+    totals = buckets.groupby(['player_name', 'champion'], sort=False)[COUNTERS].sum()
+    totals = totals[totals['games'] > 0]
+    summary = pd.DataFrame({
+        'window_type': window_type,
+        'window_value': str(window_value),
+        'games': totals['games'].round().astype('int64'),
+        'wins': totals['wins'].round().astype('int64'),
+        'win_rate': totals['wins'] / totals['games'],
+    }, index=totals.index)
+    for stat in BUCKET_STATS:
+        summary[f'avg_{stat}'] = totals[stat] / totals['games']
+    return summary.reset_index()[WINDOW_COLUMNS]
+
+
+def last_games(buckets, games):
+    # Baldes mais recentes de cada jogador até cobrir N partidas. O balde da
+    # fronteira entra proporcionalmente, então a janela é exata por dia e
+    # aproximada só dentro do dia em que a N-ésima partida caiu.
+    ordered = buckets.sort_values(['player_name', 'day'], ascending=[True, False])
+    day_games = ordered.groupby(['player_name', 'day'], sort=False)['games'].transform('sum')
+    first_of_day = ~ordered.duplicated(['player_name', 'day'])
+    before = (day_games * first_of_day).groupby(ordered['player_name']).cumsum() - day_games * first_of_day
+    before = before.where(first_of_day).ffill()
+    share = ((games - before) / day_games).clip(lower=0, upper=1)
+    selected = ordered[share > 0]
+    return selected[['player_name', 'champion', 'patch', 'day']].join(
+        selected[COUNTERS].mul(share[share > 0], axis=0)
+    )
+
+
+def calculate_windows(buckets, today=None):
+    if buckets.empty:
+        return pd.DataFrame(columns=WINDOW_COLUMNS)
+    today = today or datetime.now(timezone.utc).date()
+    buckets = buckets.assign(day=pd.to_datetime(buckets['day']).dt.date)
+
+    frames = []
+    patches = sorted((patch for patch in buckets['patch'].unique() if patch), key=version_key)
+    for patch in patches:
+        frames.append(summarize(buckets[buckets['patch'] == patch], 'patch', patch))
+    if patches:
+        frames.append(summarize(buckets[buckets['patch'] == patches[-1]], 'patch', 'current'))
+    for days in WINDOW_DAYS:
+        frames.append(summarize(buckets[buckets['day'] > today - timedelta(days=days)], 'days', days))
+    for games in WINDOW_GAMES:
+        frames.append(summarize(last_games(buckets, games), 'games', games))
+    return pd.concat(frames, ignore_index=True)
+
+
+def save_windows(session, windows):
+    # Substitui as janelas; o commit fica com quem chama
+    session.execute(text("DELETE FROM player_statistics_windows;"))
+    statement = text(f"""
+    INSERT INTO player_statistics_windows ({', '.join(WINDOW_COLUMNS)})
+    VALUES ({', '.join(f':{column}' for column in WINDOW_COLUMNS)});
+    """)
+    for start in range(0, len(windows), WRITE_CHUNK_SIZE):
+        chunk = windows.iloc[start:start + WRITE_CHUNK_SIZE]
+        session.execute(statement, chunk.to_dict('records'))
@@ -1,5 +1,6 @@
-const playerStatisticsJsonUrl = 'https://davidexpcarvalho.github.io/brasil.gg/player_statistics_rows.json';
-const underperformingPositionsJsonUrl = 'https://davidexpcarvalho.github.io/brasil.gg/underperforming_positions_rows.json';
+// Artefatos gerados por site_artifacts.py: manifest com a lista de jogadores e
+// um arquivo por jogador, em formato de colunas
+const siteDataUrl = 'https://davidexpcarvalho.github.io/brasil.gg/data';
 const dataDragonVersion = '14.11.1';  // Versão atual do DataDragon
 
 async function fetchJson(url) {
@@ -8,6 +9,28 @@ async function fetchJson(url) {
     return response.json();
 }
 
+// {coluna: [valores]} -> [{coluna: valor}]
+function columnsToRows(columns) {
+    if (!columns) return [];
+    const names = Object.keys(columns);
+    const length = names.length ? columns[names[0]].length : 0;
+    const rows = new Array(length);
+    for (let i = 0; i < length; i++) {
+        const row = {};
+        names.forEach(name => { row[name] = columns[name][i]; });
+        rows[i] = row;
+    }
+    return rows;
+}
+
+async function fetchPlayerShard(entry) {
+    const shard = await fetchJson(`${siteDataUrl}/${entry.file}?v=${entry.hash}`);
+    return {
+        playerStats: columnsToRows(shard.tables.player_statistics),
+        playerUnderperforming: columnsToRows(shard.tables.underperforming_positions)
+    };
+}
+
 function formatNumber(value) {
     return Number(value).toFixed(1);
 }
@@ -74,25 +97,14 @@ function createPaginationControls(data, pageSize, currentPage, containerId, upda
 
 async function createPlayerPages() {
     try {
-        const [playerStatistics, underperformingPositions] = await Promise.all([
-            fetchJson(playerStatisticsJsonUrl),
-            fetchJson(underperformingPositionsJsonUrl)
-        ]);
-
-        const groupedPlayerStats = groupBy(playerStatistics, 'player_name');
-        const groupedUnderperformingPositions = groupBy(underperformingPositions, 'player_name');
-
-        const allPlayers = new Set([
-            ...Object.keys(groupedPlayerStats),
-            ...Object.keys(groupedUnderperformingPositions),
-        ]);
+        // Só o manifest na primeira carga; os dados de cada jogador vêm ao abrir a página dele
+        const manifest = await fetchJson(`${siteDataUrl}/manifest.json?v=${Date.now()}`);
+        const allPlayers = Object.keys(manifest.players);
 
         const dropdown = document.getElementById('dropdown');
         if (dropdown) {
             allPlayers.forEach(player => {
                 const playerFileName = `player_${player.replace(/[^a-zA-Z0-9]/g, '_')}`;
-                const playerStats = groupedPlayerStats[player] || [];
-                const playerUnderperforming = groupedUnderperformingPositions[player] || [];
 
                 const playerPage = document.createElement('div');
                 playerPage.id = playerFileName;
@@ -119,7 +131,8 @@ async function createPlayerPages() {
                 dropdownItem.textContent = player;
                 dropdownItem.setAttribute('role', 'option');
                 dropdownItem.setAttribute('aria-selected', 'false');
-                dropdownItem.onclick = () => {
+                dropdownItem.onclick = async () => {
+                    const { playerStats, playerUnderperforming } = await fetchPlayerShard(manifest.players[player]);
                     showPlayerPage(playerFileName);
                     document.querySelectorAll('.dropdown-item').forEach(item => item.setAttribute('aria-selected', 'false'));
                     dropdownItem.setAttribute('aria-selected', 'true');
@@ -149,17 +162,6 @@ async function createPlayerPages() {
     }
 }
 
-function groupBy(array, key) {
-    return array.reduce((acc, obj) => {
-        const keyValue = obj[key];
-        if (!acc[keyValue]) {
-            acc[keyValue] = [];
-        }
-        acc[keyValue].push(obj);
-        return acc;
-    }, {});
-}
-
 function showPlayerPage(playerFileName) {
     document.querySelectorAll('.player-page').forEach(page => page.style.display = 'none');
     const playerPage = document.getElementById(playerFileName);
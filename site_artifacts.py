@@ -0,0 +1,160 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import text
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Artefatos estáticos do site: JSON minificado e orientado a colunas
+# ({"coluna": [valores]}), um arquivo por jogador já ordenado e um manifest
+# pequeno, que é a única coisa baixada na primeira carga. Cada arquivo ganha
+# irmãos .gz e .br (este só com o pacote brotli) para envio.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.getenv("SITE_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Tabela publicada -> CSV de origem e ordenação dentro de cada jogador. O
+# pipeline lê as tabelas do banco (read_tables); os CSV servem para gerar os
+# artefatos sem acesso ao banco.
+TABLES = {
+    'player_statistics': {
+        'source': 'player_statistics_rows.csv',
+        'sort': (['games_played', 'win_rate'], [False, False]),
+    },
+    'underperforming_positions': {
+        'source': 'underperforming_positions_rows.csv',
+        'sort': (['position', 'stat'], [True, True]),
+    },
+}
+
+# Casas decimais mantidas nas colunas de ponto flutuante
+FLOAT_PRECISION = 4
+
+
+def dumps(payload):
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def to_columns(df):
+    # {coluna: [valores]}; NaN vira null e floats são arredondados
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_float_dtype(series):
+            series = series.round(FLOAT_PRECISION)
+        columns[name] = series.astype(object).where(series.notna(), None).tolist()
+    return columns
+
+
+def player_slug(player_name):
+    # Mesmo formato de nome usado pelo script.js, mais um hash curto para que
+    # nomes que só diferem em símbolos não colidam
+    digest = hashlib.sha1(player_name.encode('utf-8')).hexdigest()[:8]
+    return f"player_{re.sub(r'[^a-zA-Z0-9]', '_', player_name)}_{digest}"
+
+
+def write_artifact(path, data):
+    # Grava o JSON e os irmãos comprimidos só se o conteúdo mudou; devolve o
+    # hash curto usado pelo manifest para invalidar o cache do navegador
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return digest
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+    return digest
+
+
+def build_artifacts(tables, output_dir=OUTPUT_DIR):
+    # tables: {nome: DataFrame com a coluna player_name}
+    manifest = {
+        'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'tables': {},
+        'players': {},
+    }
+    grouped = {}
+    for name, df in tables.items():
+        by, ascending = TABLES[name]['sort']
+        df = df.sort_values(['player_name'] + by, ascending=[True] + ascending, kind='stable')
+        columns = [column for column in df.columns if column != 'player_name']
+        manifest['tables'][name] = {
+            'columns': columns,
+            'rows': len(df),
+            'hash': write_artifact(os.path.join(output_dir, f'{name}.json'), dumps(to_columns(df))),
+        }
+        for player_name, rows in df.groupby('player_name', sort=False):
+            grouped.setdefault(player_name, {})[name] = to_columns(rows[columns])
+
+    written = set()
+    for player_name in sorted(grouped):
+        slug = player_slug(player_name)
+        shard = {'player_name': player_name, 'tables': grouped[player_name]}
+        digest = write_artifact(os.path.join(output_dir, 'players', f'{slug}.json'), dumps(shard))
+        manifest['players'][player_name] = {'file': f'players/{slug}.json', 'hash': digest}
+        written.add(f'{slug}.json')
+
+    # Remove arquivos de jogadores que saíram do elenco
+    players_dir = os.path.join(output_dir, 'players')
+    if os.path.isdir(players_dir):
+        for filename in os.listdir(players_dir):
+            if filename.split('.json')[0] + '.json' not in written:
+                os.remove(os.path.join(players_dir, filename))
+
+    write_artifact(os.path.join(output_dir, 'manifest.json'), dumps(manifest))
+    print(f"Artefatos do site: {len(grouped)} jogadores em {output_dir}")
+    return manifest
+
+
+def load_tables(source_dir=BASE_DIR):
+    return {
+        name: pd.read_csv(os.path.join(source_dir, spec['source']))
+        for name, spec in TABLES.items()
+    }
+
+
+def read_tables(session):
+    # As tabelas como as estatísticas do pipeline acabaram de gravar
+    return {
+        name: pd.read_sql(text(f"SELECT * FROM {name};"), session.connection())
+        for name in TABLES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os JSON compactos do site")
+    parser.add_argument('--source', default=BASE_DIR, help="diretório com os CSV exportados")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="diretório de saída")
+    parser.add_argument('--db', action='store_true', help="lê as tabelas do banco em vez dos CSV")
+    args = parser.parse_args()
+    if args.db:
+        from analise_detalhada import connect_db
+
+        session = connect_db()
+        try:
+            tables = read_tables(session)
+        finally:
+            session.close()
+    else:
+        tables = load_tables(args.source)
+    build_artifacts(tables, args.output)
+
+
+if __name__ == "__main__":
+    main()
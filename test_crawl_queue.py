@@ -0,0 +1,111 @@
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import crawl_queue
+
+# A fila durável da coleta sobre um SQLite temporário: leases, novas
+# tentativas depois de falhas e quando o cursor de cada PUUID pode avançar.
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with crawl_queue.CrawlQueue(str(tmp_path / 'queue.sqlite')) as queue:
+        yield queue
+
+
+def state(queue, table, key, value):
+    return queue.db.execute(f"SELECT state, attempts FROM {table} WHERE {key} = ?;", (value,)).fetchone()
+
+
+def test_leased_items_are_not_handed_out_twice(queue, tmp_path):
+    queue.seed([('p1', 'Jogador 1', None, None, None)])
+    assert queue.lease_player() == ('p1', 'Jogador 1', None)
+    assert queue.lease_player() is None
+
+    # Outro processo abrindo a mesma fila também não pega o item
+    with crawl_queue.CrawlQueue(str(tmp_path / 'queue.sqlite')) as other:
+        assert other.lease_player() is None
+    assert state(queue, 'players', 'puuid', 'p1') == ('leased', 0)
+
+
+def test_expired_lease_goes_back_to_the_queue(queue, monkeypatch):
+    queue.seed([('p1', 'Jogador 1', 1700000000, None, None)])
+    monkeypatch.setattr(crawl_queue, 'LEASE_SECONDS', -1)
+    assert queue.lease_player() == ('p1', 'Jogador 1', 1700000000)
+    # O lease já venceu: o item pode ser pego de novo por quem pedir
+    assert queue.lease_player() == ('p1', 'Jogador 1', 1700000000)
+    assert queue.open_players() == 1
+
+
+def test_dead_process_leases_are_reclaimed(queue):
+    queue.seed([('p1', 'Jogador 1', None, None, None), ('p2', 'Jogador 2', None, None, None)])
+    queue.lease_player()
+    queue.lease_player()
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    dead_owner = f"{socket.gethostname()}:{finished.stdout.strip()}"
+    queue.db.execute("UPDATE players SET lease_owner = ? WHERE puuid = 'p1';", (dead_owner,))
+
+    assert queue.reclaim_dead_leases() == 1
+    assert state(queue, 'players', 'puuid', 'p1') == ('pending', 0)
+    # O lease deste processo continua valendo
+    assert state(queue, 'players', 'puuid', 'p2') == ('leased', 0)
+
+
+def test_failures_retry_until_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(crawl_queue, 'MAX_ATTEMPTS', 3)
+    queue.seed([('p1', 'Jogador 1', None, None, None)])
+    queue.lease_player()
+    queue.list_player('p1', ['BR1_1'])
+
+    for attempt in (1, 2):
+        assert queue.lease_match() == 'BR1_1'
+        queue.fail_match('BR1_1')
+        assert state(queue, 'matches', 'match_id', 'BR1_1') == ('pending', attempt)
+    assert queue.lease_match() == 'BR1_1'
+    queue.fail_match('BR1_1')
+    assert state(queue, 'matches', 'match_id', 'BR1_1') == ('failed', 3)
+    assert queue.lease_match() is None
+    assert queue.open_matches() == 0
+
+
+def test_cursor_advances_only_when_every_listed_match_is_done(queue, monkeypatch):
+    monkeypatch.setattr(crawl_queue, 'MAX_ATTEMPTS', 1)
+    queue.seed([
+        ('p1', 'Jogador 1', 1700000000, 1700000000000, 'BR1_0'),
+        ('p2', 'Jogador 2', None, None, None),
+        ('p3', 'Jogador 3', 1700000000, 1700000000000, 'BR1_0'),
+    ])
+    listed = {'p1': ['BR1_1', 'BR1_2'], 'p2': ['BR1_2', 'BR1_3'], 'p3': []}
+    for _ in listed:
+        puuid, _, _ = queue.lease_player()
+        queue.list_player(puuid, listed[puuid])
+
+    # A partida compartilhada é baixada uma vez só
+    assert sorted(queue.lease_match() for _ in range(3)) == ['BR1_1', 'BR1_2', 'BR1_3']
+    assert queue.lease_match() is None
+    queue.complete_matches([('BR1_1', 1700000100000), ('BR1_2', 1700000200000)])
+
+    # p2 ainda espera BR1_3; p3 não listou nada e fica com o cursor anterior
+    assert queue.ready_cursors() == {'p1': (1700000200000, 'BR1_2'), 'p3': (1700000000000, 'BR1_0')}
+
+    queue.fail_match('BR1_3')
+    assert queue.ready_cursors() == {'p1': (1700000200000, 'BR1_2'), 'p3': (1700000000000, 'BR1_0')}
+    # Com uma partida perdida de vez o cursor de p2 não avança
+    assert state(queue, 'players', 'puuid', 'p2')[0] == 'failed'
+
+    queue.mark_players_done(['p1', 'p3'])
+    assert queue.ready_cursors() == {}
+    assert not queue.has_open_work()
+    assert queue.summary() == {'players': {'done': 2, 'failed': 1}, 'matches': {'done': 2, 'failed': 1}}
+
+
+def test_failed_listing_keeps_the_player_open(queue):
+    queue.seed([('p1', 'Jogador 1', 1700000000, 1700000000000, 'BR1_0')])
+    queue.lease_player()
+    queue.fail_player('p1')
+    assert state(queue, 'players', 'puuid', 'p1') == ('pending', 1)
+    assert queue.ready_cursors() == {}
+    assert queue.has_open_work()
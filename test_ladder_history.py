@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import ladder_history
+import leaguev4
+from conftest import drop_tables
+
+# Histórico da ladder: a reconstrução a partir dos deltas (sempre) e a ida e
+# volta completa record_snapshot -> get_ladder_as_of num MySQL (com TEST_DB_NAME).
+
+T1, T2, T3 = datetime(2024, 6, 1), datetime(2024, 6, 2), datetime(2024, 6, 3)
+NULLS = {field: None for field in ladder_history.FIELDS}
+ALL_CHANGED = (1 << len(ladder_history.FIELDS)) - 1
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    # Devolve as linhas já filtradas e ordenadas como as consultas pedem
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self.rows)
+
+
+def delta(summoner_id, ts, changed, removed=False, **fields):
+    return {'summonerId': summoner_id, 'ts': ts, **NULLS, **fields, 'changed': changed, 'removed': removed}
+
+
+def expected(tier, rank, points, wins, losses, **flags):
+    return {
+        'tier': tier, 'rank': rank, 'leaguePoints': points, 'wins': wins, 'losses': losses,
+        'veteran': flags.get('veteran', False), 'inactive': False, 'freshBlood': False,
+        'hotStreak': flags.get('hotStreak', False),
+    }
+
+
+def test_changes_to_null_are_replayed():
+    rows = [
+        delta('s1', T1, ALL_CHANGED, tier=4, division=4, leaguePoints=50, wins=10, losses=8, flags=0),
+        # Só a divisão mudou, para NULL (tier apex sem divisão)
+        delta('s1', T2, 0b10, division=None),
+        # Linha da versão 1 (changed = 0): NULL continua significando "inalterado"
+        delta('s1', T3, 0, leaguePoints=80, flags=0b1000),
+    ]
+    assert ladder_history.get_ladder_as_of(FakeConnection(rows), T3) == {
+        's1': expected('GOLD', None, 80, 10, 8, hotStreak=True),
+    }
+    curve = ladder_history.get_lp_curve(FakeConnection(rows), 's1', since=T2)
+    assert curve == [(T2, 'GOLD', None, 50), (T3, 'GOLD', None, 80)]
+
+
+def test_removed_and_readded_summoners():
+    rows = [
+        delta('s1', T1, ALL_CHANGED, tier=8, division=4, leaguePoints=300, wins=40, losses=30, flags=1),
+        delta('s1', T2, 0, removed=True),
+        delta('s2', T1, ALL_CHANGED, tier=2, division=1, leaguePoints=10, wins=1, losses=2, flags=0),
+    ]
+    assert ladder_history.get_ladder_as_of(FakeConnection(rows), T2) == {
+        's2': expected('BRONZE', 'IV', 10, 1, 2),
+    }
+    readded = rows[:2] + [delta('s1', T3, ALL_CHANGED, tier=8, division=4, leaguePoints=0, wins=41, losses=30, flags=1)]
+    assert ladder_history.get_ladder_as_of(FakeConnection(readded), T3) == {
+        's1': expected('MASTER', 'I', 0, 41, 30, veteran=True),
+    }
+
+
+def entry(summoner_id, tier, rank, points, wins, losses, **flags):
+    return {
+        'summonerId': summoner_id, 'tier': tier, 'rank': rank, 'leaguePoints': points,
+        'wins': wins, 'losses': losses, 'veteran': flags.get('veteran', False), 'inactive': False,
+        'freshBlood': False, 'hotStreak': flags.get('hotStreak', False),
+    }
+
+
+def record(connection, ts, entries, complete=True):
+    leaguev4.prepare_staging_table(connection)
+    leaguev4.stage_players_page(connection, entries)
+    ladder_history.record_snapshot(connection, ts, complete=complete)
+
+
+def test_round_trip_through_mysql(mysql_connection):
+    drop_tables(mysql_connection, 'ladder_history', 'ladder_state', leaguev4.STAGING_TABLE)
+    ladder_history.create_tables(mysql_connection)
+    try:
+        record(mysql_connection, T1, [
+            entry('s1', 'GOLD', 'I', 50, 10, 8),
+            entry('s2', 'MASTER', 'I', 120, 60, 50, veteran=True),
+        ])
+        record(mysql_connection, T2, [
+            entry('s1', 'GOLD', 'I', 75, 11, 8, hotStreak=True),
+            # Tier desconhecido vira NULL e precisa aparecer como mudança
+            entry('s2', 'UNRANKED', None, 120, 60, 50, veteran=True),
+            entry('s3', 'IRON', 'IV', 0, 0, 1),
+        ])
+        record(mysql_connection, T3, [entry('s3', 'IRON', 'III', 10, 1, 1)])
+
+        assert ladder_history.get_ladder_as_of(mysql_connection, T1) == {
+            's1': expected('GOLD', 'I', 50, 10, 8),
+            's2': expected('MASTER', 'I', 120, 60, 50, veteran=True),
+        }
+        assert ladder_history.get_ladder_as_of(mysql_connection, T2) == {
+            's1': expected('GOLD', 'I', 75, 11, 8, hotStreak=True),
+            's2': expected(None, None, 120, 60, 50, veteran=True),
+            's3': expected('IRON', 'IV', 0, 0, 1),
+        }
+        assert ladder_history.get_ladder_as_of(mysql_connection, T3) == {
+            's3': expected('IRON', 'III', 10, 1, 1),
+        }
+        assert ladder_history.get_lp_curve(mysql_connection, 's1') == [
+            (T1, 'GOLD', 'I', 50), (T2, 'GOLD', 'I', 75),
+        ]
+    finally:
+        drop_tables(mysql_connection, 'ladder_history', 'ladder_state', leaguev4.STAGING_TABLE)
@@ -0,0 +1,60 @@
+import pytest
+
+import match_archive
+
+# Arquivo local de payloads num diretório temporário: leitura de volta,
+# visibilidade do índice entre instâncias, troca de segmento e o codec gzip.
+
+
+def payload(match_id, creation):
+    return {'metadata': {'matchId': match_id}, 'info': {'gameCreation': creation, 'participants': []}}
+
+
+def test_round_trip_and_reopen(tmp_path):
+    path = str(tmp_path / 'archive')
+    with match_archive.MatchArchive(path) as archive:
+        archive.put('BR1_1', payload('BR1_1', 1))
+        archive.put('BR1_2', payload('BR1_2', 2))
+        # Repetir um match_id não grava outro quadro
+        archive.put('BR1_1', payload('BR1_1', 99))
+        assert archive.get('BR1_1') == payload('BR1_1', 1)
+        assert archive.get('BR1_404') is None
+
+    with match_archive.MatchArchive(path, readonly=True) as archive:
+        assert 'BR1_2' in archive
+        assert archive.get('BR1_2') == payload('BR1_2', 2)
+        [segment] = archive.segments()
+        assert [match_id for match_id, _ in archive.iter_segment(segment)] == ['BR1_1', 'BR1_2']
+        with pytest.raises(RuntimeError):
+            archive.put('BR1_3', payload('BR1_3', 3))
+
+
+def test_frames_are_visible_to_other_readers_right_away(tmp_path):
+    path = str(tmp_path / 'archive')
+    with match_archive.MatchArchive(path) as writer, match_archive.MatchArchive(path, readonly=True) as reader:
+        writer.put('BR1_1', payload('BR1_1', 1))
+        # Sem flush: o índice é confirmado a cada quadro
+        assert reader.get('BR1_1') == payload('BR1_1', 1)
+
+
+def test_segments_roll_over_at_segment_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(match_archive, 'SEGMENT_SIZE', 1)
+    path = str(tmp_path / 'archive')
+    with match_archive.MatchArchive(path) as archive:
+        for i in range(3):
+            archive.put(f'BR1_{i}', payload(f'BR1_{i}', i))
+        segments = archive.segments()
+        assert len(segments) == 3
+        assert [list(archive.iter_segment(segment)) for segment in segments] == [
+            [(f'BR1_{i}', payload(f'BR1_{i}', i))] for i in range(3)
+        ]
+
+
+def test_gzip_segments_without_zstandard(tmp_path, monkeypatch):
+    monkeypatch.setattr(match_archive, 'zstandard', None)
+    path = str(tmp_path / 'archive')
+    with match_archive.MatchArchive(path) as archive:
+        archive.put('BR1_1', payload('BR1_1', 1))
+        assert archive.segments()[0].endswith('.gz')
+    with match_archive.MatchArchive(path, readonly=True) as archive:
+        assert archive.get('BR1_1') == payload('BR1_1', 1)
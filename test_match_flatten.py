@@ -0,0 +1,272 @@
+import time
+
+import pandas as pd
+
+import match_flatten
+
+# O achatamento por tabela de campos (match_flatten) comparado com o extrator
+# antigo de analise.py, copiado abaixo como estava antes da troca. As colunas
+# iguais devem sair idênticas; as diferenças são só as correções da troca:
+# estatísticas de challenges lidas de participant['challenges'] e objetivos e
+# bans do time do próprio participante.
+
+TRANSLATIONS = {
+    'items': {3031: 'Gume do Infinito', 3006: 'Grevas do Berserker'},
+    'summoners': {4: 'Flash', 14: 'Incendiar'},
+    'champions': {61: 'Orianna', 238: 'Zed', 157: 'Yasuo', 64: 'Lee Sin', 99: 'Lux', 1: 'Annie'},
+}
+
+
+def legacy_extract_match_details(match_id, match_data, roster, translations):
+    # roster: {puuid: player_name} de todos os jogadores acompanhados.
+    # Uma única passada pelos participantes gera as linhas de todos eles.
+    item_translation = translations['items']
+    summoner_translation = translations['summoners']
+    champion_translation = translations['champions']
+    match_details = []
+    info = match_data['info']
+
+    bans = info['teams'][1].get('bans', []) if len(info['teams']) > 1 else []
+
+    for participant in info['participants']:
+        player_name = roster.get(participant['puuid'])
+        if player_name:
+            match_detail = {
+                'match_id': match_id,
+                'player_name': player_name,
+                'game_version': match_flatten.correct_game_version(match_flatten.extract_game_version(info.get('gameVersion'))),
+                'game_datetime': pd.to_datetime(info['gameCreation'], unit='ms'),
+                'duration': time.strftime('%H:%M:%S', time.gmtime(info['gameDuration'])),
+                'win': True if participant.get('win') else False,
+                'champion': participant['championName'],
+                'level': participant['champLevel'],
+                'kills': participant['kills'],
+                'deaths': participant['deaths'],
+                'assists': participant['assists'],
+                'damage_dealt': participant['totalDamageDealtToChampions'],
+                'damage_taken': participant['totalDamageTaken'],
+                'vision_score': participant['visionScore'],
+                'cs': participant['totalMinionsKilled'],
+                'gold_earned': participant['goldEarned'],
+                'summoner1': summoner_translation.get(participant['summoner1Id'], participant['summoner1Id']),
+                'summoner2': summoner_translation.get(participant['summoner2Id'], participant['summoner2Id']),
+                'item0': item_translation.get(participant['item0'], participant['item0']),
+                'item1': item_translation.get(participant['item1'], participant['item1']),
+                'item2': item_translation.get(participant['item2'], participant['item2']),
+                'item3': item_translation.get(participant['item3'], participant['item3']),
+                'item4': item_translation.get(participant['item4'], participant['item4']),
+                'item5': item_translation.get(participant['item5'], participant['item5']),
+                'item6': item_translation.get(participant['item6'], participant['item6']),
+                'ban1': champion_translation.get(bans[0].get('championId')) if len(bans) > 0 else None,
+                'ban2': champion_translation.get(bans[1].get('championId')) if len(bans) > 1 else None,
+                'ban3': champion_translation.get(bans[2].get('championId')) if len(bans) > 2 else None,
+                'ban4': champion_translation.get(bans[3].get('championId')) if len(bans) > 3 else None,
+                'ban5': champion_translation.get(bans[4].get('championId')) if len(bans) > 4 else None,
+                'dragons': info['teams'][0]['objectives']['dragon']['kills'] if len(info['teams']) > 0 else None,
+                'towers': info['teams'][0]['objectives']['tower']['kills'] if len(info['teams']) > 0 else None,
+                'inhibitors': info['teams'][0]['objectives']['inhibitor']['kills'] if len(info['teams']) > 0 else None,
+                'rift_heralds': info['teams'][0]['objectives']['riftHerald']['kills'] if len(info['teams']) > 0 else None,
+                'vilemaws': info['teams'][0]['objectives'].get('vilemaw', {}).get('kills') if len(info['teams']) > 0 else None,
+                'barons': info['teams'][0]['objectives']['baron']['kills'] if len(info['teams']) > 0 else None,
+                'champExperience': participant['champExperience'],
+                'champLevel': participant['champLevel'],
+                'individualPosition': participant['individualPosition'],
+                'teamPosition': participant['teamPosition'],
+                'role': participant['role'],
+                'lane': participant['lane'],
+                'baronpowerplay': participant['challenges'].get('baronBuffGoldAdvantageOverThreshold'),
+                'bounty': participant['challenges'].get('bountyGold'),
+                'buffsStolen': participant['challenges'].get('buffsStolen'),
+                'stackitemsup': participant['challenges'].get('completeSupportQuestInTime'),
+                'pinks': participant['challenges'].get('controlWardsPlaced'),
+                'damagePerMinute': participant['challenges'].get('damagePerMinute'),
+                'percentualdedanorecebido': participant['challenges'].get('damageTakenOnTeamPercentage'),
+                'passinhos': participant['challenges'].get('dodgeSkillShotsSmallWindow'),
+                'lanediff': participant['challenges'].get('earlyLaningPhaseGoldExpAdvantage'),
+                'curaescudo': participant['challenges'].get('effectiveHealAndShielding'),
+                'cc': participant['challenges'].get('enemyChampionImmobilizations'),
+                'jungleroubada': participant['challenges'].get('enemyJungleMonsterKills'),
+                'objetivosroubados': participant['challenges'].get('epicMonsterSteals'),
+                'objetivosroubadossemsmite': participant['challenges'].get('epicMonsterStolenWithoutSmite'),
+                'firstbrick': participant['challenges'].get('firstTurretKilled'),
+                'tempofirstbrick': match_flatten.convert_timestamp(participant['challenges'].get('firstTurretKilledTime')),
+                'sucessoemganks': participant['challenges'].get('getTakedownsInAllLanesEarlyJungleAsLaner'),
+                'goldPerMinute': participant['challenges'].get('goldPerMinute'),
+                'doublebuff': participant['challenges'].get('initialBuffCount'),
+                'primeiroaronga': participant['challenges'].get('initialCrabCount'),
+                'jungleCsBefore10Minutes': participant.get('jungleCsBefore10Minutes'),
+                'kda': participant.get('kda'),
+                'killParticipation': participant.get('killParticipation'),
+                'dives': participant.get('killsNearEnemyTurret'),
+                'ganksearly': participant.get('killsOnOtherLanesEarlyJungleAsLaner'),
+                'sobrevivenciadive': participant.get('killsUnderOwnTurret'),
+                'SkillShotsEarlyGame': participant.get('landSkillShotsEarlyGame'),
+                'laneMinionsFirst10Minutes': participant.get('laneMinionsFirst10Minutes'),
+                'laningPhaseGoldExpAdvantage': participant.get('laningPhaseGoldExpAdvantage'),
+                'maxCsAdvantageOnLaneOpponent': participant.get('maxCsAdvantageOnLaneOpponent'),
+                'maxKillDeficit': participant.get('maxKillDeficit'),
+                'maxLevelLeadLaneOpponent': participant.get('maxLevelLeadLaneOpponent'),
+                'moreEnemyJungleThanOpponent': participant.get('moreEnemyJungleThanOpponent'),
+                'multikills': participant.get('multikills'),
+                'multikillsAfterAggressiveFlash': participant.get('multikillsAfterAggressiveFlash'),
+                'outnumberedKills': participant.get('outnumberedKills'),
+                'pickKillWithAlly': participant.get('pickKillWithAlly'),
+                'playedChampSelectPosition': participant.get('playedChampSelectPosition'),
+                'quickCleanse': participant.get('quickCleanse'),
+                'quickFirstTurret': participant.get('quickFirstTurret'),
+                'quickSoloKills': participant.get('quickSoloKills'),
+                'saveAllyFromDeath': participant.get('saveAllyFromDeath'),
+                'scuttleCrabKills': participant.get('scuttleCrabKills'),
+                'skillshotsDodged': participant.get('skillshotsDodged'),
+                'skillshotsHit': participant.get('skillshotsHit'),
+                'soloKills': participant.get('soloKills'),
+                'soloTurretsLategame': participant.get('soloTurretsLategame'),
+                'stealthWardsPlaced': participant.get('stealthWardsPlaced'),
+                'takedownOnFirstTurret': participant.get('takedownOnFirstTurret'),
+                'takedowns': participant.get('takedowns'),
+                'takedownsAfterGainingLevelAdvantage': participant.get('takedownsAfterGainingLevelAdvantage'),
+                'takedownsBeforeJungleMinionSpawn': participant.get('takedownsBeforeJungleMinionSpawn'),
+                'takedownsFirstXMinutes': participant.get('takedownsFirstXMinutes'),
+                'teamDamagePercentage': participant.get('teamDamagePercentage'),
+                'turretPlatesTaken': participant.get('turretPlatesTaken'),
+                'turretTakedowns': participant.get('turretTakedowns'),
+                'visionScoreAdvantageLaneOpponent': participant.get('visionScoreAdvantageLaneOpponent'),
+                'visionScorePerMinute': participant.get('visionScorePerMinute'),
+                'wardTakedowns': participant.get('wardTakedowns'),
+                'wardTakedownsBefore20M': participant.get('wardTakedownsBefore20M'),
+                'wardsGuarded': participant.get('wardsGuarded'),
+                'damageDealtToBuildings': participant.get('damageDealtToBuildings'),
+                'damageDealtToObjectives': participant.get('damageDealtToObjectives'),
+                'damageDealtToTurrets': participant.get('damageDealtToTurrets'),
+                'damageSelfMitigated': participant.get('damageSelfMitigated'),
+                'detectorWardsPlaced': participant.get('detectorWardsPlaced'),
+                'doubleKills': participant.get('doubleKills'),
+                'firstBloodAssist': participant.get('firstBloodAssist'),
+                'firstBloodKill': participant.get('firstBloodKill'),
+                'firstTowerAssist': participant.get('firstTowerAssist'),
+                'firstTowerKill': participant.get('firstTowerKill'),
+                'gameEndedInEarlySurrender': participant.get('gameEndedInEarlySurrender'),
+                'gameEndedInSurrender': participant.get('gameEndedInSurrender'),
+                'goldEarned': participant.get('goldEarned'),
+                'goldSpent': participant.get('goldSpent'),
+                'inhibitorKills': participant.get('inhibitorKills'),
+                'killingSprees': participant.get('killingSprees'),
+                'largestCriticalStrike': participant.get('largestCriticalStrike'),
+                'largestKillingSpree': participant.get('largestKillingSpree'),
+                'largestMultiKill': participant.get('largestMultiKill'),
+                'longestTimeSpentLiving': participant.get('longestTimeSpentLiving'),
+                'neutralMinionsKilled': participant.get('neutralMinionsKilled'),
+                'objectivesStolen': participant.get('objectivesStolen'),
+                'objectivesStolenAssists': participant.get('objectivesStolenAssists'),
+                'participantId': participant.get('participantId'),
+                'pentaKills': participant.get('pentaKills'),
+                'quadraKills': participant.get('quadraKills'),
+                'sightWardsBoughtInGame': participant.get('sightWardsBoughtInGame'),
+                'teamEarlySurrendered': participant.get('teamEarlySurrendered'),
+                'timeCCingOthers': participant.get('timeCCingOthers'),
+                'timePlayed': participant.get('timePlayed'),
+                'totalDamageDealtToChampions': participant.get('totalDamageDealtToChampions'),
+                'totalDamageShieldedOnTeammates': participant.get('totalDamageShieldedOnTeammates'),
+                'totalDamageTaken': participant.get('totalDamageTaken'),
+                'totalHeal': participant.get('totalHeal'),
+                'totalHealsOnTeammates': participant.get('totalHealsOnTeammates'),
+                'totalMinionsKilled': participant.get('totalMinionsKilled'),
+                'totalTimeCCDealt': participant.get('totalTimeCCDealt'),
+                'totalTimeSpentDead': participant.get('totalTimeSpentDead'),
+                'tripleKills': participant.get('tripleKills'),
+                'turretKills': participant.get('turretKills'),
+                'turretsLost': participant.get('turretsLost'),
+                'unrealKills': participant.get('unrealKills'),
+                'visionWardsBoughtInGame': participant.get('visionWardsBoughtInGame'),
+                'wardsKilled': participant.get('wardsKilled'),
+                'wardsPlaced': participant.get('wardsPlaced'),
+            }
+
+            match_details.append(match_detail)
+
+    return match_details
+
+
+def make_participant(puuid, team_id, champion):
+    # Todas as chaves lidas pelos dois extratores; as de challenges só dentro
+    # de participant['challenges'], como a API devolve
+    values = iter(range(1, 1000))
+    data = {
+        key: next(values)
+        for _, source, key, _ in match_flatten.MATCH_FIELDS
+        if source == 'participant'
+    }
+    data.update({
+        'puuid': puuid, 'teamId': team_id, 'win': team_id == 100, 'championName': champion,
+        'summoner1Id': 4, 'summoner2Id': 14, 'item0': 3031, 'item1': 3006, 'item2': 0,
+        'individualPosition': 'MIDDLE', 'teamPosition': 'MIDDLE', 'role': 'SOLO', 'lane': 'MIDDLE',
+    })
+    data['challenges'] = {
+        key: next(values)
+        for _, source, key, _ in match_flatten.MATCH_FIELDS
+        if source == 'challenges'
+    }
+    return data
+
+
+def make_team(team_id, kills, bans):
+    objectives = {name: {'first': False, 'kills': kills + offset}
+                  for offset, name in enumerate(['dragon', 'tower', 'inhibitor', 'riftHerald', 'baron'])}
+    return {'teamId': team_id, 'objectives': objectives,
+            'bans': [{'championId': champion, 'pickTurn': turn} for turn, champion in enumerate(bans, 1)]}
+
+
+MATCH = {
+    'metadata': {'matchId': 'BR1_1', 'participants': ['p1', 'p2', 'p3']},
+    'info': {
+        'gameVersion': '14.11.589.9418',
+        'gameCreation': 1_717_000_000_000,
+        'gameDuration': 1834,
+        'participants': [
+            make_participant('p1', 100, 'Orianna'),
+            make_participant('p2', 200, 'Zed'),
+            make_participant('p3', 200, 'Annie'),
+        ],
+        'teams': [make_team(100, 1, [157, 64]), make_team(200, 10, [99, 1, 61])],
+    },
+}
+ROSTER = {'p1': 'Jogador Azul', 'p2': 'Jogador Vermelho'}
+
+
+def test_flattener_matches_the_old_extractor():
+    old_rows = legacy_extract_match_details('BR1_1', MATCH, ROSTER, TRANSLATIONS)
+    new_rows = match_flatten.extract_rows('BR1_1', MATCH, ROSTER, TRANSLATIONS)
+    assert [row['player_name'] for row in new_rows] == ['Jogador Azul', 'Jogador Vermelho']
+    assert set(new_rows[0]) == set(old_rows[0])
+
+    for old, new in zip(old_rows, new_rows):
+        for column, source, _, _ in match_flatten.MATCH_FIELDS:
+            if source == 'challenges':
+                # Antes algumas eram lidas do participante e ficavam sempre NULL
+                assert new[column] is not None, column
+                assert old[column] is None or old[column] == new[column], column
+            elif source not in ('team', 'ban'):
+                assert new[column] == old[column], column
+
+    blue, red = new_rows
+    old_blue, old_red = old_rows
+    # O extrator antigo usava teams[0] para objetivos e teams[1] para bans
+    for column in ('dragons', 'towers', 'inhibitors', 'rift_heralds', 'barons'):
+        assert blue[column] == old_blue[column]
+    assert [blue[f'ban{i}'] for i in range(1, 6)] == ['Yasuo', 'Lee Sin', None, None, None]
+    assert [red[f'ban{i}'] for i in range(1, 6)] == [old_red[f'ban{i}'] for i in range(1, 6)]
+    assert (red['dragons'], red['towers'], red['barons']) == (10, 11, 14)
+
+
+def test_columns_match_rows():
+    rows = match_flatten.extract_rows('BR1_1', MATCH, ROSTER, TRANSLATIONS)
+    columns = match_flatten.extract_columns([('BR1_1', MATCH)], ROSTER, TRANSLATIONS)
+    assert columns == {column: [row[column] for row in rows] for column in match_flatten.COLUMNS}
+
+
+def test_compiled_fields_follow_the_translations_object():
+    english = {**TRANSLATIONS, 'champions': {**TRANSLATIONS['champions'], 157: 'Yasuo (en)'}}
+    portuguese = match_flatten.extract_rows('BR1_1', MATCH, ROSTER, TRANSLATIONS)
+    translated = match_flatten.extract_rows('BR1_1', MATCH, ROSTER, english)
+    assert portuguese[0]['ban1'] == 'Yasuo'
+    assert translated[0]['ban1'] == 'Yasuo (en)'
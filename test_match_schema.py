@@ -0,0 +1,135 @@
+import match_schema
+import migrations
+from conftest import drop_tables
+
+# Migração de match_details: rodar de novo não altera nada, seja pela versão
+# gravada em schema_versions, seja pela tabela já estar no modelo. A conversão
+# de uma tabela antiga de verdade roda num MySQL (com TEST_DB_NAME).
+
+TABLE = match_schema.MATCH_DETAILS_TABLE
+
+# Tipos como o MySQL reporta a tabela já migrada em information_schema
+REPORTED_TYPES = {'BOOLEAN': 'tinyint(1)', 'TIMESTAMP': 'timestamp'}
+MIGRATED_COLUMNS = {
+    name: REPORTED_TYPES.get(sql_type.split()[0], sql_type.split()[0].lower())
+    for name, sql_type in match_schema.MATCH_DETAILS_COLUMNS
+}
+
+
+class FakeCursor:
+    def __init__(self, schema):
+        self.schema = schema
+        self.rows = []
+
+    def execute(self, query, params=None):
+        query = ' '.join(query.split())
+        self.schema.executed.append(query)
+        if query.startswith('SELECT version FROM schema_versions'):
+            version = self.schema.version
+            self.rows = [(version,)] if version is not None else []
+        elif query.startswith('INSERT INTO schema_versions'):
+            self.schema.version = params[1]
+        elif 'information_schema.columns' in query:
+            self.rows = list(self.schema.columns.items())
+        elif 'information_schema.key_column_usage' in query:
+            self.rows = [(name,) for name in self.schema.primary_key]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    # Responde às consultas de migrations.py a partir de um esquema em memória
+    def __init__(self, version=None, columns=None, primary_key=()):
+        self.version = version
+        self.columns = columns or {}
+        self.primary_key = primary_key
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def statements(self, prefix):
+        return [query for query in self.executed if query.startswith(prefix)]
+
+
+def test_current_version_skips_the_migration():
+    connection = FakeConnection(version=match_schema.MATCH_DETAILS_VERSION)
+    match_schema.migrate_match_details(connection)
+    assert not any(TABLE in query for query in connection.executed)
+    assert not connection.statements('SELECT column_name')
+
+
+def test_rerun_on_a_migrated_table_changes_nothing():
+    # Sem a linha em schema_versions (banco restaurado, por exemplo) a
+    # migração inspeciona a tabela, não encontra diferenças e só grava a versão
+    connection = FakeConnection(columns=MIGRATED_COLUMNS, primary_key=match_schema.MATCH_DETAILS_PRIMARY_KEY)
+    match_schema.migrate_match_details(connection)
+    assert not connection.statements('ALTER TABLE')
+    assert not connection.statements('UPDATE')
+    assert connection.version == match_schema.MATCH_DETAILS_VERSION
+
+    connection.executed.clear()
+    match_schema.migrate_match_details(connection)
+    assert not connection.statements('CREATE TABLE IF NOT EXISTS match_details')
+
+
+def test_old_table_is_fixed_in_a_single_alter():
+    old_columns = {name: 'varchar(255)' for name in MIGRATED_COLUMNS if name != 'ingest_id'}
+    connection = FakeConnection(columns=old_columns, primary_key=('match_id',))
+    match_schema.migrate_match_details(connection)
+
+    [update] = connection.statements('UPDATE')
+    assert 'kills = CASE' in update and 'champion' not in update
+    [alter] = connection.statements('ALTER TABLE')
+    assert 'ADD COLUMN ingest_id BIGINT NOT NULL AUTO_INCREMENT' in alter
+    assert 'MODIFY COLUMN win BOOLEAN' in alter
+    assert 'DROP PRIMARY KEY, ADD PRIMARY KEY (match_id, player_name)' in alter
+    assert connection.version == match_schema.MATCH_DETAILS_VERSION
+
+
+def test_migrating_an_old_mysql_table_twice(mysql_connection):
+    drop_tables(mysql_connection, TABLE)
+    cursor = mysql_connection.cursor()
+    # Formato antigo: tudo texto e um jogador por partida
+    cursor.execute(f"""
+    CREATE TABLE {TABLE} (
+        match_id VARCHAR(255) PRIMARY KEY, player_name VARCHAR(255), game_version VARCHAR(255),
+        win VARCHAR(255), champion VARCHAR(255), kills VARCHAR(255), deaths VARCHAR(255)
+    );
+    """)
+    cursor.execute(
+        f"INSERT INTO {TABLE} VALUES ('BR1_1', 'Jogador', '14.1', 'True', 'Ahri', '7', ''), "
+        f"('BR1_2', 'Jogador', '14.1', 'False', 'Lux', '0', '3');"
+    )
+    mysql_connection.commit()
+    try:
+        match_schema.migrate_match_details(mysql_connection)
+        columns = migrations.get_table_columns(mysql_connection, TABLE)
+        primary_key = migrations.get_primary_key(mysql_connection, TABLE)
+
+        # A segunda execução, mesmo sem a versão gravada, encontra o mesmo esquema
+        cursor.execute("DELETE FROM schema_versions WHERE table_name = %s;", (TABLE,))
+        mysql_connection.commit()
+        match_schema.migrate_match_details(mysql_connection)
+
+        assert migrations.get_table_columns(mysql_connection, TABLE) == columns
+        assert migrations.get_primary_key(mysql_connection, TABLE) == primary_key == match_schema.MATCH_DETAILS_PRIMARY_KEY
+        assert set(columns) == set(match_schema.MATCH_DETAILS_TYPES)
+        assert columns['kills'].startswith('int') and columns['win'].startswith('tinyint')
+        assert migrations.get_schema_version(mysql_connection, TABLE) == match_schema.MATCH_DETAILS_VERSION
+
+        cursor.execute(f"SELECT match_id, win, kills, deaths, ingest_id FROM {TABLE} ORDER BY match_id;")
+        assert cursor.fetchall() == (('BR1_1', 1, 7, None, 1), ('BR1_2', 0, 0, 3, 2))
+    finally:
+        cursor.close()
+        drop_tables(mysql_connection, TABLE)
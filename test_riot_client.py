@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_riot import FakeRiotServer
+from riot_client import RiotClient
+
+# Testes do RiotClient contra o servidor falso (fake_riot.py): nenhum acesso à
+# API real, mas os mesmos cabeçalhos de limite e as mesmas respostas 429/404.
+
+MATCH = {'metadata': {'matchId': 'BR1_1'}, 'info': {'participants': []}}
+QUEUE = ('RANKED_SOLO_5x5', 'GOLD', 'I')
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_paces_requests_from_rate_limit_headers():
+    async def scenario():
+        async with FakeRiotServer(matches={'BR1_1': MATCH}, app_limits="100:1",
+                                  method_limits={'match-v5.getMatch': "3:1"}) as server:
+            async with RiotClient('fake-key', base_url=server.url) as client:
+                # A primeira resposta traz os limites reais; as seguintes seguem o ritmo deles
+                assert await client.get_match('BR1_1') == MATCH
+                limiter = client.method_limiters[('americas', 'match-v5.getMatch')]
+                assert [(limit, seconds) for limit, seconds, _ in limiter.windows] == [(3, 1)]
+
+                start = time.monotonic()
+                results = await asyncio.gather(*(client.get_match('BR1_1') for _ in range(5)))
+                elapsed = time.monotonic() - start
+            return server, results, elapsed
+
+    server, results, elapsed = run(scenario())
+    assert results == [MATCH] * 5
+    assert server.status_counts[429] == 0
+    # Com a margem de segurança cabem 2 requisições por janela de 1s
+    assert elapsed >= 2.0
+
+
+@pytest.mark.parametrize('limit_type', ['application', 'method'])
+def test_429_blocks_the_limiter_named_in_the_response(limit_type):
+    app_limits = "1:1" if limit_type == 'application' else "100:1"
+    method_limits = {'match-v5.getMatch': "1:1"} if limit_type == 'method' else None
+
+    async def scenario():
+        async with FakeRiotServer(matches={'BR1_1': MATCH}, app_limits=app_limits,
+                                  method_limits=method_limits) as server:
+            async with RiotClient('fake-key', base_url=server.url) as client:
+                # Antes da primeira resposta o cliente usa os limites padrão e
+                # dispara as duas de uma vez; o servidor recusa a segunda
+                start = time.monotonic()
+                results = await asyncio.gather(client.get_match('BR1_1'), client.get_match('BR1_1'))
+                elapsed = time.monotonic() - start
+                app_limiter, method_limiter = client._limiters('americas', 'match-v5.getMatch')
+            return server, results, elapsed, app_limiter, method_limiter
+
+    server, results, elapsed, app_limiter, method_limiter = run(scenario())
+    assert results == [MATCH, MATCH]
+    assert server.status_counts[429] == 1
+    # Retry-After foi respeitado antes da nova tentativa
+    assert elapsed >= 1.0
+    blocked, other = (app_limiter, method_limiter) if limit_type == 'application' else (method_limiter, app_limiter)
+    assert blocked.blocked_until > 0
+    assert other.blocked_until == 0
+
+
+def test_404_returns_none():
+    async def scenario():
+        async with FakeRiotServer() as server:
+            async with RiotClient('fake-key', base_url=server.url) as client:
+                match = await client.get_match('BR1_404')
+                puuid = await client.get_puuid('Ninguém', 'BR1')
+            return server, match, puuid
+
+    server, match, puuid = run(scenario())
+    assert match is None
+    assert puuid is None
+    assert server.status_counts[404] == 2
+
+
+def test_league_entries_distinguish_failure_from_last_page():
+    entries = [{'summonerId': f's{i}', 'tier': 'GOLD', 'rank': 'I'} for i in range(210)]
+
+    async def scenario():
+        async with FakeRiotServer(league_entries={QUEUE: entries}) as server:
+            async with RiotClient('fake-key', base_url=server.url) as client:
+                pages = [await client.get_league_entries(*QUEUE, page=page) for page in (1, 2, 3)]
+            async with RiotClient('wrong-key', base_url=server.url) as client:
+                failed = await client.get_league_entries(*QUEUE, page=1)
+            return pages, failed
+
+    pages, failed = run(scenario())
+    assert [len(page) for page in pages] == [205, 5, 0]
+    assert pages[2] == []
+    assert failed is None
+
+
+def test_match_id_listing_fails_instead_of_ending_early(monkeypatch):
+    import analise
+
+    monkeypatch.setattr(analise, 'MATCH_PAGE_SIZE', 2)
+    matches = {
+        f'BR1_{i}': {'metadata': {'participants': ['p1']}, 'info': {'gameCreation': 1_700_000_000_000 + i}}
+        for i in range(5)
+    }
+
+    async def scenario():
+        async with FakeRiotServer(matches=matches) as server:
+            async with RiotClient('fake-key', base_url=server.url) as client:
+                listed = await analise.get_match_ids(client, 'p1', 'Jogador', start_time=0)
+
+                # A segunda página falha: nada é devolvido, nem a primeira página
+                pages = []
+                list_page = client.get_match_ids
+
+                async def flaky(puuid, **params):
+                    pages.append(params['start'])
+                    return None if params['start'] > 0 else await list_page(puuid, **params)
+
+                client.get_match_ids = flaky
+                failed = await analise.get_match_ids(client, 'p1', 'Jogador', start_time=0)
+            async with RiotClient('wrong-key', base_url=server.url) as client:
+                latest = await analise.get_match_ids(client, 'p1', 'Jogador')
+            return listed, failed, pages, latest
+
+    listed, failed, pages, latest = run(scenario())
+    assert listed == [f'BR1_{i}' for i in range(4, -1, -1)]
+    assert failed is None
+    assert pages == [0, 2]
+    assert latest is None